@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark sync (WSGI) vs async (ASGI) generation against a local fake LLM.
+
+A fake OpenAI-compatible server answers chat completions after a fixed delay.
+Sync mode pushes N concurrent POST /api/lessons/generate through the Flask app
+with W worker threads (one request per worker, like gunicorn sync workers).
+Async mode sends the same N requests to the ASGI app on a single event loop.
+
+Usage: python benchmarks/bench_async_generation.py [--requests 200] [--workers 4] [--delay 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.asgi import AsgiApp
+from src.commands import init_db
+from src.models.user import User, db
+
+FAKE_LESSON = {
+    "introduction": "Fake introduction", "objectives": ["a", "b"],
+    "content": {"theory": "Fake theory", "examples": [], "practice_exercises": []},
+    "vocabulary": [{"word": "fake", "definition": "not real", "example": "A fake answer."}],
+    "summary": "Fake summary", "next_steps": "None"
+}
+FAKE_QUESTIONS = [
+    {"id": 1, "question": "Fake?", "type": "multiple_choice", "options": ["A", "B"],
+     "correct_answer": "A", "explanation": "Because."}
+]
+
+
+class FakeLLMServer:
+    """Minimal OpenAI-compatible chat completions server on its own event loop thread"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.port = None
+        self.requests = 0
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.decode('latin1').split('\r\n'):
+                    if line.lower().startswith('content-length:'):
+                        length = int(line.split(':', 1)[1])
+                payload = json.loads(await reader.readexactly(length)) if length else {}
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                system = payload.get('messages', [{}])[0].get('content', '')
+                content = FAKE_QUESTIONS if 'quiz' in system else FAKE_LESSON
+                body = json.dumps({
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": payload.get('model'),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps(content)}}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 200, "total_tokens": 300}
+                }).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            writer.close()
+
+
+def summarize(mode, latencies, elapsed, failures):
+    ordered = sorted(latencies)
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'failures': failures,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(ordered), 1),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 1),
+    }
+
+
+def run_sync(app, token, n, workers):
+    client = app.test_client()
+    body = {'topic': 'Past Tense', 'level': 'beginner'}
+
+    # All requests arrive at once: latency includes time spent queued for a worker
+    def one(_):
+        response = client.post('/api/lessons/generate', json=body, headers={'Authorization': f'Bearer {token}'})
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one, range(n)))
+    elapsed = time.perf_counter() - start
+    return summarize(f'sync ({workers} workers)', [r[0] * 1000 for r in results], elapsed,
+                     sum(1 for r in results if r[1] != 201))
+
+
+async def asgi_post(asgi_app, path, body, token):
+    payload = json.dumps(body).encode()
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': path, 'root_path': '', 'query_string': b'',
+        'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode()),
+                    (b'authorization', f'Bearer {token}'.encode())],
+    }
+    sent = False
+    status = {}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await asgi_app(scope, receive, send)
+    return status['code']
+
+
+def run_async(app, token, n):
+    asgi_app = AsgiApp(app, threads=16)
+    body = {'topic': 'Past Tense', 'level': 'beginner'}
+
+    async def one():
+        code = await asgi_post(asgi_app, '/api/lessons/generate', body, token)
+        return time.perf_counter() - start, code
+
+    async def main():
+        return await asyncio.gather(*[one() for _ in range(n)])
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    return summarize('async (1 event loop)', [r[0] * 1000 for r in results], elapsed,
+                     sum(1 for r in results if r[1] != 201))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4, help='sync worker slots')
+    parser.add_argument('--delay', type=float, default=0.5, help='fake LLM latency in seconds')
+    args = parser.parse_args()
+
+    fake = FakeLLMServer(args.delay)
+    os.environ['OPENAI_API_BASE'] = fake.start()
+    os.environ['OPENAI_API_KEY'] = 'fake-key'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # One benchmark user sends every request, so per-user admission limits are off
+        app = create_app({'SECRET_KEY': 'bench', 'ADMISSION_ENABLED': False,
+                          'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'gen.db')}"})
+        with app.app_context():
+            init_db()
+            user = User(username='bench', email='bench@example.com')
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.commit()
+            token = user.generate_token('bench')
+
+        results = [run_sync(app, token, args.requests, args.workers), run_async(app, token, args.requests)]
+    print(json.dumps({'fake_llm_delay_s': args.delay, 'llm_calls': fake.requests, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
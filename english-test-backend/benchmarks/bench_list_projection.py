@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark full vs summary/sparse listing payloads for lessons and quizzes.
+
+Seeds a throwaway SQLite database with large lessons and quizzes, then times
+GET /api/lessons and GET /api/quizzes through the Flask test client.
+
+Usage: python benchmarks/bench_list_projection.py [--lessons 200] [--per-page 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.commands import init_db
+from src.models.user import User, db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+
+
+def make_app(db_path):
+    return create_app({
+        'SECRET_KEY': 'bench-secret',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}",
+    })
+
+
+def large_lesson_content(i, vocabulary_size):
+    return {
+        "introduction": f"Introduction to lesson {i}. " * 20,
+        "objectives": [f"Objective {n} for lesson {i}" for n in range(5)],
+        "content": {
+            "theory": f"Theory paragraph for lesson {i}. " * 300,
+            "examples": [f"Example sentence {n} for lesson {i}." for n in range(30)],
+            "practice_exercises": [
+                {"instruction": f"Exercise {n}", "example": f"Do exercise {n} like this."}
+                for n in range(15)
+            ]
+        },
+        "vocabulary": [
+            {"word": f"word{n}", "definition": f"Definition of word {n}. " * 3, "example": f"Use word{n} in a sentence."}
+            for n in range(vocabulary_size)
+        ],
+        "summary": f"Summary of lesson {i}. " * 10,
+        "next_steps": "Keep practising."
+    }
+
+
+def seed(app, num_lessons, quizzes_per_lesson):
+    with app.app_context():
+        init_db()
+        user = User(username='bench', email='bench@example.com', level='beginner')
+        user.set_password('password123')
+        db.session.add(user)
+        for i in range(num_lessons):
+            lesson = Lesson(title=f"Lesson {i}", description=f"Description {i}", level='intermediate',
+                            topic=['Grammar', 'Vocabulary', 'Reading'][i % 3], duration_minutes=20)
+            lesson.set_content(large_lesson_content(i, 40))
+            db.session.add(lesson)
+            db.session.flush()
+            for q in range(quizzes_per_lesson):
+                quiz = Quiz(lesson_id=lesson.id, title=f"Quiz {i}-{q}", level='intermediate')
+                quiz.set_questions([
+                    {"id": n + 1, "question": f"Question {n}? " * 5, "type": "multiple_choice",
+                     "options": [f"Option {c}" for c in "ABCD"], "correct_answer": "Option A",
+                     "explanation": "Because. " * 10}
+                    for n in range(10)
+                ])
+                db.session.add(quiz)
+        db.session.commit()
+        return user.generate_token(app.config['SECRET_KEY'])
+
+
+def measure(client, url, headers, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        size = len(response.get_data())
+    return {
+        'url': url,
+        'bytes': size,
+        'p50_ms': round(statistics.median(timings), 2),
+        'min_ms': round(min(timings), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lessons', type=int, default=200)
+    parser.add_argument('--quizzes-per-lesson', type=int, default=2)
+    parser.add_argument('--per-page', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        token = seed(app, args.lessons, args.quizzes_per_lesson)
+        headers = {'Authorization': f'Bearer {token}'}
+        client = app.test_client()
+
+        cases = [
+            ('lessons', f'/api/lessons?per_page={args.per_page}'),
+            ('lessons', f'/api/lessons?per_page={args.per_page}&view=summary'),
+            ('lessons', f'/api/lessons?per_page={args.per_page}&fields=title,topic'),
+            ('quizzes', f'/api/quizzes?per_page={args.per_page}'),
+            ('quizzes', f'/api/quizzes?per_page={args.per_page}&view=summary'),
+        ]
+        results = []
+        baselines = {}
+        for resource, url in cases:
+            result = measure(client, url, headers, args.repeat)
+            baseline = baselines.setdefault(resource, result)
+            result['bytes_vs_full'] = f"{result['bytes'] / baseline['bytes']:.1%}"
+            result['latency_vs_full'] = f"{result['p50_ms'] / baseline['p50_ms']:.1%}"
+            results.append(result)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
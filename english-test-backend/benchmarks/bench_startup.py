@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start cost: import time, create_app() time and time-to-first-request.
+
+Each sample runs in a fresh interpreter so nothing is already imported.
+
+Usage: python benchmarks/bench_startup.py [--samples 5] [--importtime]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line of timings
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.environ['BACKEND_DIR'])
+from src.main import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': os.environ['BENCH_DB_URI'], 'SECRET_KEY': 'bench'})
+created = time.perf_counter()
+with app.app_context():
+    from src.commands import init_db
+    from src.models.user import User, db
+    init_db()
+    user = User.query.filter_by(username='bench').first()
+    if user is None:
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+    token = user.generate_token('bench')
+schema = time.perf_counter()
+response = app.test_client().get('/api/lessons?view=summary', headers={'Authorization': f'Bearer {token}'})
+first_request = time.perf_counter()
+assert response.status_code == 200, response.get_data(as_text=True)
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - schema) * 1000,
+    # Excludes the schema/user setup, which only the benchmark needs
+    'time_to_first_request_ms': ((first_request - start) - (schema - created)) * 1000,
+    'openai_imported': 'openai' in sys.modules,
+}))
+'''
+
+
+def run_sample(db_uri):
+    env = dict(os.environ, BACKEND_DIR=BACKEND_DIR, BENCH_DB_URI=db_uri)
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_importtime(limit=15):
+    """Print the modules with the largest cumulative import time"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.main'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        rows.append((int(cumulative_us), module.rstrip()))
+    for cumulative_us, module in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:9.1f} ms  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='also print the slowest imports')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        samples = [run_sample(db_uri) for _ in range(args.samples)]
+
+    summary = {}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'time_to_first_request_ms'):
+        values = [s[key] for s in samples]
+        summary[key] = {'median': round(statistics.median(values), 1), 'max': round(max(values), 1)}
+    summary['openai_imported_before_generation'] = any(s['openai_imported'] for s in samples)
+    print(json.dumps(summary, indent=2))
+
+    if args.importtime:
+        print_importtime()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Benchmark every route of user_bp, lesson_bp, quiz_bp and statistics_bp.
+
+Each size preset is a synthetic database (src/services/synthetic.py), seeded
+once and cached in benchmarks/.data/; every run works on a fresh copy.
+
+Modes:
+  client  Flask test client, one request at a time (no network)
+  http    N pre-forked single-threaded server processes sharing one socket,
+          driven by C concurrent keep-alive-less HTTP clients
+
+Latency p50/p95/p99 and throughput per (mode, size, route) are saved as JSON.
+Generation routes talk to a local fake LLM (no OpenAI key needed).
+
+Usage:
+  python benchmarks/run_suite.py run --sizes small,medium --modes client,http \\
+      --output benchmarks/results/current.json [--baseline benchmarks/results/base.json]
+  python benchmarks/run_suite.py compare base.json current.json [--tolerance 0.2]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import desc, func
+
+from src.main import create_app
+from src.commands import init_db
+from src.models.user import User, db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.statistics import UserStatistics
+from src.models.vocabulary import VocabularyEntry
+from src.services.synthetic import DEFAULT_SIZES, SyntheticDataset
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+BLUEPRINTS = ('user', 'lesson', 'quiz', 'statistics', 'vocabulary', 'batch')
+SIZE_PRESETS = {'small': 0.001, 'medium': 0.01, 'large': 0.1, 'full': 1.0}
+SECRET_KEY = 'bench-suite'
+
+
+class Scenario:
+    """One route call; path/body may be callables of the run context (ids, counter)"""
+
+    def __init__(self, endpoint, method, path, body=None, prepare=None, iterations=None):
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+        self.iterations = iterations
+
+    def render(self, ctx):
+        path = self.path(ctx) if callable(self.path) else self.path
+        body = self.body(ctx) if callable(self.body) else self.body
+        return path, body
+
+
+def register_throwaway(ctx, send):
+    """Untimed setup: a fresh account for routes that delete one"""
+    n = next(ctx['counter'])
+    status, data = send('POST', '/api/auth/register', {
+        'username': f"bench_{ctx['run']}_{n}", 'email': f"bench_{ctx['run']}_{n}@example.com",
+        'password': 'password123'
+    })
+    return {'token': data['token'], 'user_id': data['user']['id']}
+
+
+def unique_user(ctx):
+    n = next(ctx['counter'])
+    return {'username': f"new_{ctx['run']}_{n}", 'email': f"new_{ctx['run']}_{n}@example.com", 'password': 'password123'}
+
+
+# Password hashing makes auth writes slow by design: fewer iterations
+SCENARIOS = [
+    Scenario('user.register', 'POST', '/api/auth/register', unique_user, iterations=10),
+    Scenario('user.login', 'POST', '/api/auth/login',
+             lambda ctx: {'username': ctx['username'], 'password': 'password123'}, iterations=10),
+    Scenario('user.get_profile', 'GET', '/api/auth/profile'),
+    Scenario('user.update_profile', 'PUT', '/api/auth/profile', {'first_name': 'Bench'}),
+    Scenario('user.change_password', 'POST', '/api/auth/change-password',
+             {'current_password': 'password123', 'new_password': 'password123'}, iterations=10),
+    Scenario('user.delete_own_account', 'DELETE', '/api/auth/delete-account',
+             prepare=register_throwaway, iterations=10),
+    Scenario('user.get_users', 'GET', '/api/users', iterations=5),
+    Scenario('user.get_user', 'GET', lambda ctx: f"/api/users/{ctx['user_id']}"),
+    Scenario('user.delete_user', 'DELETE', lambda ctx: f"/api/users/{ctx['victim_user_id']}",
+             prepare=lambda ctx, send: {'victim_user_id': register_throwaway(ctx, send)['user_id']}, iterations=10),
+
+    Scenario('lesson.get_lessons', 'GET', '/api/lessons'),
+    Scenario('lesson.get_lessons', 'GET', '/api/lessons?view=summary'),
+    Scenario('lesson.get_lesson', 'GET', lambda ctx: f"/api/lessons/{ctx['lesson_id']}"),
+    Scenario('lesson.generate_lesson', 'POST', '/api/lessons/generate',
+             {'topic': 'Past Tense', 'level': 'beginner'}, iterations=20),
+    Scenario('lesson.update_lesson', 'PUT', lambda ctx: f"/api/lessons/{ctx['lesson_id']}",
+             {'description': 'Updated by the benchmark'}),
+    Scenario('lesson.delete_lesson', 'DELETE', lambda ctx: f"/api/lessons/{ctx['victim_lesson_id']}"),
+    Scenario('lesson.get_topics', 'GET', '/api/lessons/topics'),
+    Scenario('lesson.get_catalog_facets', 'GET', '/api/catalog/facets'),
+    Scenario('lesson.search', 'GET', '/api/lessons/search?q=present%20perf'),
+    Scenario('lesson.get_related_lessons', 'GET', lambda ctx: f"/api/lessons/{ctx['lesson_id']}/related"),
+
+    Scenario('quiz.get_quizzes', 'GET', '/api/quizzes'),
+    Scenario('quiz.get_quizzes', 'GET', '/api/quizzes?view=summary'),
+    Scenario('quiz.get_quiz', 'GET', lambda ctx: f"/api/quizzes/{ctx['quiz_id']}"),
+    Scenario('quiz.get_quiz_with_answers', 'GET', lambda ctx: f"/api/quizzes/{ctx['quiz_id']}/answers"),
+    Scenario('quiz.generate_quiz', 'POST', '/api/quizzes/generate',
+             lambda ctx: {'topic': 'Past Tense', 'level': 'beginner', 'lesson_id': ctx['lesson_id']}, iterations=20),
+    Scenario('quiz.submit_quiz', 'POST', lambda ctx: f"/api/quizzes/{ctx['quiz_id']}/submit",
+             {'answers': {'1': 'A', '2': 'B'}, 'time_taken_minutes': 3}),
+    Scenario('quiz.submit_quiz_batch', 'POST', '/api/quizzes/submit-batch',
+             lambda ctx: {'attempts': [{'quiz_id': ctx['quiz_id'], 'answers': {'1': 'A', '2': 'B'}}] * 20}),
+    Scenario('quiz.get_quiz_attempts', 'GET', lambda ctx: f"/api/quizzes/{ctx['quiz_id']}/attempts"),
+    Scenario('quiz.get_my_attempts', 'GET', '/api/my-attempts'),
+    Scenario('quiz.update_quiz', 'PUT', lambda ctx: f"/api/quizzes/{ctx['quiz_id']}",
+             {'description': 'Updated by the benchmark'}),
+    Scenario('quiz.delete_quiz', 'DELETE', lambda ctx: f"/api/quizzes/{ctx['victim_quiz_id']}"),
+
+    Scenario('statistics.get_dashboard', 'GET', '/api/statistics/dashboard'),
+    Scenario('statistics.get_progress', 'GET', '/api/statistics/progress?period=all'),
+    Scenario('statistics.get_leaderboard', 'GET', '/api/statistics/leaderboard'),
+    Scenario('statistics.get_achievements', 'GET', '/api/statistics/achievements'),
+    # Connection cost only: the snapshot events, then the stream closes
+    Scenario('statistics.stream_updates', 'GET', '/api/statistics/stream?max_seconds=0'),
+    Scenario('statistics.export_statistics', 'GET', '/api/statistics/export'),
+
+    Scenario('vocabulary.autocomplete', 'GET', lambda ctx: f"/api/vocabulary?prefix={ctx['word'][:2]}"),
+    Scenario('vocabulary.get_word', 'GET', lambda ctx: f"/api/vocabulary/{ctx['word']}"),
+
+    # The dashboard page load as one round trip
+    Scenario('batch.batch', 'POST', '/api/batch', {'requests': [
+        '/api/statistics/dashboard', '/api/statistics/achievements', '/api/statistics/leaderboard',
+        '/api/auth/profile', '/api/my-attempts'
+    ]}),
+]
+
+
+def scenario_name(scenario):
+    path = scenario.path if isinstance(scenario.path, str) else scenario.endpoint.split('.', 1)[1]
+    return f'{scenario.method} {path}' if '?' in path else scenario.endpoint
+
+
+def app_config(db_path):
+    return {
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        # One benchmark user sends every request
+        'ADMISSION_ENABLED': False,
+    }
+
+
+def check_coverage(app):
+    """Every endpoint of the benchmarked blueprints needs a scenario"""
+    covered = {s.endpoint for s in SCENARIOS}
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()
+                      if rule.endpoint.split('.', 1)[0] in BLUEPRINTS} - covered)
+    if missing:
+        raise SystemExit(f"No benchmark scenario for: {', '.join(missing)}")
+
+
+def schema_fingerprint():
+    columns = sorted(f'{t.name}.{c.name}' for t in db.metadata.sorted_tables for c in t.columns)
+    return hashlib.sha1('\n'.join(columns).encode()).hexdigest()[:8]
+
+
+def seeded_database(size, seed):
+    """Path of the cached seeded database for a size preset (created on first use)"""
+    anchor = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'{size}-seed{seed}-{anchor:%Y%m%d}-{schema_fingerprint()}.db')
+    if not os.path.exists(path):
+        sizes = {name: int(value * SIZE_PRESETS[size]) for name, value in DEFAULT_SIZES.items()}
+        print(f'Seeding {size} database {sizes}...', file=sys.stderr)
+        app = create_app(app_config(path + '.tmp'))
+        with app.app_context():
+            init_db()
+            SyntheticDataset(sizes, seed=seed, anchor=anchor, progress=lambda m: print(f'  {m}', file=sys.stderr)).run()
+            db.engine.dispose()
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def run_context(app):
+    """Ids the scenarios point at: the most active user, their latest quiz, etc."""
+    with app.app_context():
+        user = User.query.join(UserStatistics, UserStatistics.user_id == User.id)\
+            .order_by(desc(UserStatistics.total_quizzes_taken)).first()
+        quiz_id = db.session.query(QuizAttempt.quiz_id).filter_by(user_id=user.id)\
+            .order_by(desc(QuizAttempt.completed_at)).limit(1).scalar()
+        quiz = db.session.get(Quiz, quiz_id)
+        return {
+            'run': int(time.time() * 1000) % 10 ** 9,
+            'username': user.username,
+            'user_id': user.id,
+            'token': user.generate_token(SECRET_KEY),
+            'quiz_id': quiz.id,
+            'lesson_id': quiz.lesson_id or db.session.query(func.min(Lesson.id)).scalar(),
+            'victim_lesson_id': db.session.query(func.max(Lesson.id)).scalar(),
+            'victim_quiz_id': db.session.query(func.max(Quiz.id)).scalar(),
+            'word': db.session.query(VocabularyEntry.word).order_by(VocabularyEntry.id).limit(1).scalar() or 'apple',
+        }
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors):
+    ordered = sorted(latencies)
+    return {
+        'n': len(ordered),
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+    }
+
+
+def client_sender(app):
+    client = app.test_client()
+
+    def send(method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+    return send
+
+
+def http_sender(port):
+    def send(method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+    return send
+
+
+def run_scenario(scenario, ctx, send, iterations, concurrency):
+    """Time `iterations` calls (after 2 warmups); setup in prepare() is not timed"""
+    count = scenario.iterations and min(scenario.iterations, iterations) or iterations
+
+    def one(_):
+        local = dict(ctx)
+        if scenario.prepare:
+            local.update(scenario.prepare(local, send))
+        path, body = scenario.render(local)
+        started = time.perf_counter()
+        status, _ = send(scenario.method, path, body, local['token'])
+        return time.perf_counter() - started, status
+
+    for _ in range(2):
+        one(None)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(count)))
+        elapsed = time.perf_counter() - started
+    else:
+        results = [one(i) for i in range(count)]
+        # Sequential: throughput of back-to-back requests
+        elapsed = sum(r[0] for r in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    return summarize([r[0] for r in results], elapsed, errors)
+
+
+class PreforkServer:
+    """N single-threaded werkzeug server processes accepting on one shared socket"""
+
+    def __init__(self, db_path, workers):
+        self.db_path = db_path
+        self.workers = workers
+        self.processes = []
+
+    def __enter__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(512)
+        self.sock.set_inheritable(True)
+        self.port = self.sock.getsockname()[1]
+        fd = self.sock.fileno()
+        for _ in range(self.workers):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '_serve', '--fd', str(fd), '--db', self.db_path],
+                pass_fds=[fd], cwd=BACKEND_DIR, stdout=subprocess.DEVNULL
+            ))
+        # Connections queue on the listening socket until a worker has started
+        send = http_sender(self.port)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                send('GET', '/api/lessons/topics')
+                return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError('benchmark server did not start')
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        self.sock.close()
+
+
+def serve(fd, db_path):
+    """Worker process for PreforkServer"""
+    from werkzeug.serving import BaseWSGIServer
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = create_app(app_config(db_path))
+    server = BaseWSGIServer('127.0.0.1', 0, app, fd=fd)
+    server.serve_forever()
+
+
+def run_suite(args):
+    from bench_async_generation import FakeLLMServer
+    fake = FakeLLMServer(args.llm_delay)
+    os.environ['OPENAI_API_BASE'] = fake.start()
+    os.environ['OPENAI_API_KEY'] = 'fake-key'
+
+    selected = [s for s in SCENARIOS if not args.routes or any(r in scenario_name(s) for r in args.routes.split(','))]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes.split(','):
+            source = seeded_database(size, args.seed)
+            for mode in args.modes.split(','):
+                db_path = os.path.join(tmp, f'{size}-{mode}.db')
+                shutil.copyfile(source, db_path)
+                app = create_app(app_config(db_path))
+                check_coverage(app)
+                with app.app_context():
+                    init_db()
+                ctx = run_context(app)
+                ctx['counter'] = iter(range(10 ** 9))
+                if mode == 'client':
+                    send, concurrency, server = client_sender(app), 1, None
+                else:
+                    server = PreforkServer(db_path, args.workers).__enter__()
+                    send, concurrency = http_sender(server.port), args.concurrency
+                try:
+                    for scenario in selected:
+                        # Routes print debug output; keep stdout for the report
+                        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                            stats = run_scenario(scenario, ctx, send, args.iterations, concurrency)
+                        entry = {'mode': mode, 'size': size, 'route': scenario_name(scenario), **stats}
+                        results.append(entry)
+                        print(f"{mode:6} {size:7} {entry['route']:45} p50 {stats['p50_ms']:9.2f} ms  "
+                              f"p95 {stats['p95_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  "
+                              f"{stats['throughput_rps']} req/s" + (f"  errors {stats['errors']}" if stats['errors'] else ''),
+                              file=sys.stderr)
+                finally:
+                    if server is not None:
+                        server.__exit__(None, None, None)
+
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'llm_delay_s': args.llm_delay,
+            'sizes': {s: {k: int(v * SIZE_PRESETS[s]) for k, v in DEFAULT_SIZES.items()} for s in args.sizes.split(',')},
+        },
+        'results': results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}', file=sys.stderr)
+    print_scaling(results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            return compare(json.load(f), report, args.tolerance, args.min_delta_ms)
+    return 0
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_scaling(results):
+    """p95 per route across sizes, to see how each endpoint scales with data"""
+    sizes = list(dict.fromkeys(r['size'] for r in results))
+    if len(sizes) < 2:
+        return
+    for mode in dict.fromkeys(r['mode'] for r in results):
+        table = {}
+        for r in results:
+            if r['mode'] == mode:
+                table.setdefault(r['route'], {})[r['size']] = r['p95_ms']
+        print(f'\np95 (ms) by size, {mode} mode')
+        print(f"{'route':45}" + ''.join(f'{s:>12}' for s in sizes))
+        for route, by_size in table.items():
+            print(f'{route:45}' + ''.join(f"{by_size.get(s, float('nan')):12.2f}" for s in sizes))
+
+
+def compare(baseline, current, tolerance=0.2, min_delta_ms=1.0):
+    """Print p95/throughput changes; returns 1 if any route regressed beyond tolerance"""
+    base = {(r['mode'], r['size'], r['route']): r for r in baseline['results']}
+    regressions = 0
+    print(f"\nvs baseline {baseline['meta'].get('git_commit')} ({baseline['meta'].get('created_at')})")
+    for r in current['results']:
+        key = (r['mode'], r['size'], r['route'])
+        old = base.get(key)
+        if old is None:
+            continue
+        ratio = r['p95_ms'] / old['p95_ms'] if old['p95_ms'] else float('inf')
+        slower = ratio > 1 + tolerance and r['p95_ms'] - old['p95_ms'] > min_delta_ms
+        throughput_drop = (old.get('throughput_rps') and r.get('throughput_rps')
+                           and r['throughput_rps'] < old['throughput_rps'] * (1 - tolerance)
+                           and r['mode'] == 'http')
+        new_errors = r['errors'] > old['errors']
+        flag = 'REGRESSION' if slower or throughput_drop or new_errors else ('faster' if ratio < 1 - tolerance else '')
+        regressions += flag == 'REGRESSION'
+        print(f"{key[0]:6} {key[1]:7} {key[2]:45} p95 {old['p95_ms']:9.2f} -> {r['p95_ms']:9.2f} ms "
+              f"({ratio:5.2f}x)  {flag}")
+    print(f'{regressions} regression(s) (tolerance {tolerance:.0%}, min delta {min_delta_ms} ms)')
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API route against seeded databases')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the suite')
+    run.add_argument('--sizes', default='small,medium', help=f"comma-separated: {', '.join(SIZE_PRESETS)}")
+    run.add_argument('--modes', default='client,http', help='comma-separated: client, http')
+    run.add_argument('--iterations', type=int, default=50, help='timed requests per route')
+    run.add_argument('--workers', type=int, default=4, help='server processes in http mode')
+    run.add_argument('--concurrency', type=int, default=8, help='concurrent clients in http mode')
+    run.add_argument('--routes', default='', help='only routes whose name contains one of these (comma-separated)')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--llm-delay', type=float, default=0.0, help='fake LLM latency in seconds')
+    run.add_argument('--output', help='write results as JSON')
+    run.add_argument('--baseline', help='compare against this results file (exit 1 on regression)')
+    run.add_argument('--tolerance', type=float, default=0.2)
+    run.add_argument('--min-delta-ms', type=float, default=1.0)
+
+    cmp = commands.add_parser('compare', help='compare two results files')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--tolerance', type=float, default=0.2)
+    cmp.add_argument('--min-delta-ms', type=float, default=1.0)
+
+    worker = commands.add_parser('_serve', help=argparse.SUPPRESS)
+    worker.add_argument('--fd', type=int, required=True)
+    worker.add_argument('--db', required=True)
+
+    args = parser.parse_args()
+    if args.command == '_serve':
+        serve(args.fd, args.db)
+    elif args.command == 'compare':
+        with open(args.baseline) as f, open(args.current) as g:
+            sys.exit(compare(json.load(f), json.load(g), args.tolerance, args.min_delta_ms))
+    else:
+        sys.exit(run_suite(args))
+
+
+if __name__ == '__main__':
+    main()
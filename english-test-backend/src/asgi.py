@@ -0,0 +1,323 @@
+"""
+ASGI entry point: LLM generation endpoints run natively async.
+
+    uvicorn 'src.asgi:create_asgi_app' --factory --port 5001
+
+POST /api/lessons/generate and /api/quizzes/generate are split into phases
+(see GenerationSpec): validation and persistence run on a thread pool, while
+the LLM call is awaited with AsyncOpenAI, so one worker can keep hundreds of
+generations in flight. GET /api/statistics/stream is served the same way: the
+subscription and snapshot are taken on the pool, then the coroutine awaits
+the broker's events, so idle streams hold no thread. Every other request
+runs the regular Flask WSGI app on the same thread pool. As with @idempotent, an Idempotency-Key is claimed in
+the first phase (a retry waits for it on the pool) and its response stored in
+the last one, so a retried generation never calls the LLM twice. Admission
+keeps its per-user limits, but the global cap on generations is raised to
+ASGI_GENERATE_CONCURRENCY and queued requests await their slot on the loop.
+"""
+import asyncio
+import functools
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import g, jsonify, request
+from src.main import create_app
+from src.models.user import User, db
+from src.routes.user import authenticate_request
+from src.routes.lesson import lesson_generation
+from src.routes.quiz import quiz_generation
+from src.routes.statistics import event_stream_response, open_live_stream
+from src.services.admission import get_admission, too_many_requests, Rejected, GENERATE
+from src.services.idempotency import claim_request, get_idempotency_store
+from src.services.live import aevent_stream
+from src.services.metrics import start_request
+
+DEFAULT_THREADS = 32
+DEFAULT_GENERATE_CONCURRENCY = 256
+STREAM_ROUTE = ('GET', '/api/statistics/stream')
+
+logger = logging.getLogger(__name__)
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ from an ASGI HTTP scope and the full request body"""
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        value = value.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is fully buffered, so its length is known even for chunked uploads
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    return environ
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+class AsgiApp:
+    """Route generation endpoints to async handlers and everything else to Flask"""
+
+    def __init__(self, flask_app, threads=DEFAULT_THREADS, generate_concurrency=DEFAULT_GENERATE_CONCURRENCY):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        # A generation holds no thread while it waits on the LLM: the WSGI cap would only throttle the loop
+        self.admission = flask_app.extensions['admission']
+        self.generate_gated = GENERATE in self.admission.gates
+        if self.generate_gated:
+            self.admission.use_async_gate(GENERATE, generate_concurrency)
+        self.async_routes = {
+            ('POST', '/api/lessons/generate'): lesson_generation,
+            ('POST', '/api/quizzes/generate'): quiz_generation,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        body = await read_body(receive)
+        spec = self.async_routes.get((scope['method'], scope['path']))
+        if spec is not None:
+            await self.run_generation(spec, scope, body, send)
+        elif (scope['method'], scope['path']) == STREAM_ROUTE:
+            await self.run_stream(scope, body, receive, send)
+        else:
+            await self.run_wsgi(build_environ(scope, body), send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def in_thread(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def run_wsgi(self, environ, send):
+        """Run the Flask app on the thread pool, streaming its body back"""
+        loop = asyncio.get_running_loop()
+
+        def call():
+            started = {}
+
+            def start_response(status, headers, exc_info=None):
+                started['status'] = int(status.split(' ', 1)[0])
+                started['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+
+            def forward(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            result = self.flask_app(environ, start_response)
+            try:
+                forward({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+                for chunk in result:
+                    if chunk:
+                        forward({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                forward({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        await self.in_thread(call)
+
+    async def run_generation(self, spec, scope, body, send):
+        # Phase 1: authenticate and validate (database access, so on a thread)
+        outcome = await self.in_thread(self._begin, spec, build_environ(scope, body))
+        if 'response' not in outcome:
+            ticket, claimed = outcome['ticket'], outcome['claimed']
+            finished = False
+            try:
+                try:
+                    if ticket is not None and self.generate_gated:
+                        await self.admission.enter_gate(ticket, GENERATE)
+                    rejection = None
+                except Rejected as e:
+                    rejection = e
+                if rejection is not None:
+                    outcome = await self.in_thread(self._reject, build_environ(scope, body), rejection, claimed)
+                else:
+                    # Phase 2: wait on the LLM without holding a thread
+                    try:
+                        result = await spec.agenerate(outcome['params'])
+                    except Exception as e:
+                        result = e
+                    # Phase 3: persist and render (database access, so on a thread)
+                    outcome = await self.in_thread(
+                        self._finish, spec, build_environ(scope, body), outcome['user_id'], outcome['params'], result,
+                        outcome['started'], claimed
+                    )
+                finished = True
+            finally:
+                if ticket is not None:
+                    ticket.release()
+                if claimed is not None and not finished:
+                    # Cancelled (client gone): free the key so a retry runs for real
+                    self.executor.submit(self._release_claim, claimed)
+        status, headers, body = outcome['response']
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def run_stream(self, scope, body, receive, send):
+        """Server-Sent Events: open the stream on a thread, then relay the broker's events from the loop"""
+        outcome = await self.in_thread(self._open_stream, build_environ(scope, body))
+        if 'response' in outcome:
+            status, headers, body = outcome['response']
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        events = aevent_stream(*outcome['stream'])
+        status, headers = outcome['start']
+
+        async def relay():
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            async for text in events:
+                await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        relaying, watching = asyncio.ensure_future(relay()), asyncio.ensure_future(disconnected())
+        try:
+            await asyncio.wait({relaying, watching}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (relaying, watching):
+                task.cancel()
+            await asyncio.gather(relaying, watching, return_exceptions=True)
+            await events.aclose()
+            # aclose() runs nothing if the relay was cancelled before its first event
+            hub, subscription = outcome['stream'][:2]
+            hub.unsubscribe(subscription)
+        if not relaying.cancelled() and relaying.exception() is not None:
+            logger.warning('Live stream ended with %r', relaying.exception())
+
+    def _open_stream(self, environ):
+        with self.flask_app.request_context(environ):
+            rv = self.flask_app.preprocess_request()
+            if rv is None:
+                current_user, rv = authenticate_request()
+            if rv is None:
+                try:
+                    rv, stream = open_live_stream(current_user, holds_thread=False)
+                except Exception as e:
+                    rv = jsonify({'error': 'Failed to open the update stream', 'details': str(e)}), 500
+            if rv is not None:
+                return {'response': self._render(rv)}
+            # Headers of the route's response (after_request hooks included); the body comes from the loop
+            status, headers, _ = self._render(event_stream_response(iter(())))
+            return {'start': (status, headers), 'stream': stream}
+
+    def _begin(self, spec, environ):
+        with self.flask_app.request_context(environ):
+            rv = self.flask_app.preprocess_request()
+            if rv is None:
+                current_user, rv = authenticate_request()
+            claimed = None
+            if rv is None:
+                # Same order as the decorators: token_required, idempotent, admission_control
+                rv, claimed = claim_request(current_user)
+            ticket = None
+            if rv is None and self.flask_app.config.get('ADMISSION_ENABLED', True):
+                try:
+                    ticket = get_admission().admit(current_user.id, GENERATE)
+                except Rejected as e:
+                    rv = too_many_requests(e)
+            if rv is None:
+                try:
+                    params, rv = spec.prepare(current_user, request.get_json())
+                except Exception as e:
+                    rv = spec.failure(e)
+            if rv is not None:
+                if ticket is not None:
+                    ticket.release()
+                return {'response': self._render(rv, claimed)}
+            # The admission ticket and the idempotency claim stay held until the LLM call and save are done
+            return {'user_id': current_user.id, 'params': params, 'ticket': ticket, 'claimed': claimed,
+                    'started': g.get('metrics_started')}
+
+    def _finish(self, spec, environ, user_id, params, result, started, claimed):
+        with self.flask_app.request_context(environ):
+            if started is not None:
+                # Latency metrics cover the whole request, LLM wait included
+                start_request(started)
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                current_user = db.session.get(User, user_id)
+                # As authenticate_request would: after_request hooks (replica pins) see who wrote
+                g.authenticated = (request.headers.get('Authorization'), current_user)
+                rv = spec.save(current_user, params, result)
+            except Exception as e:
+                rv = spec.failure(e)
+            return {'response': self._render(rv, claimed)}
+
+    def _reject(self, environ, rejection, claimed):
+        with self.flask_app.request_context(environ):
+            return {'response': self._render(too_many_requests(rejection), claimed)}
+
+    def _release_claim(self, claimed):
+        with self.flask_app.app_context():
+            get_idempotency_store().release(claimed)
+
+    def _render(self, rv, claimed=None):
+        """Turn a view return value into (status, headers, body): stored for its key, then after_request hooks"""
+        response = self.flask_app.make_response(rv)
+        if claimed is not None:
+            get_idempotency_store().complete(claimed, response)
+        response = self.flask_app.process_response(response)
+        headers = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in response.headers.items()]
+        return response.status_code, headers, response.get_data()
+
+
+def create_asgi_app(config=None):
+    """ASGI application factory (uvicorn --factory)"""
+    flask_app = create_app(config)
+    return AsgiApp(flask_app, flask_app.config.get('ASGI_THREADS', DEFAULT_THREADS),
+                   flask_app.config.get('ASGI_GENERATE_CONCURRENCY', DEFAULT_GENERATE_CONCURRENCY))
@@ -0,0 +1,156 @@
+import click
+import json
+from src.models.user import db
+
+
+def init_db():
+    """Create all tables that do not exist yet and fill the derived lesson indexes"""
+    from src.services.search import create_search_index
+    from src.services.vocabulary import rebuild_vocabulary_index
+    from src.services.similarity import rebuild_similarity_index
+    from src.services.catalog import rebuild_catalog_facets
+    from src.services.achievements import rebuild_achievements
+    from src.models.vocabulary import VocabularyEntry
+    from src.models.similarity import SimilaritySignature
+    from src.models.catalog import CatalogFacet
+    from src.models.achievement import UserAchievement
+    # The primary only: a read replica gets its schema from replication
+    db.create_all(bind_key=None)
+    with db.engine.begin() as conn:
+        create_search_index(conn)
+        # Backfill derived tables for lessons created before they existed
+        if conn.execute(db.select(VocabularyEntry.id).limit(1)).first() is None:
+            rebuild_vocabulary_index(conn)
+        if conn.execute(db.select(SimilaritySignature.id).limit(1)).first() is None:
+            rebuild_similarity_index(conn)
+        if conn.execute(db.select(CatalogFacet.id).limit(1)).first() is None:
+            rebuild_catalog_facets(conn)
+        # Award badges users earned before awards were persisted
+        if conn.execute(db.select(UserAchievement.id).limit(1)).first() is None:
+            rebuild_achievements(conn)
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create the database schema."""
+    init_db()
+    click.echo('Database schema created.')
+
+
+@click.command('seed-synthetic')
+@click.option('--users', type=int, default=100000, show_default=True)
+@click.option('--lessons', type=int, default=10000, show_default=True)
+@click.option('--quizzes', type=int, default=50000, show_default=True)
+@click.option('--attempts', type=int, default=5000000, show_default=True)
+@click.option('--scale', type=float, default=1.0, show_default=True, help='Multiply every size (e.g. 0.01 for a quick run).')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Date the history ends at (default: today). Fix it for byte-identical datasets.')
+@click.option('--distributions', type=click.File('r'), default=None,
+              help='JSON file overriding entries of DEFAULT_DISTRIBUTIONS.')
+@click.option('--batch-size', type=int, default=20000, show_default=True)
+def seed_synthetic_command(users, lessons, quizzes, attempts, scale, seed, anchor, distributions, batch_size):
+    """Bulk-insert a deterministic synthetic dataset for load testing."""
+    from src.services.synthetic import SyntheticDataset
+    init_db()
+    sizes = {name: int(value * scale) for name, value in
+             (('users', users), ('lessons', lessons), ('quizzes', quizzes), ('attempts', attempts))}
+    dataset = SyntheticDataset(
+        sizes, seed=seed, distributions=json.load(distributions) if distributions else None,
+        anchor=anchor, batch_size=batch_size, progress=click.echo
+    )
+    counts = dataset.run()
+    click.echo(f"Seeded in {counts['seconds']}s (seed={seed}, anchor={dataset.anchor:%Y-%m-%d}).")
+
+
+@click.command('rebuild-search-index')
+def rebuild_search_command():
+    """Re-index every active lesson for full-text search."""
+    from src.services.search import create_search_index, rebuild_search_index
+    with db.engine.begin() as conn:
+        if not create_search_index(conn):
+            raise click.ClickException('Full-text search needs SQLite with FTS5.')
+        count = rebuild_search_index(conn)
+    click.echo(f'Indexed {count} lessons.')
+
+
+@click.command('rebuild-vocabulary-index')
+def rebuild_vocabulary_command():
+    """Re-extract the vocabulary of every active lesson."""
+    from src.services.vocabulary import rebuild_vocabulary_index
+    with db.engine.begin() as conn:
+        count = rebuild_vocabulary_index(conn)
+    click.echo(f'Indexed {count} vocabulary entries.')
+
+
+@click.command('rebuild-similarity-index')
+def rebuild_similarity_command():
+    """Recompute MinHash signatures of every active lesson and quiz question."""
+    from src.services.similarity import rebuild_similarity_index
+    with db.engine.begin() as conn:
+        rebuild_similarity_index(conn, progress=click.echo)
+
+
+@click.command('rebuild-catalog-facets')
+def rebuild_catalog_facets_command():
+    """Recount lessons and quizzes per topic, level and quiz type."""
+    from src.services.catalog import rebuild_catalog_facets
+    with db.engine.begin() as conn:
+        count = rebuild_catalog_facets(conn)
+    click.echo(f'Wrote {count} catalog facets.')
+
+
+@click.command('rebuild-achievements')
+def rebuild_achievements_command():
+    """Re-award every badge from users' statistics and quiz attempts."""
+    from src.services.achievements import rebuild_achievements
+    with db.engine.begin() as conn:
+        count = rebuild_achievements(conn)
+    click.echo(f'Awarded {count} achievements.')
+
+
+@click.command('archive-attempts')
+@click.option('--batch-size', type=int, default=5000, show_default=True)
+@click.option('--vacuum', is_flag=True, help='Rebuild the SQLite file afterwards to give the freed pages back.')
+def archive_attempts_command(batch_size, vacuum):
+    """Move attempts older than ATTEMPT_ARCHIVE_AFTER_DAYS to the archive and its rollups."""
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from src.services.archive import archive_after_days, archive_attempts
+    days = archive_after_days(current_app)
+    count = archive_attempts(db.engine, datetime.utcnow() - timedelta(days=days), batch_size, progress=click.echo)
+    if vacuum and count and db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+    click.echo(f'Archived {count} attempts older than {days} days.')
+
+
+@click.command('sync-replica')
+@click.option('--interval', type=float, default=None, help='Keep copying every INTERVAL seconds.')
+def sync_replica_command(interval):
+    """Copy the primary SQLite database into the 'replica' bind, a local stand-in for replication."""
+    import time
+    from src.services.replica import REPLICA_BIND, sync_sqlite_replica
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        raise click.ClickException(f"SQLALCHEMY_BINDS has no '{REPLICA_BIND}' entry.")
+    if db.engine.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException('sync-replica only copies SQLite databases; use the server\'s replication.')
+    while True:
+        sync_sqlite_replica(db.engine, replica)
+        click.echo(f'Replica synced from {db.engine.url.database}.')
+        if interval is None:
+            return
+        time.sleep(interval)
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_synthetic_command)
+    app.cli.add_command(rebuild_search_command)
+    app.cli.add_command(rebuild_vocabulary_command)
+    app.cli.add_command(rebuild_similarity_command)
+    app.cli.add_command(rebuild_catalog_facets_command)
+    app.cli.add_command(rebuild_achievements_command)
+    app.cli.add_command(archive_attempts_command)
+    app.cli.add_command(sync_replica_command)
@@ -3,56 +3,151 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, current_app
 from flask_cors import CORS
 from src.models.user import db
 from src.models.lesson import Lesson
 from src.models.quiz import Quiz, QuizAttempt
 from src.models.statistics import UserStatistics
+from src.models.vocabulary import VocabularyEntry
+from src.models.similarity import SimilaritySignature, SimilarityBand
+from src.models.catalog import CatalogFacet
+from src.models.idempotency import IdempotencyKey
+from src.models.achievement import UserAchievement
+from src.models.archive import ArchivedAttempt, AttemptRollup
+from src.models.replica import ReplicaHeartbeat, ReplicaWrite
 from src.routes.user import user_bp
 from src.routes.lesson import lesson_bp
 from src.routes.quiz import quiz_bp
 from src.routes.statistics import statistics_bp
+from src.routes.system import system_bp
+from src.routes.vocabulary import vocabulary_bp
+from src.routes.batch import batch_bp
+from src.services.response_cache import init_response_cache
+from src.services.compression import init_compression
+from src.services.admission import init_admission
+from src.services.metrics import init_metrics
+from src.services.profiling import init_profiling
+from src.services.slow_queries import init_slow_queries
+from src.services.search import init_search
+from src.services.vocabulary import init_vocabulary
+from src.services.similarity import init_similarity
+from src.services.catalog import init_catalog
+from src.services.idempotency import init_idempotency
+from src.services.live import init_live
+from src.services.replica import init_replica
+from src.commands import register_commands, init_db
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'asdf#FGSgvasgf$5$WGT',
+    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}",
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+}
 
-# Enable CORS for all routes
-CORS(app, origins=[
-    "http://localhost:3000",  # local dev
-    "https://english-test-fullstack.vercel.app"  # deployed frontend
-])
 
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(lesson_bp, url_prefix='/api')
-app.register_blueprint(quiz_bp, url_prefix='/api')
-app.register_blueprint(statistics_bp, url_prefix='/api')
+def create_app(config=None):
+    """Create the Flask application.
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+    config: optional mapping overriding DEFAULT_CONFIG (e.g. a test database URI).
+    The schema is not created here; run `flask --app src.main init-db`.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config.from_mapping(DEFAULT_CONFIG)
+    if config:
+        app.config.from_mapping(config)
+
+    # Enable CORS for all routes
+    CORS(app, origins=[
+        "http://localhost:3000",  # local dev
+        "https://english-test-fullstack.vercel.app"  # deployed frontend
+    ])
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(lesson_bp, url_prefix='/api')
+    app.register_blueprint(quiz_bp, url_prefix='/api')
+    app.register_blueprint(statistics_bp, url_prefix='/api')
+    app.register_blueprint(vocabulary_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(system_bp, url_prefix='/api')
+
+    db.init_app(app)
+
+    # Request/SQL/LLM metrics at /metrics; first so its after_request hook runs last
+    init_metrics(app)
+
+    # Opt-in cProfile/stack-sample capture (X-Profile header or sampling)
+    init_profiling(app)
+
+    # Statements over SLOW_QUERY_THRESHOLD_MS with parameters, route and query plan
+    init_slow_queries(app)
+
+    # Pre-serialized lesson/quiz payloads
+    init_response_cache(app)
+
+    # FTS5 lesson search kept in sync with lesson writes
+    init_search(app)
+
+    # Lesson vocabulary table and in-memory prefix index
+    init_vocabulary(app)
+
+    # MinHash/LSH index for related lessons and duplicate questions
+    init_similarity(app)
+
+    # Materialized lesson/quiz counts per topic, level and quiz type
+    init_catalog(app)
+
+    # Idempotency-Key replay for generate and submit routes
+    init_idempotency(app)
+
+    # Statistics and catalog reads on the 'replica' bind, within a staleness bound
+    init_replica(app)
+
+    # Server-Sent Events broker for leaderboard and statistics pushes
+    init_live(app)
+
+    # Rate limits and concurrency caps for generation, export and statistics routes
+    init_admission(app)
+
+    # gzip/brotli for API responses, precompressed static assets
+    init_compression(app)
+
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+
+    register_commands(app)
+    return app
 
-# Create all tables
-with app.app_context():
-    db.create_all()
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if current_app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    # Assets are resolved from the manifest built at startup, no filesystem probing
+    manifest = current_app.extensions['static_manifest']
+    asset = manifest.get(path) if path != "" else None
+    if asset is None:
+        asset = manifest.get('index.html')
+        if asset is None:
             return "index.html not found", 404
+    return asset.to_response()
+
+
+_app = None
+
+
+def __getattr__(name):
+    # Keep `src.main:app` working (gunicorn, flask run) without building an app on import
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
+    app = create_app()
+    # The development server creates missing tables itself
+    with app.app_context():
+        init_db()
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -7,4 +7,11 @@ from .user import User
 from .lesson import Lesson
 from .quiz import Quiz, QuizAttempt
 from .statistics import UserStatistics
+from .vocabulary import VocabularyEntry
+from .similarity import SimilaritySignature, SimilarityBand
+from .catalog import CatalogFacet
+from .idempotency import IdempotencyKey
+from .achievement import UserAchievement
+from .archive import ArchivedAttempt, AttemptRollup
+from .replica import ReplicaHeartbeat
 
@@ -0,0 +1,15 @@
+from .user import db
+
+
+class UserAchievement(db.Model):
+    """A badge a user earned, with the time it was actually earned"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    achievement = db.Column(db.String(50), nullable=False)
+    earned_at = db.Column(db.DateTime, nullable=False)
+
+    # Also the index behind reading a user's achievements
+    __table_args__ = (db.UniqueConstraint('user_id', 'achievement'),)
+
+    def __repr__(self):
+        return f'<UserAchievement {self.user_id} {self.achievement}>'
@@ -0,0 +1,76 @@
+from .user import db
+import json
+import zlib
+
+
+class ArchivedAttempt(db.Model):
+    """A quiz attempt moved out of quiz_attempt by archive-attempts; same id and fields"""
+    __tablename__ = 'quiz_attempt_archive'
+
+    # The attempt's original id
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    # zlib-compressed JSON of the user's answers
+    answers = db.Column(db.LargeBinary, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    time_taken_minutes = db.Column(db.Float, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=False)
+    is_passed = db.Column(db.Boolean, nullable=False)
+
+    quiz = db.relationship('Quiz', viewonly=True)
+
+    __table_args__ = (db.Index('ix_quiz_attempt_archive_user_completed', 'user_id', 'completed_at'),)
+
+    def __repr__(self):
+        return f'<ArchivedAttempt {self.user_id}-{self.quiz_id}>'
+
+    @staticmethod
+    def pack_answers(answers_json):
+        return zlib.compress(answers_json.encode(), 6)
+
+    def get_answers(self):
+        try:
+            return json.loads(zlib.decompress(self.answers))
+        except (zlib.error, json.JSONDecodeError):
+            return {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'quiz_id': self.quiz_id,
+            'answers': self.get_answers(),
+            'score': self.score,
+            'time_taken_minutes': self.time_taken_minutes,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'is_passed': self.is_passed
+        }
+
+
+class AttemptRollup(db.Model):
+    """Totals of a user's archived attempts at one quiz in one month, for statistics"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM of completed_at
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    perfect = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    # Sum of int(score), as experience points are counted
+    experience = db.Column(db.Integer, nullable=False, default=0)
+    time_spent = db.Column(db.Float, nullable=False, default=0)
+    # Grading at archive time, for average accuracy and topic performance
+    correct_answers = db.Column(db.Integer, nullable=False, default=0)
+    total_questions = db.Column(db.Integer, nullable=False, default=0)
+    accuracy_sum = db.Column(db.Float, nullable=False, default=0)
+    best_accuracy = db.Column(db.Float, nullable=False, default=0)
+    first_completed_at = db.Column(db.DateTime, nullable=True)
+    first_perfect_at = db.Column(db.DateTime, nullable=True)
+
+    # Also the index behind per-user totals; the quiz index serves Quiz.archived_attempts
+    __table_args__ = (db.UniqueConstraint('user_id', 'quiz_id', 'month'), db.Index('ix_attempt_rollup_quiz', 'quiz_id'))
+
+    def __repr__(self):
+        return f'<AttemptRollup {self.user_id}-{self.quiz_id} {self.month}>'
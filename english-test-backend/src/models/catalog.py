@@ -0,0 +1,17 @@
+from .user import db
+
+
+class CatalogFacet(db.Model):
+    """Number of active lessons or quizzes sharing a topic, level and quiz type"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # lesson, quiz
+    # '' when unknown (quizzes without a lesson, lessons have no quiz type)
+    topic = db.Column(db.String(100), nullable=False, default='')
+    level = db.Column(db.String(20), nullable=False, default='')
+    quiz_type = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'topic', 'level', 'quiz_type'),)
+
+    def __repr__(self):
+        return f'<CatalogFacet {self.kind} {self.topic}/{self.level}/{self.quiz_type}: {self.count}>'
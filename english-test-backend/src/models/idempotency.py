@@ -0,0 +1,23 @@
+from .user import db
+
+
+class IdempotencyKey(db.Model):
+    """A client's Idempotency-Key: claimed while the request runs, then its stored response"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # sha256 of method, path and body: a key reused for another request is refused
+    request_hash = db.Column(db.String(64), nullable=False)
+    state = db.Column(db.String(20), nullable=False, default='in_flight')  # in_flight, done
+    # An in-flight claim older than this is considered abandoned (worker died)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    response_content_type = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'key'),)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key} {self.state}>'
@@ -1,5 +1,6 @@
 from .user import db
 from datetime import datetime
+from sqlalchemy import func
 import json
 
 class Lesson(db.Model):
@@ -21,9 +22,40 @@ class Lesson(db.Model):
     # Relations
     quizzes = db.relationship('Quiz', backref='lesson', lazy=True)
 
+    # Serializable fields, in response order
+    FIELDS = (
+        'id', 'title', 'description', 'content', 'level', 'topic', 'duration_minutes',
+        'created_at', 'updated_at', 'is_active', 'generated_by_ai', 'quiz_count'
+    )
+    # Fields shown by list views (everything except the content blob)
+    SUMMARY_FIELDS = tuple(f for f in FIELDS if f != 'content')
+    # Count fields backed by a relationship
+    COUNTED_RELATIONS = {'quiz_count': 'quizzes'}
+    # Columns added to a counted relation's length
+    COUNT_OFFSETS = {}
+
     def __repr__(self):
         return f'<Lesson {self.title}>'
 
+    @classmethod
+    def get_version(cls, lesson_id):
+        """Cheap version lookup without loading content.
+
+        Returns (last_modified, version_parts) or None if the lesson does not exist.
+        The quiz count is part of the version because to_dict exposes it.
+        """
+        from .quiz import Quiz
+        row = db.session.query(
+            cls.updated_at, cls.is_active, func.count(Quiz.id), func.max(Quiz.created_at)
+        ).outerjoin(Quiz, Quiz.lesson_id == cls.id)\
+         .filter(cls.id == lesson_id).group_by(cls.id).first()
+        if row is None:
+            return None
+        updated_at, is_active, quiz_count, last_quiz_at = row
+        timestamps = [t for t in (updated_at, last_quiz_at) if t is not None]
+        last_modified = max(timestamps) if timestamps else None
+        return last_modified, ('lesson', lesson_id, updated_at, is_active, quiz_count)
+
     def set_content(self, content_dict):
         """Set content as JSON string"""
         self.content = json.dumps(content_dict)
@@ -35,19 +67,16 @@ class Lesson(db.Model):
         except json.JSONDecodeError:
             return {}
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'content': self.get_content(),
-            'level': self.level,
-            'topic': self.topic,
-            'duration_minutes': self.duration_minutes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_active': self.is_active,
-            'generated_by_ai': self.generated_by_ai,
-            'quiz_count': len(self.quizzes)
-        }
+    def _serialize_field(self, field):
+        if field == 'content':
+            return self.get_content()
+        if field in ('created_at', 'updated_at'):
+            value = getattr(self, field)
+            return value.isoformat() if value else None
+        if field == 'quiz_count':
+            return len(self.quizzes)
+        return getattr(self, field)
 
+    def to_dict(self, fields=None):
+        """Serialize the lesson; only the requested fields are computed"""
+        return {field: self._serialize_field(field) for field in (fields or self.FIELDS)}
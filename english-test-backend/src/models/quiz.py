@@ -1,5 +1,7 @@
 from .user import db
+from .archive import AttemptRollup
 from datetime import datetime
+from sqlalchemy import func, select
 import json
 
 
@@ -28,10 +30,49 @@ class Quiz(db.Model):
 
     # Relations
     attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True)
+    # Attempts moved to quiz_attempt_archive, summed from their monthly rollups
+    archived_attempts = db.column_property(
+        select(func.coalesce(func.sum(AttemptRollup.attempts), 0))
+        .where(AttemptRollup.quiz_id == id).correlate_except(AttemptRollup).scalar_subquery()
+    )
+
+    # Serializable fields, in response order
+    FIELDS = (
+        'id', 'lesson_id', 'title', 'description', 'questions', 'level', 'quiz_type',
+        'time_limit_minutes', 'passing_score', 'created_at', 'updated_at', 'is_active',
+        'generated_by_ai', 'attempt_count'
+    )
+    # Fields shown by list views (everything except the questions blob)
+    SUMMARY_FIELDS = tuple(f for f in FIELDS if f != 'questions')
+    # Count fields backed by a relationship
+    COUNTED_RELATIONS = {'attempt_count': 'attempts'}
+    # Columns added to a counted relation's length
+    COUNT_OFFSETS = {'attempt_count': 'archived_attempts'}
 
     def __repr__(self):
         return f'<Quiz {self.title}>'
 
+    @classmethod
+    def get_version(cls, quiz_id):
+        """Cheap version lookup without loading questions.
+
+        Returns (last_modified, version_parts) or None if the quiz does not exist.
+        The attempt count (archived attempts included) is part of the version because
+        to_dict exposes it, so archiving does not change it.
+        """
+        row = db.session.query(
+            cls.updated_at, cls.is_active, func.count(QuizAttempt.id), func.max(QuizAttempt.completed_at),
+            cls.archived_attempts
+        ).outerjoin(QuizAttempt, QuizAttempt.quiz_id == cls.id)\
+         .filter(cls.id == quiz_id).group_by(cls.id).first()
+        if row is None:
+            return None
+        updated_at, is_active, hot_attempts, last_attempt_at, archived_attempts = row
+        attempt_count = hot_attempts + archived_attempts
+        timestamps = [t for t in (updated_at, last_attempt_at) if t is not None]
+        last_modified = max(timestamps) if timestamps else None
+        return last_modified, ('quiz', quiz_id, updated_at, is_active, attempt_count)
+
     def set_questions(self, questions_list):
         """Set questions as JSON string"""
         self.questions = json.dumps(questions_list)
@@ -57,8 +98,9 @@ class Quiz(db.Model):
             safe_questions.append(safe_q)
         return safe_questions
 
-    def calculate_score(self, user_answers, timings=None):
-        questions = self.get_questions()
+    def calculate_score(self, user_answers, timings=None, questions=None):
+        """(score, correct_answers); pass `questions` to reuse an already decoded list"""
+        questions = self.get_questions() if questions is None else questions
         if not questions or not isinstance(questions, list):
             return 0, 0  # (score, correct_answers)
         if not isinstance(user_answers, dict):
@@ -77,22 +119,21 @@ class Quiz(db.Model):
                     total_score += 5
         return total_score, correct_answers
 
-    def to_dict(self, include_answers=False):
+    def _serialize_field(self, field, include_answers):
+        if field == 'questions':
+            return self.get_questions() if include_answers else self.get_questions_without_answers()
+        if field in ('created_at', 'updated_at'):
+            value = getattr(self, field)
+            return value.isoformat() if value else None
+        if field == 'attempt_count':
+            return len(self.attempts) + self.archived_attempts
+        return getattr(self, field)
+
+    def to_dict(self, include_answers=False, fields=None):
+        """Serialize the quiz; only the requested fields are computed"""
         return {
-            'id': self.id,
-            'lesson_id': self.lesson_id,
-            'title': self.title,
-            'description': self.description,
-            'questions': self.get_questions() if include_answers else self.get_questions_without_answers(),
-            'level': self.level,
-            'quiz_type': self.quiz_type,
-            'time_limit_minutes': self.time_limit_minutes,
-            'passing_score': self.passing_score,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_active': self.is_active,
-            'generated_by_ai': self.generated_by_ai,
-            'attempt_count': len(self.attempts)
+            field: self._serialize_field(field, include_answers)
+            for field in (fields or self.FIELDS)
         }
 
 
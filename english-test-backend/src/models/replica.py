@@ -0,0 +1,21 @@
+from .user import db
+
+
+class ReplicaHeartbeat(db.Model):
+    """Single row the primary rewrites; its copy on a read replica tells how far behind the replica is"""
+    id = db.Column(db.Integer, primary_key=True)
+    # time.time() on the primary when written
+    beat_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ReplicaHeartbeat {self.beat_at}>'
+
+
+class ReplicaWrite(db.Model):
+    """A user's last write on the primary: every worker keeps the user's reads there until the replica has it"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    # time.time() on the primary after the write committed
+    written_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ReplicaWrite {self.user_id} {self.written_at}>'
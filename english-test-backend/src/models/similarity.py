@@ -0,0 +1,30 @@
+from .user import db
+
+
+class SimilaritySignature(db.Model):
+    """MinHash signature of a lesson (item 0) or of one question of a quiz (item = question index)"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # lesson, question
+    object_id = db.Column(db.Integer, nullable=False)
+    item = db.Column(db.Integer, nullable=False, default=0)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'object_id', 'item'),)
+
+    def __repr__(self):
+        return f'<SimilaritySignature {self.kind} {self.object_id}.{self.item}>'
+
+
+class SimilarityBand(db.Model):
+    """One LSH bucket a signature falls in; documents sharing a bucket are candidates"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    band = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    item = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_similarity_band_bucket', 'kind', 'band', 'bucket'),
+        db.Index('ix_similarity_band_object', 'kind', 'object_id'),
+    )
@@ -1,7 +1,12 @@
 from .user import db
+from contextlib import nullcontext
 from datetime import datetime
 from sqlalchemy import func
 
+
+def _untimed(name):
+    return nullcontext()
+
 class UserStatistics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -32,6 +37,9 @@ class UserStatistics(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Computed sections of to_dict that can be requested selectively
+    SECTIONS = ('level_progress', 'average_score', 'topic_performance')
+
     def __repr__(self):
         return f'<UserStatistics {self.user_id}>'
 
@@ -80,22 +88,24 @@ class UserStatistics(db.Model):
 
     def update_streak(self):
         """Update daily streak"""
-        today = datetime.utcnow().date()
-        
+        self.record_activity(datetime.utcnow().date())
+
+    def record_activity(self, day):
+        """Count activity on `day` in the streak (days before the last activity change nothing)"""
         if self.last_activity_date is None:
             self.current_streak_days = 1
-            self.last_activity_date = today
-        elif self.last_activity_date == today:
-            # Already counted today
+            self.last_activity_date = day
+        elif day <= self.last_activity_date:
+            # Already counted
             return
-        elif (today - self.last_activity_date).days == 1:
+        elif (day - self.last_activity_date).days == 1:
             # Consecutive day
             self.current_streak_days += 1
-            self.last_activity_date = today
+            self.last_activity_date = day
         else:
             # Streak broken
             self.current_streak_days = 1
-            self.last_activity_date = today
+            self.last_activity_date = day
         
         # Update longest streak
         if self.current_streak_days > self.longest_streak_days:
@@ -129,60 +139,84 @@ class UserStatistics(db.Model):
             'xp_needed': None
         }
 
-    def get_topic_performance(self):
-        from src.models.quiz import QuizAttempt
-        attempts = QuizAttempt.query.filter_by(user_id=self.user_id).all()
-        topic_accuracies = {}
+    def _grade_attempts(self):
+        """Grade all of the user's attempts once.
+
+        Returns [(topic, correct_answers, total_questions, accuracy_sum, attempts, best_accuracy)]:
+        one entry per hot attempt, plus one per topic for archived attempts, graded at archive time.
+        """
+        from src.models.quiz import Quiz, QuizAttempt
+        from src.services.archive import archived_grades
+        from sqlalchemy.orm import joinedload
+        attempts = QuizAttempt.query.options(
+            joinedload(QuizAttempt.quiz).joinedload(Quiz.lesson)
+        ).filter_by(user_id=self.user_id).all()
+        graded = []
+        questions_by_quiz = {}
         for attempt in attempts:
-            topic = None
-            if attempt.quiz and attempt.quiz.lesson and hasattr(attempt.quiz.lesson, 'topic'):
-                topic = attempt.quiz.lesson.topic.lower()
+            quiz = attempt.quiz
+            if not quiz:
+                continue
+            # Decode each quiz's questions once, however many attempts reference it
+            if quiz.id not in questions_by_quiz:
+                questions_by_quiz[quiz.id] = quiz.get_questions()
+            questions = questions_by_quiz[quiz.id]
+            _, correct_answers = quiz.calculate_score(attempt.get_answers(), questions=questions)
+            topic = quiz.lesson.topic.lower() if quiz.lesson and quiz.lesson.topic else None
+            total_questions = len(questions)
+            accuracy = (correct_answers / total_questions) * 100 if total_questions else 0
+            graded.append((topic, correct_answers, total_questions, accuracy, 1, accuracy))
+        graded.extend(tuple(row) for row in archived_grades(db.session, self.user_id))
+        return graded
+
+    def get_topic_performance(self, graded=None):
+        if graded is None:
+            graded = self._grade_attempts()
+        topic_accuracies = {}
+        for topic, _, _, accuracy_sum, attempts, best_accuracy in graded:
             if not topic:
                 continue
-            # Calculate accuracy for this attempt
-            if attempt.quiz:
-                _, correct_answers = attempt.quiz.calculate_score(attempt.get_answers())
-                total_questions = len(attempt.quiz.get_questions())
-                accuracy = (correct_answers / total_questions) * 100 if total_questions else 0
-                if topic not in topic_accuracies:
-                    topic_accuracies[topic] = []
-                topic_accuracies[topic].append(accuracy)
+            total, count, best = topic_accuracies.get(topic, (0, 0, 0))
+            topic_accuracies[topic] = (total + accuracy_sum, count + attempts, max(best, best_accuracy))
         performance = []
-        for topic, accuracies in topic_accuracies.items():
+        for topic, (total, count, best) in topic_accuracies.items():
             performance.append({
                 'topic': topic,
-                'average_score': round(sum(accuracies) / len(accuracies), 2),
-                'attempts': len(accuracies),
-                'best_score': round(max(accuracies), 2)
+                'average_score': round(total / count, 2),
+                'attempts': count,
+                'best_score': round(best, 2)
             })
         return performance
 
-    def to_dict(self):
-        level_progress = self.get_level_progress()
-        # Calculate average accuracy across all quizzes
-        from src.models.quiz import QuizAttempt
-        all_attempts = QuizAttempt.query.filter_by(user_id=self.user_id).all()
-        total_correct = 0
-        total_questions = 0
-        for attempt in all_attempts:
-            if attempt.quiz:
-                _, correct_answers = attempt.quiz.calculate_score(attempt.get_answers())
-                total_correct += correct_answers
-                total_questions += len(attempt.quiz.get_questions())
-        average_accuracy = (total_correct / total_questions) * 100 if total_questions else 0
-        return {
+    def get_average_accuracy(self, graded=None):
+        """Average accuracy across all quizzes"""
+        if graded is None:
+            graded = self._grade_attempts()
+        total_correct = sum(g[1] for g in graded)
+        total_questions = sum(g[2] for g in graded)
+        return (total_correct / total_questions) * 100 if total_questions else 0
+
+    def to_dict(self, include=None, timer=None):
+        """Serialize the statistics.
+
+        include: optional subset of SECTIONS to compute (default: all). Counters are
+        always returned; skipped sections are omitted from the result.
+        timer: optional object whose section(name) context manager records how long
+        each section took (routes pass a SectionTimer).
+        """
+        include = self.SECTIONS if include is None else include
+        section = timer.section if timer is not None else _untimed
+        data = {
             'id': self.id,
             'user_id': self.user_id,
             'total_lessons_completed': self.total_lessons_completed,
             'total_quizzes_taken': self.total_quizzes_taken,
             'total_quizzes_passed': self.total_quizzes_passed,
             'pass_rate': round((self.total_quizzes_passed / self.total_quizzes_taken) * 100, 2) if self.total_quizzes_taken > 0 else 0,
-            'average_score': round(average_accuracy, 2),
             'total_study_time_minutes': self.total_study_time_minutes,
             'total_study_time_hours': round(self.total_study_time_minutes / 60, 2),
             'current_level': self.current_level,
             'experience_points': self.experience_points,
-            'level_progress': level_progress,
             'current_streak_days': self.current_streak_days,
             'longest_streak_days': self.longest_streak_days,
             'last_activity_date': self.last_activity_date.isoformat() if self.last_activity_date else None,
@@ -192,8 +226,22 @@ class UserStatistics(db.Model):
                 'reading': round(self.reading_score, 2),
                 'listening': round(self.listening_score, 2)
             },
-            'topic_performance': self.get_topic_performance(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if 'level_progress' in include:
+            with section('level_progress'):
+                data['level_progress'] = self.get_level_progress()
 
+        # Both attempt-based sections share one graded pass over the attempts
+        graded = None
+        if 'average_score' in include or 'topic_performance' in include:
+            with section('grade_attempts'):
+                graded = self._grade_attempts()
+        if 'average_score' in include:
+            with section('average_score'):
+                data['average_score'] = round(self.get_average_accuracy(graded), 2)
+        if 'topic_performance' in include:
+            with section('topic_performance'):
+                data['topic_performance'] = self.get_topic_performance(graded)
+        return data
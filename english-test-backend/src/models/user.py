@@ -1,10 +1,33 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.selectable import CompoundSelect, Select
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import jwt
 from datetime import datetime, timedelta
 
-db = SQLAlchemy()
+class RoutingSession(Session):
+    """Session sending SELECTs to the replica a @replica_reads route picked, everything else to the primary;
+    commits are rolled back while info['read_only'] is set"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = g.get('replica_engine') if has_app_context() else None
+        if replica is not None and bind is None and not self._flushing \
+                and isinstance(clause, (Select, CompoundSelect)):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        if self.info.get('read_only'):
+            # Batched GETs: flushed (so defaults are filled in for the view) then discarded
+            self.flush()
+            self.rollback()
+            return
+        super().commit()
+
+# Reads of @replica_reads routes may go to the read replica
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
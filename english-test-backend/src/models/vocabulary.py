@@ -0,0 +1,27 @@
+from .user import db
+
+
+class VocabularyEntry(db.Model):
+    """One word of a lesson's content.vocabulary, extracted for site-wide lookup"""
+    id = db.Column(db.Integer, primary_key=True)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'), nullable=False, index=True)
+    word = db.Column(db.String(100), nullable=False)
+    # Lowercased, whitespace-collapsed form used for lookup and prefix search
+    normalized = db.Column(db.String(100), nullable=False)
+    definition = db.Column(db.Text, nullable=True)
+    example = db.Column(db.Text, nullable=True)
+    position = db.Column(db.Integer, default=0)
+
+    # Also serves prefix lookups and the (word, lesson) ordered scan of the index load
+    __table_args__ = (db.UniqueConstraint('normalized', 'lesson_id'),)
+
+    def __repr__(self):
+        return f'<VocabularyEntry {self.word}>'
+
+    def to_dict(self):
+        return {
+            'word': self.word,
+            'definition': self.definition,
+            'example': self.example,
+            'lesson_id': self.lesson_id
+        }
@@ -0,0 +1,25 @@
+from flask import Blueprint, current_app, jsonify, request
+from src.routes.user import token_required
+from src.services.admission import admission_control
+from src.services.batch import BatchError, DEFAULT_MAX_REQUESTS, parse_batch, run_batch
+
+batch_bp = Blueprint('batch', __name__)
+
+@batch_bp.route('/batch', methods=['POST'])
+@token_required
+@admission_control('batch')
+def batch(current_user):
+    """Run several GET API requests in one round trip ("parallel": true runs them concurrently)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            items = parse_batch(data, current_app.config.get('BATCH_MAX_REQUESTS', DEFAULT_MAX_REQUESTS))
+        except BatchError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'responses': run_batch(items, current_user, parallel=bool(data.get('parallel')))
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to run batch'}), 500
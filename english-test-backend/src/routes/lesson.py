@@ -2,25 +2,31 @@ from flask import Blueprint, jsonify, request, current_app
 from src.models.user import User, db
 from src.models.lesson import Lesson
 from src.routes.user import token_required
-from openai import OpenAI
+from src.services.admission import admission_control, GENERATE
+from src.services.idempotency import idempotent
+from src.services.projection import resolve_fields, projection_options
+from src.services.http_cache import make_etag, listing_etag, not_modified, apply_validators
+from src.services.response_cache import cached_json, get_response_cache
+from src.services.llm import chat_completion, achat_completion
+from src.services.generation import GenerationSpec
+from src.services.search import search_lessons
+from src.services.catalog import catalog_facets, SUGGESTED_TOPICS
+from src.services.replica import replica_reads
+from src.services.similarity import related_lessons, DEFAULT_DUPLICATE_THRESHOLD, DEFAULT_RELATED_MIN_SIMILARITY
 import json
 import os
 
 lesson_bp = Blueprint('lesson', __name__)
 
-def get_openai_client():
-    """Get OpenAI client instance"""
-    return OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY'),
-        base_url=os.getenv('OPENAI_API_BASE')
-    )
+LESSON_COMPLETION = {
+    'model': 'gpt-3.5-turbo',
+    'temperature': 0.7,
+    'max_tokens': 2000
+}
 
-def generate_lesson_content(topic, level, duration_minutes=15):
-    """Generate lesson content using OpenAI"""
-    try:
-        client = get_openai_client()
-        
-        prompt = f"""
+def build_lesson_messages(topic, level, duration_minutes):
+    """Build the chat messages asking for a lesson"""
+    prompt = f"""
         Create an English lesson for {level} level students on the topic of "{topic}".
         The lesson should be approximately {duration_minutes} minutes long.
         
@@ -51,79 +57,101 @@ def generate_lesson_content(topic, level, duration_minutes=15):
         
         Make sure the content is appropriate for {level} level and engaging for English learners.
         """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert English teacher creating educational content. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Try to parse JSON, if it fails, create a basic structure
-        try:
-            lesson_data = json.loads(content)
-        except json.JSONDecodeError:
-            lesson_data = {
-                "introduction": f"Welcome to this {level} level lesson on {topic}.",
-                "objectives": [f"Understand {topic}", f"Practice {topic}", f"Apply {topic} in context"],
-                "content": {
-                    "theory": content,
-                    "examples": [],
-                    "practice_exercises": []
-                },
-                "vocabulary": [],
-                "summary": f"In this lesson, we covered {topic}.",
-                "next_steps": "Continue practicing and review the vocabulary."
-            }
-        
-        return lesson_data
-        
-    except Exception as e:
-        # Fallback content if AI generation fails
+    return [
+        {"role": "system", "content": "You are an expert English teacher creating educational content. Always respond with valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_lesson_content(content, topic, level):
+    """Parse the model's answer; if it is not JSON, wrap it in a basic structure"""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
         return {
             "introduction": f"Welcome to this {level} level lesson on {topic}.",
-            "objectives": [
-                f"Understand the basics of {topic}",
-                f"Learn key vocabulary related to {topic}",
-                f"Practice using {topic} in context"
-            ],
+            "objectives": [f"Understand {topic}", f"Practice {topic}", f"Apply {topic} in context"],
             "content": {
-                "theory": f"This lesson covers the fundamentals of {topic} for {level} level students.",
-                "examples": [f"Example 1 for {topic}", f"Example 2 for {topic}"],
-                "practice_exercises": [
-                    {
-                        "instruction": f"Practice exercise for {topic}",
-                        "example": f"Example of how to practice {topic}"
-                    }
-                ]
+                "theory": content,
+                "examples": [],
+                "practice_exercises": []
             },
-            "vocabulary": [
+            "vocabulary": [],
+            "summary": f"In this lesson, we covered {topic}.",
+            "next_steps": "Continue practicing and review the vocabulary."
+        }
+
+def fallback_lesson_content(topic, level):
+    """Fallback content if AI generation fails"""
+    return {
+        "introduction": f"Welcome to this {level} level lesson on {topic}.",
+        "objectives": [
+            f"Understand the basics of {topic}",
+            f"Learn key vocabulary related to {topic}",
+            f"Practice using {topic} in context"
+        ],
+        "content": {
+            "theory": f"This lesson covers the fundamentals of {topic} for {level} level students.",
+            "examples": [f"Example 1 for {topic}", f"Example 2 for {topic}"],
+            "practice_exercises": [
                 {
-                    "word": "example",
-                    "definition": "a thing characteristic of its kind or illustrating a general rule",
-                    "example": "This is an example sentence."
+                    "instruction": f"Practice exercise for {topic}",
+                    "example": f"Example of how to practice {topic}"
                 }
-            ],
-            "summary": f"In this lesson, we learned about {topic}.",
-            "next_steps": "Continue practicing and review the material."
-        }
+            ]
+        },
+        "vocabulary": [
+            {
+                "word": "example",
+                "definition": "a thing characteristic of its kind or illustrating a general rule",
+                "example": "This is an example sentence."
+            }
+        ],
+        "summary": f"In this lesson, we learned about {topic}.",
+        "next_steps": "Continue practicing and review the material."
+    }
+
+def generate_lesson_content(topic, level, duration_minutes=15):
+    """Generate lesson content using OpenAI"""
+    try:
+        response = chat_completion(
+            'generate_lesson',
+            messages=build_lesson_messages(topic, level, duration_minutes),
+            **LESSON_COMPLETION
+        )
+        return parse_lesson_content(response.choices[0].message.content.strip(), topic, level)
+    except Exception as e:
+        return fallback_lesson_content(topic, level)
+
+async def agenerate_lesson_content(topic, level, duration_minutes=15):
+    """Generate lesson content using AsyncOpenAI (ASGI mode)"""
+    try:
+        response = await achat_completion(
+            'generate_lesson',
+            messages=build_lesson_messages(topic, level, duration_minutes),
+            **LESSON_COMPLETION
+        )
+        return parse_lesson_content(response.choices[0].message.content.strip(), topic, level)
+    except Exception as e:
+        return fallback_lesson_content(topic, level)
 
 @lesson_bp.route('/lessons', methods=['GET'])
 @token_required
+@replica_reads
 def get_lessons(current_user):
-    """Get all lessons"""
+    """Get all lessons (supports ?view=summary and ?fields=a,b,c)"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         level = request.args.get('level')
         topic = request.args.get('topic')
         
-        query = Lesson.query.filter_by(is_active=True)
+        try:
+            fields = resolve_fields(request.args, Lesson)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = Lesson.query.options(*projection_options(Lesson, fields))\
+            .filter_by(is_active=True)
         
         if level:
             query = query.filter_by(level=level)
@@ -134,78 +162,174 @@ def get_lessons(current_user):
             page=page, per_page=per_page, error_out=False
         )
         
-        return jsonify({
-            'lessons': [lesson.to_dict() for lesson in lessons.items],
+        # Weak ETag from the page's row versions: a match skips serialization
+        etag = listing_etag(Lesson, lessons.items, fields, request.query_string, lessons.total)
+        cached = not_modified(etag, policy='listing', weak=True)
+        if cached:
+            return cached
+        
+        response = jsonify({
+            'lessons': [lesson.to_dict(fields) for lesson in lessons.items],
             'total': lessons.total,
             'pages': lessons.pages,
             'current_page': page,
             'per_page': per_page
-        }), 200
+        })
+        return apply_validators(response, etag, policy='listing', weak=True), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch lessons'}), 500
 
-@lesson_bp.route('/lessons/<int:lesson_id>', methods=['GET'])
+@lesson_bp.route('/lessons/search', methods=['GET'])
 @token_required
-def get_lesson(current_user, lesson_id):
-    """Get specific lesson"""
+def search(current_user):
+    """Full-text search over title, description, topic and content (?q=, ?level=, ?topic=)"""
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
-        return jsonify(lesson.to_dict()), 200
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)
+        
+        found = search_lessons(
+            db.session, query, page=page, per_page=per_page,
+            level=request.args.get('level'), topic=request.args.get('topic')
+        )
+        return jsonify({
+            'query': query,
+            'results': found['results'],
+            'total': found['total'],
+            'pages': -(-found['total'] // per_page),
+            'current_page': page,
+            'per_page': per_page,
+            'engine': found['engine'],
+            'took_ms': found['took_ms']
+        }), 200
+        
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch lesson'}), 500
+        return jsonify({'error': 'Failed to search lessons'}), 500
 
-@lesson_bp.route('/lessons/generate', methods=['POST'])
+@lesson_bp.route('/lessons/<int:lesson_id>', methods=['GET'])
 @token_required
-def generate_lesson(current_user):
-    """Generate a new lesson using AI"""
+def get_lesson(current_user, lesson_id):
+    """Get specific lesson (honours If-None-Match / If-Modified-Since)"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['topic', 'level']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        topic = data['topic'].strip()
-        level = data['level'].strip().lower()
-        duration_minutes = data.get('duration_minutes', 15)
+        version = Lesson.get_version(lesson_id)
+        if version is None:
+            return jsonify({'error': 'Lesson not found'}), 404
         
-        # Validate level
-        if level not in ['beginner', 'intermediate', 'advanced']:
-            return jsonify({'error': 'Level must be beginner, intermediate, or advanced'}), 400
+        # Answer 304 before loading or decoding the content
+        last_modified, version_parts = version
+        etag = make_etag(*version_parts)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
         
-        # Generate lesson content using AI
-        lesson_content = generate_lesson_content(topic, level, duration_minutes)
-        
-        # Create lesson title
-        title = data.get('title', f"{topic.title()} - {level.title()} Level")
-        description = data.get('description', f"Learn about {topic} at {level} level")
-        
-        # Create new lesson
-        lesson = Lesson(
-            title=title,
-            description=description,
-            level=level,
-            topic=topic,
-            duration_minutes=duration_minutes,
-            generated_by_ai=True,
-            ai_prompt=f"Topic: {topic}, Level: {level}, Duration: {duration_minutes} minutes"
+        # Identical for every student: serialize once per lesson version
+        response = cached_json(
+            ('lesson', lesson_id, version_parts),
+            lambda: Lesson.query.get(lesson_id).to_dict()
         )
-        lesson.set_content(lesson_content)
+        return apply_validators(response, etag, last_modified), 200
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch lesson'}), 500
+
+@lesson_bp.route('/lessons/<int:lesson_id>/related', methods=['GET'])
+@token_required
+def get_related_lessons(current_user, lesson_id):
+    """Most similar active lessons by MinHash estimate (?limit=, ?min_similarity=)"""
+    try:
+        lesson = Lesson.query.get(lesson_id)
+        if lesson is None:
+            return jsonify({'error': 'Lesson not found'}), 404
+        limit = min(max(request.args.get('limit', 5, type=int), 1), 20)
+        min_similarity = request.args.get('min_similarity', DEFAULT_RELATED_MIN_SIMILARITY, type=float)
         
-        db.session.add(lesson)
-        db.session.commit()
+        related = related_lessons(db.session, lesson, limit=limit, min_similarity=min_similarity)
+        fields = ('id', 'title', 'description', 'level', 'topic', 'duration_minutes')
+        lessons = {l.id: l for l in Lesson.query.options(*projection_options(Lesson, fields))
+                   .filter(Lesson.id.in_([lesson_id for _, lesson_id in related]))}
         
         return jsonify({
-            'message': 'Lesson generated successfully',
-            'lesson': lesson.to_dict()
-        }), 201
+            'lesson_id': lesson_id,
+            'related': [dict(lessons[related_id].to_dict(fields), similarity=similarity)
+                        for similarity, related_id in related if related_id in lessons]
+        }), 200
         
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'Failed to generate lesson', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to fetch related lessons'}), 500
+
+def prepare_lesson_generation(current_user, data):
+    """Validate a generation request; returns (params, None) or (None, error_response)"""
+    # Validate required fields
+    required_fields = ['topic', 'level']
+    for field in required_fields:
+        if not data.get(field):
+            return None, (jsonify({'error': f'{field} is required'}), 400)
+    
+    topic = data['topic'].strip()
+    level = data['level'].strip().lower()
+    duration_minutes = data.get('duration_minutes', 15)
+    
+    # Validate level
+    if level not in ['beginner', 'intermediate', 'advanced']:
+        return None, (jsonify({'error': 'Level must be beginner, intermediate, or advanced'}), 400)
+    
+    return {
+        'topic': topic,
+        'level': level,
+        'duration_minutes': duration_minutes,
+        'title': data.get('title', f"{topic.title()} - {level.title()} Level"),
+        'description': data.get('description', f"Learn about {topic} at {level} level")
+    }, None
+
+def save_generated_lesson(current_user, params, lesson_content):
+    """Persist a generated lesson and build the 201 response"""
+    topic, level, duration_minutes = params['topic'], params['level'], params['duration_minutes']
+    
+    # Create new lesson
+    lesson = Lesson(
+        title=params['title'],
+        description=params['description'],
+        level=level,
+        topic=topic,
+        duration_minutes=duration_minutes,
+        generated_by_ai=True,
+        ai_prompt=f"Topic: {topic}, Level: {level}, Duration: {duration_minutes} minutes"
+    )
+    lesson.set_content(lesson_content)
+    
+    db.session.add(lesson)
+    db.session.commit()
+    
+    # Flag (but keep) lessons the model has essentially produced before
+    threshold = current_app.config.get('SIMILARITY_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD)
+    duplicates = related_lessons(db.session, lesson, limit=5, min_similarity=threshold)
+    if duplicates:
+        current_app.logger.warning('Generated lesson %s nearly duplicates lessons %s', lesson.id, duplicates)
+    
+    return jsonify({
+        'message': 'Lesson generated successfully',
+        'lesson': lesson.to_dict(),
+        'near_duplicate_lessons': [{'id': lesson_id, 'similarity': similarity} for similarity, lesson_id in duplicates]
+    }), 201
+
+lesson_generation = GenerationSpec(
+    name='generate_lesson',
+    prepare=prepare_lesson_generation,
+    generate=lambda p: generate_lesson_content(p['topic'], p['level'], p['duration_minutes']),
+    agenerate=lambda p: agenerate_lesson_content(p['topic'], p['level'], p['duration_minutes']),
+    save=save_generated_lesson,
+    error_message='Failed to generate lesson'
+)
+
+@lesson_bp.route('/lessons/generate', methods=['POST'])
+@token_required
+@idempotent
+@admission_control(GENERATE)
+def generate_lesson(current_user):
+    """Generate a new lesson using AI"""
+    return lesson_generation.run(current_user, request.get_json())
 
 @lesson_bp.route('/lessons/<int:lesson_id>', methods=['PUT'])
 @token_required
@@ -230,6 +354,7 @@ def update_lesson(current_user, lesson_id):
             lesson.set_content(data['content'])
         
         db.session.commit()
+        get_response_cache().invalidate('lesson', lesson_id)
         
         return jsonify({
             'message': 'Lesson updated successfully',
@@ -248,6 +373,7 @@ def delete_lesson(current_user, lesson_id):
         lesson = Lesson.query.get_or_404(lesson_id)
         lesson.is_active = False
         db.session.commit()
+        get_response_cache().invalidate('lesson', lesson_id)
         
         return jsonify({'message': 'Lesson deleted successfully'}), 200
         
@@ -260,18 +386,24 @@ def delete_lesson(current_user, lesson_id):
 def get_topics(current_user):
     """Get available lesson topics"""
     try:
-        topics = db.session.query(Lesson.topic).filter_by(is_active=True).distinct().all()
-        topic_list = [topic[0] for topic in topics]
+        lesson_counts = catalog_facets(db.session.connection())['lessons']['by_topic']
         
         return jsonify({
-            'topics': topic_list,
-            'suggested_topics': [
-                'Grammar', 'Vocabulary', 'Reading Comprehension', 'Writing Skills',
-                'Speaking Practice', 'Listening Skills', 'Pronunciation', 'Business English',
-                'Travel English', 'Academic English', 'Conversation Skills', 'Idioms and Phrases'
-            ]
+            'topics': list(lesson_counts),
+            'counts': lesson_counts,
+            'suggested_topics': SUGGESTED_TOPICS
         }), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch topics'}), 500
 
+@lesson_bp.route('/catalog/facets', methods=['GET'])
+@token_required
+def get_catalog_facets(current_user):
+    """Get lesson and quiz counts per topic, level and quiz type"""
+    try:
+        return jsonify(catalog_facets(db.session.connection())), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch catalog facets'}), 500
+
@@ -2,30 +2,41 @@ from flask import Blueprint, jsonify, request, current_app
 from src.models.user import User, db
 from src.models.lesson import Lesson
 from src.models.quiz import Quiz, QuizAttempt
+from src.models.archive import ArchivedAttempt
 from src.models.statistics import UserStatistics
 from src.routes.user import token_required
-from openai import OpenAI
+from src.services.admission import admission_control, GENERATE
+from src.services.idempotency import idempotent
+from src.services.projection import resolve_fields, projection_options
+from src.services.sections import parse_include, SectionTimer
+from src.services.http_cache import make_etag, listing_etag, not_modified, apply_validators
+from src.services.response_cache import cached_json, get_response_cache
+from src.services.llm import chat_completion, achat_completion
+from src.services.generation import GenerationSpec
+from src.services.similarity import find_duplicate_questions
+from src.services.achievements import record_events, snapshot, submission_events
+from src.services.live import publish_submission, submission_update
+from src.services.archive import attempt_totals, attempts_page, archived_count, user_attempts
+from src.services.replica import replica_reads
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 quiz_bp = Blueprint('quiz', __name__)
 
 
-def get_openai_client():
-    """Get OpenAI client instance"""
-    return OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY'),
-        base_url=os.getenv('OPENAI_API_BASE')
-    )
+QUIZ_COMPLETION = {
+    'model': 'gpt-4.1-mini',
+    'temperature': 0.7,
+    'max_tokens': 1500
+}
 
 
-def generate_quiz_questions(topic, level, num_questions=5, quiz_type='multiple_choice'):
-    """Generate quiz questions using OpenAI"""
-
-    try:
-        client = get_openai_client()
-        prompt = f"""
+def build_quiz_messages(topic, level, num_questions, quiz_type):
+    """Build the chat messages asking for quiz questions"""
+    prompt = f"""
         Create {num_questions} {quiz_type} questions for {level} level English students on the topic of \"{topic}\".
         Please provide the questions in the following JSON format:
         [
@@ -45,27 +56,53 @@ def generate_quiz_questions(topic, level, num_questions=5, quiz_type='multiple_c
         - Include helpful explanations
         - Questions should be educational and engaging
         """
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert English teacher creating quiz questions. Always respond with valid JSON array."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
+    return [
+        {"role": "system", "content": "You are an expert English teacher creating quiz questions. Always respond with valid JSON array."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_quiz_questions(content, num_questions):
+    """Parse the model's JSON array and renumber the questions"""
+    print("Raw OpenAI response:", content)
+    try:
+        questions = json.loads(content)
+    except Exception as json_err:
+        print("JSON decode error:", json_err)
+        print("Raw response for debugging:", content)
+        raise Exception(
+            "OpenAI did not return valid JSON. See logs for details.")
+    for i, question in enumerate(questions):
+        question['id'] = i + 1
+    return questions[:num_questions]
+
+
+def generate_quiz_questions(topic, level, num_questions=5, quiz_type='multiple_choice'):
+    """Generate quiz questions using OpenAI"""
+
+    try:
+        response = chat_completion(
+            'generate_quiz',
+            messages=build_quiz_messages(topic, level, num_questions, quiz_type),
+            **QUIZ_COMPLETION
         )
-        content = response.choices[0].message.content.strip()
-        print("Raw OpenAI response:", content)
-        try:
-            questions = json.loads(content)
-        except Exception as json_err:
-            print("JSON decode error:", json_err)
-            print("Raw response for debugging:", content)
-            raise Exception(
-                "OpenAI did not return valid JSON. See logs for details.")
-        for i, question in enumerate(questions):
-            question['id'] = i + 1
-        return questions[:num_questions]
+        return parse_quiz_questions(response.choices[0].message.content.strip(), num_questions)
+    except Exception as e:
+        print(f"AI generation failed: {str(e)}")
+        raise Exception(
+            "AI quiz generation failed. Please check your OpenAI setup and logs.")
+
+
+async def agenerate_quiz_questions(topic, level, num_questions=5, quiz_type='multiple_choice'):
+    """Generate quiz questions using AsyncOpenAI (ASGI mode)"""
+
+    try:
+        response = await achat_completion(
+            'generate_quiz',
+            messages=build_quiz_messages(topic, level, num_questions, quiz_type),
+            **QUIZ_COMPLETION
+        )
+        return parse_quiz_questions(response.choices[0].message.content.strip(), num_questions)
     except Exception as e:
         print(f"AI generation failed: {str(e)}")
         raise Exception(
@@ -74,15 +111,22 @@ def generate_quiz_questions(topic, level, num_questions=5, quiz_type='multiple_c
 
 @quiz_bp.route('/quizzes', methods=['GET'])
 @token_required
+@replica_reads
 def get_quizzes(current_user):
-    """Get all quizzes"""
+    """Get all quizzes (supports ?view=summary and ?fields=a,b,c)"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         level = request.args.get('level')
         lesson_id = request.args.get('lesson_id', type=int)
 
-        query = Quiz.query.filter_by(is_active=True)
+        try:
+            fields = resolve_fields(request.args, Quiz)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        query = Quiz.query.options(*projection_options(Quiz, fields))\
+            .filter_by(is_active=True)
 
         if level:
             query = query.filter_by(level=level)
@@ -93,13 +137,20 @@ def get_quizzes(current_user):
             page=page, per_page=per_page, error_out=False
         )
 
-        return jsonify({
-            'quizzes': [quiz.to_dict() for quiz in quizzes.items],
+        # Weak ETag from the page's row versions: a match skips serialization
+        etag = listing_etag(Quiz, quizzes.items, fields, request.query_string, quizzes.total)
+        cached = not_modified(etag, policy='listing', weak=True)
+        if cached:
+            return cached
+
+        response = jsonify({
+            'quizzes': [quiz.to_dict(fields=fields) for quiz in quizzes.items],
             'total': quizzes.total,
             'pages': quizzes.pages,
             'current_page': page,
             'per_page': per_page
-        }), 200
+        })
+        return apply_validators(response, etag, policy='listing', weak=True), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to fetch quizzes'}), 500
@@ -110,8 +161,7 @@ def get_quizzes(current_user):
 def get_quiz(current_user, quiz_id):
     """Get specific quiz (without answers for taking quiz)"""
     try:
-        quiz = Quiz.query.get_or_404(quiz_id)
-        return jsonify(quiz.to_dict(include_answers=False)), 200
+        return get_quiz_response(quiz_id, include_answers=False)
     except Exception as e:
         return jsonify({'error': 'Failed to fetch quiz'}), 500
 
@@ -121,99 +171,150 @@ def get_quiz(current_user, quiz_id):
 def get_quiz_with_answers(current_user, quiz_id):
     """Get quiz with answers (for review)"""
     try:
-        quiz = Quiz.query.get_or_404(quiz_id)
-        return jsonify(quiz.to_dict(include_answers=True)), 200
+        return get_quiz_response(quiz_id, include_answers=True)
     except Exception as e:
         return jsonify({'error': 'Failed to fetch quiz'}), 500
 
 
-@quiz_bp.route('/quizzes/generate', methods=['POST'])
-@token_required
-def generate_quiz(current_user):
-    """Generate a new quiz using AI"""
-    try:
-        data = request.get_json()
-        print(f"Received quiz generation request: {data}")
-
-        # Validate required fields
-        required_fields = ['topic', 'level']
-        for field in required_fields:
-            if not data.get(field):
-                print(f"Missing required field: {field}")
-                return jsonify({'error': f'{field} is required'}), 400
-
-        topic = data['topic'].strip()
-        level = data['level'].strip().lower()
-        lesson_id = data.get('lesson_id')
-        if not lesson_id:
-            return jsonify({'error': 'lesson_id is required'}), 400
-        lesson = Lesson.query.get(lesson_id)
-        if not lesson:
-            return jsonify({'error': 'Lesson not found'}), 404
-        num_questions = data.get('num_questions', 5)
-        quiz_type = data.get('quiz_type', 'multiple_choice')
-        time_limit_minutes = data.get('time_limit_minutes', 10)
-        passing_score = data.get('passing_score', 70)
-
-        print(
-            f"Processing quiz: topic={topic}, level={level}, num_questions={num_questions}")
-
-        # Validate level
-        if level not in ['beginner', 'intermediate', 'advanced']:
-            return jsonify({'error': 'Level must be beginner, intermediate, or advanced'}), 400
-
-        # Generate quiz questions using AI
-        print("Generating quiz questions...")
-        questions = generate_quiz_questions(
-            topic, level, num_questions, quiz_type)
-        print(f"Generated {len(questions)} questions")
-
-        # Create quiz title
-        title = data.get(
-            'title', f"{topic.title()} Quiz - {level.title()} Level")
-        description = data.get(
-            'description', f"Test your knowledge of {topic} at {level} level")
-
-        # Create new quiz
-        print("Creating quiz object...")
-        quiz = Quiz(
-            lesson_id=lesson_id,
-            title=title,
-            description=description,
-            level=level,
-            quiz_type=quiz_type,
-            time_limit_minutes=time_limit_minutes,
-            passing_score=passing_score,
-            generated_by_ai=True,
-            ai_prompt=f"Topic: {topic}, Level: {level}, Questions: {num_questions}, Type: {quiz_type}"
-        )
+def get_quiz_response(quiz_id, include_answers):
+    """Build a quiz response, honouring If-None-Match / If-Modified-Since"""
+    version = Quiz.get_version(quiz_id)
+    if version is None:
+        return jsonify({'error': 'Quiz not found'}), 404
+
+    # Answer 304 before loading or decoding the questions
+    last_modified, version_parts = version
+    etag = make_etag(*version_parts, include_answers)
+    policy = 'answers' if include_answers else 'catalog'
+    cached = not_modified(etag, last_modified, policy)
+    if cached:
+        return cached
+
+    # Identical for every student: serialize once per quiz version
+    response = cached_json(
+        ('quiz', quiz_id, version_parts, include_answers),
+        lambda: Quiz.query.get(quiz_id).to_dict(include_answers=include_answers)
+    )
+    return apply_validators(response, etag, last_modified, policy), 200
+
+
+def prepare_quiz_generation(current_user, data):
+    """Validate a generation request; returns (params, None) or (None, error_response)"""
+    print(f"Received quiz generation request: {data}")
+
+    # Validate required fields
+    required_fields = ['topic', 'level']
+    for field in required_fields:
+        if not data.get(field):
+            print(f"Missing required field: {field}")
+            return None, (jsonify({'error': f'{field} is required'}), 400)
+
+    topic = data['topic'].strip()
+    level = data['level'].strip().lower()
+    lesson_id = data.get('lesson_id')
+    if not lesson_id:
+        return None, (jsonify({'error': 'lesson_id is required'}), 400)
+    lesson = Lesson.query.get(lesson_id)
+    if not lesson:
+        return None, (jsonify({'error': 'Lesson not found'}), 404)
+    num_questions = data.get('num_questions', 5)
+    quiz_type = data.get('quiz_type', 'multiple_choice')
+
+    print(
+        f"Processing quiz: topic={topic}, level={level}, num_questions={num_questions}")
+
+    # Validate level
+    if level not in ['beginner', 'intermediate', 'advanced']:
+        return None, (jsonify({'error': 'Level must be beginner, intermediate, or advanced'}), 400)
+
+    return {
+        'topic': topic,
+        'level': level,
+        'lesson_id': lesson_id,
+        'num_questions': num_questions,
+        'quiz_type': quiz_type,
+        'time_limit_minutes': data.get('time_limit_minutes', 10),
+        'passing_score': data.get('passing_score', 70),
+        'title': data.get('title', f"{topic.title()} Quiz - {level.title()} Level"),
+        'description': data.get('description', f"Test your knowledge of {topic} at {level} level")
+    }, None
+
+
+def save_generated_quiz(current_user, params, questions):
+    """Persist a generated quiz and build the 201 response"""
+    print(f"Generated {len(questions)} questions")
+    topic, level = params['topic'], params['level']
+    num_questions, quiz_type = params['num_questions'], params['quiz_type']
+
+    # Create new quiz
+    print("Creating quiz object...")
+    quiz = Quiz(
+        lesson_id=params['lesson_id'],
+        title=params['title'],
+        description=params['description'],
+        level=level,
+        quiz_type=quiz_type,
+        time_limit_minutes=params['time_limit_minutes'],
+        passing_score=params['passing_score'],
+        generated_by_ai=True,
+        ai_prompt=f"Topic: {topic}, Level: {level}, Questions: {num_questions}, Type: {quiz_type}"
+    )
 
-        print("Setting questions...")
-        quiz.set_questions(questions)
+    print("Setting questions...")
+    quiz.set_questions(questions)
 
-        print("Saving to database...")
-        db.session.add(quiz)
-        db.session.commit()
-        print("Quiz saved successfully")
+    print("Saving to database...")
+    db.session.add(quiz)
+    db.session.commit()
+    get_response_cache().invalidate('lesson', params['lesson_id'])
+    print("Quiz saved successfully")
 
-        return jsonify({
-            'message': 'Quiz generated successfully',
-            'quiz': quiz.to_dict(include_answers=False)
-        }), 201
+    # Flag (but keep) questions already asked elsewhere or earlier in this quiz
+    duplicates = find_duplicate_questions(db.session, questions, exclude_quiz_id=quiz.id)
+    if duplicates:
+        current_app.logger.warning('Generated quiz %s has %d near-duplicate questions', quiz.id, len(duplicates))
 
-    except Exception as e:
-        print(f"Error in generate_quiz: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        db.session.rollback()
-        return jsonify({'error': 'Failed to generate quiz', 'details': str(e)}), 500
+    return jsonify({
+        'message': 'Quiz generated successfully',
+        'quiz': quiz.to_dict(include_answers=False),
+        'near_duplicate_questions': duplicates
+    }), 201
+
+
+def _quiz_generation_args(params):
+    return params['topic'], params['level'], params['num_questions'], params['quiz_type']
+
+
+quiz_generation = GenerationSpec(
+    name='generate_quiz',
+    prepare=prepare_quiz_generation,
+    generate=lambda p: generate_quiz_questions(*_quiz_generation_args(p)),
+    agenerate=lambda p: agenerate_quiz_questions(*_quiz_generation_args(p)),
+    save=save_generated_quiz,
+    error_message='Failed to generate quiz'
+)
+
+
+@quiz_bp.route('/quizzes/generate', methods=['POST'])
+@token_required
+@idempotent
+@admission_control(GENERATE)
+def generate_quiz(current_user):
+    """Generate a new quiz using AI"""
+    return quiz_generation.run(current_user, request.get_json())
 
 
 @quiz_bp.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
 @token_required
+@idempotent
 def submit_quiz(current_user, quiz_id):
-    """Submit quiz answers and get score"""
+    """Submit quiz answers and get score (?include= selects statistics sections)"""
     try:
+        try:
+            include = parse_include(request.args.get('include'), UserStatistics.SECTIONS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         quiz = Quiz.query.get_or_404(quiz_id)
         data = request.get_json()
 
@@ -247,12 +348,14 @@ def submit_quiz(current_user, quiz_id):
         if not stats:
             stats = UserStatistics(user_id=current_user.id)
             db.session.add(stats)
+        before = snapshot(stats)
 
-        # Recalculate total points from all attempts
-        all_attempts = QuizAttempt.query.filter_by(user_id=current_user.id).all()
-        stats.experience_points = sum(int(a.score) for a in all_attempts)
-        stats.total_quizzes_taken = len(all_attempts)
-        stats.average_score = round(sum(a.score for a in all_attempts) / len(all_attempts), 2) if all_attempts else 0
+        # Recalculate total points from all attempts, archived ones included, in one aggregate query
+        taken, experience, total_score, passed = attempt_totals(db.session, current_user.id)
+        stats.experience_points = experience
+        stats.total_quizzes_taken = taken
+        stats.total_quizzes_passed = passed
+        stats.average_score = round(total_score / taken, 2) if taken else 0
 
         # Update topic-specific score if lesson has topic
         if quiz.lesson:
@@ -261,35 +364,181 @@ def submit_quiz(current_user, quiz_id):
         # Update daily streak
         stats.update_streak()
 
+        # Award the badges this submission earned, in the same transaction
+        new_achievements = record_events(db.session, current_user.id, submission_events(before, stats), stats,
+                                         [(None, score)])
+        live_update = submission_update(current_user, stats)
+
         db.session.commit()
+        get_response_cache().invalidate('quiz', quiz_id)
 
         # Get correct answers for review
         quiz_with_answers = quiz.to_dict(include_answers=True)
+        timer = SectionTimer()
+        statistics = stats.to_dict(include=include, timer=timer)
+        # Push to open dashboards and leaderboards instead of having them poll
+        publish_submission(live_update, new_achievements)
 
-        return jsonify({
+        return timer.apply(jsonify({
             'message': 'Quiz submitted successfully',
             'attempt': attempt.to_dict(),
             'score': score,
             'accuracy': accuracy,
             'is_passed': is_passed,
             'quiz_with_answers': quiz_with_answers,
-            'statistics': stats.to_dict()
-        }), 200
+            'statistics': statistics,
+            'new_achievements': new_achievements
+        })), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to submit quiz', 'details': str(e)}), 500
 
 
+# Largest offline backlog accepted in one batch submission
+MAX_BATCH_ATTEMPTS = 500
+# How far back an offline attempt may be dated (OFFLINE_MAX_DAYS)
+DEFAULT_OFFLINE_MAX_DAYS = 30
+
+
+def parse_completed_at(value, now):
+    """Client completion time (ISO 8601) as naive UTC, never in the future; None when absent"""
+    if value is None:
+        return now
+    completed_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if completed_at.tzinfo is not None:
+        completed_at = completed_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(completed_at, now)
+
+
+@quiz_bp.route('/quizzes/submit-batch', methods=['POST'])
+@token_required
+@idempotent
+def submit_quiz_batch(current_user):
+    """Submit many offline quiz attempts at once: one insert and one statistics update"""
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('attempts')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'attempts must be a non-empty list'}), 400
+        if len(items) > MAX_BATCH_ATTEMPTS:
+            return jsonify({'error': f'At most {MAX_BATCH_ATTEMPTS} attempts per batch'}), 400
+
+        items = [item if isinstance(item, dict) else {} for item in items]
+        quiz_ids = {item.get('quiz_id') for item in items if isinstance(item.get('quiz_id'), int)}
+        quizzes = {quiz.id: quiz for quiz in Quiz.query.options(joinedload(Quiz.lesson))
+                   .filter(Quiz.id.in_(quiz_ids), Quiz.is_active.is_(True))}
+        questions = {}
+        now = datetime.utcnow()
+        # Backdated attempts would rewrite streaks and badge dates: no older than the window or the account
+        earliest = now - timedelta(days=current_app.config.get('OFFLINE_MAX_DAYS', DEFAULT_OFFLINE_MAX_DAYS))
+        if current_user.created_at is not None:
+            earliest = max(earliest, current_user.created_at)
+
+        # Grade every attempt in one pass, decoding each quiz's questions once
+        results, rows, graded = [], [], []
+        for index, item in enumerate(items):
+            quiz = quizzes.get(item.get('quiz_id')) if isinstance(item.get('quiz_id'), int) else None
+            answers = item.get('answers')
+            time_taken = item.get('time_taken_minutes')
+            result = {'index': index, 'quiz_id': item.get('quiz_id')}
+            results.append(result)
+            if quiz is None:
+                result['error'] = 'Quiz not found'
+                continue
+            if not answers or not isinstance(answers, dict):
+                result['error'] = 'Answers are required'
+                continue
+            if time_taken is not None and not isinstance(time_taken, (int, float)):
+                result['error'] = 'Invalid time_taken_minutes'
+                continue
+            try:
+                completed_at = parse_completed_at(item.get('completed_at'), now)
+            except ValueError:
+                result['error'] = 'Invalid completed_at'
+                continue
+            if completed_at < earliest:
+                result['error'] = 'completed_at is outside the offline window'
+                continue
+            if quiz.id not in questions:
+                questions[quiz.id] = quiz.get_questions()
+            score, correct_answers = quiz.calculate_score(answers, item.get('timings') or {}, questions[quiz.id])
+            total_questions = len(questions[quiz.id])
+            is_passed = score >= quiz.passing_score
+            result.update({
+                'score': score,
+                'correct_answers': correct_answers,
+                'total_questions': total_questions,
+                'accuracy': (correct_answers / total_questions) * 100 if total_questions else 0,
+                'is_passed': is_passed
+            })
+            rows.append({
+                'user_id': current_user.id, 'quiz_id': quiz.id, 'answers': json.dumps(answers), 'score': score,
+                'time_taken_minutes': time_taken, 'completed_at': completed_at,
+                'is_passed': is_passed
+            })
+            graded.append((completed_at, quiz, score, result))
+
+        stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
+        new_achievements = []
+        if rows:
+            # One executemany for the whole batch
+            db.session.execute(insert(QuizAttempt.__table__), rows)
+            if not stats:
+                stats = UserStatistics(user_id=current_user.id)
+                db.session.add(stats)
+            before = snapshot(stats)
+            # Same totals as a per-attempt recalculation, from one aggregate query
+            taken, experience, total_score, passed = attempt_totals(db.session, current_user.id)
+            stats.total_quizzes_taken = taken
+            stats.experience_points = experience
+            stats.average_score = round(total_score / taken, 2) if taken else 0
+            stats.total_quizzes_passed = passed
+            # Order-dependent updates replay the attempts in the order they were taken
+            graded.sort(key=lambda entry: (entry[0], entry[3]['index']))
+            for completed_at, quiz, score, _ in graded:
+                if quiz.lesson:
+                    stats.update_topic_score(quiz.lesson.topic.lower(), score)
+            for day in sorted({completed_at.date() for completed_at, _, _, _ in graded}):
+                stats.record_activity(day)
+            new_achievements = record_events(db.session, current_user.id, submission_events(before, stats), stats,
+                                             [(completed_at, score) for completed_at, _, score, _ in graded], now)
+
+        # Read before the commit expires them
+        submitted_quizzes = {quiz.id for _, quiz, _, _ in graded}
+        statistics = {
+            'total_quizzes_taken': stats.total_quizzes_taken,
+            'average_score': stats.average_score,
+            'experience_points': stats.experience_points,
+            'current_streak_days': stats.current_streak_days
+        } if stats else None
+        live_update = submission_update(current_user, stats) if rows else None
+        db.session.commit()
+        for quiz_id in submitted_quizzes:
+            get_response_cache().invalidate('quiz', quiz_id)
+        if live_update is not None:
+            publish_submission(live_update, new_achievements)
+
+        return jsonify({
+            'accepted': len(rows),
+            'rejected': len(items) - len(rows),
+            'results': results,
+            'statistics': statistics,
+            'new_achievements': new_achievements
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to submit quizzes', 'details': str(e)}), 500
+
+
 @quiz_bp.route('/quizzes/<int:quiz_id>/attempts', methods=['GET'])
 @token_required
 def get_quiz_attempts(current_user, quiz_id):
     """Get user's attempts for a specific quiz"""
     try:
-        attempts = QuizAttempt.query.filter_by(
-            user_id=current_user.id,
-            quiz_id=quiz_id
-        ).order_by(QuizAttempt.completed_at.desc()).all()
+        # Archived attempts included
+        attempts = user_attempts(db.session, current_user.id, quiz_id=quiz_id, newest_first=True)
 
         return jsonify({
             'attempts': [attempt.to_dict() for attempt in attempts]
@@ -307,21 +556,34 @@ def get_my_attempts(current_user):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
 
-        attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
-            .order_by(QuizAttempt.completed_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        # Quizzes (and their attempt ids, for attempt_count) come with the page, not one query per attempt
+        quiz_loader = lambda model: joinedload(model.quiz).selectinload(Quiz.attempts).load_only(QuizAttempt.id)
+        archived = archived_count(db.session, current_user.id)
+        if archived:
+            # Pages span the hot table and the archive (out-of-range arguments clamped like paginate())
+            size = per_page if per_page > 0 else 20
+            total = QuizAttempt.query.filter_by(user_id=current_user.id).count() + archived
+            items = attempts_page(db.session, current_user.id, (max(page, 1) - 1) * size, size,
+                                  [quiz_loader(QuizAttempt)], [quiz_loader(ArchivedAttempt)])
+            pages = -(-total // size)
+        else:
+            attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
+                .options(quiz_loader(QuizAttempt))\
+                .order_by(QuizAttempt.completed_at.desc())\
+                .paginate(page=page, per_page=per_page, error_out=False)
+            items, total, pages = attempts.items, attempts.total, attempts.pages
 
         # Include quiz information
         attempts_data = []
-        for attempt in attempts.items:
+        for attempt in items:
             attempt_dict = attempt.to_dict()
             attempt_dict['quiz'] = attempt.quiz.to_dict(include_answers=False)
             attempts_data.append(attempt_dict)
 
         return jsonify({
             'attempts': attempts_data,
-            'total': attempts.total,
-            'pages': attempts.pages,
+            'total': total,
+            'pages': pages,
             'current_page': page,
             'per_page': per_page
         }), 200
@@ -355,6 +617,7 @@ def update_quiz(current_user, quiz_id):
             quiz.set_questions(data['questions'])
 
         db.session.commit()
+        get_response_cache().invalidate('quiz', quiz_id)
 
         return jsonify({
             'message': 'Quiz updated successfully',
@@ -374,6 +637,7 @@ def delete_quiz(current_user, quiz_id):
         quiz = Quiz.query.get_or_404(quiz_id)
         quiz.is_active = False
         db.session.commit()
+        get_response_cache().invalidate('quiz', quiz_id)
 
         return jsonify({'message': 'Quiz deleted successfully'}), 200
 
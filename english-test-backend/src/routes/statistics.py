@@ -2,82 +2,127 @@ from flask import Blueprint, jsonify, request, current_app
 from src.models.user import User, db
 from src.models.lesson import Lesson
 from src.models.quiz import Quiz, QuizAttempt
+from src.models.archive import ArchivedAttempt
 from src.models.statistics import UserStatistics
 from src.routes.user import token_required
+from src.services.admission import admission_control
+from src.services.sections import parse_include, SectionTimer
+from src.services.achievements import achievements_report
+from src.services.archive import recent_user_attempts, user_attempts
+from src.services.replica import replica_reads
+from src.services.live import (LEADERBOARD, DEFAULT_HEARTBEAT_SECONDS, DEFAULT_MAX_STREAM_SECONDS, LEADERBOARD_SIZE,
+                               event_stream, get_live_hub, statistics_delta, user_channel)
 from sqlalchemy import func, desc
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import json
 
 statistics_bp = Blueprint('statistics', __name__)
 
+# Channels of GET /statistics/stream
+LIVE_CHANNELS = (LEADERBOARD, 'statistics')
+
+# Dashboard sections that can be requested with ?include=
+DASHBOARD_SECTIONS = UserStatistics.SECTIONS + ('recent_attempts', 'weekly_progress', 'recommendations')
+
 @statistics_bp.route('/statistics/dashboard', methods=['GET'])
 @token_required
+@admission_control('statistics')
+@replica_reads
 def get_dashboard(current_user):
-    """Get user dashboard statistics"""
+    """Get user dashboard statistics (supports ?include=section,... and reports Server-Timing)"""
     try:
-        # Get user statistics
-        stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
-        if not stats:
-            stats = UserStatistics(user_id=current_user.id)
-            db.session.add(stats)
-            db.session.commit()
-        
-        # Get recent quiz attempts (last 10)
-        recent_attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
-            .order_by(desc(QuizAttempt.completed_at))\
-            .limit(10).all()
+        try:
+            include = parse_include(request.args.get('include'), DASHBOARD_SECTIONS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        timer = SectionTimer()
         
-        # Get recent attempts with quiz info
-        recent_attempts_data = []
-        for attempt in recent_attempts:
-            attempt_dict = attempt.to_dict()
-            attempt_dict['quiz_title'] = attempt.quiz.title
-            attempt_dict['quiz_topic'] = attempt.quiz.lesson.topic if attempt.quiz.lesson else 'General'
-            recent_attempts_data.append(attempt_dict)
-        
-        # Calculate weekly progress (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        weekly_attempts = QuizAttempt.query.filter(
-            QuizAttempt.user_id == current_user.id,
-            QuizAttempt.completed_at >= week_ago
-        ).all()
+        # Get user statistics
+        with timer.section('stats'):
+            stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
+            if not stats:
+                stats = UserStatistics(user_id=current_user.id)
+                db.session.add(stats)
+                db.session.commit()
         
-        daily_progress = {}
-        for i in range(7):
-            date = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
-            daily_progress[date] = {
-                'quizzes_taken': 0,
-                'average_score': 0,
-                'time_spent': 0
-            }
+        dashboard = {
+            'user_statistics': stats.to_dict(
+                include=[s for s in include if s in UserStatistics.SECTIONS], timer=timer
+            )
+        }
         
-        for attempt in weekly_attempts:
-            date = attempt.completed_at.strftime('%Y-%m-%d')
-            if date in daily_progress:
-                daily_progress[date]['quizzes_taken'] += 1
-                daily_progress[date]['time_spent'] += attempt.time_taken_minutes or 0
+        if 'recent_attempts' in include:
+            with timer.section('recent_attempts'):
+                dashboard['recent_attempts'] = get_recent_attempts(current_user)
         
-        # Calculate average scores for each day
-        for date in daily_progress:
-            day_attempts = [a for a in weekly_attempts if a.completed_at.strftime('%Y-%m-%d') == date]
-            if day_attempts:
-                daily_progress[date]['average_score'] = sum(a.score for a in day_attempts) / len(day_attempts)
+        if 'weekly_progress' in include:
+            with timer.section('weekly_progress'):
+                dashboard['weekly_progress'] = get_weekly_progress(current_user)
         
-        # Get level recommendations
-        recommendations = get_level_recommendations(current_user, stats)
+        if 'recommendations' in include:
+            with timer.section('recommendations'):
+                dashboard['recommendations'] = get_level_recommendations(current_user, stats)
         
-        return jsonify({
-            'user_statistics': stats.to_dict(),
-            'recent_attempts': recent_attempts_data,
-            'weekly_progress': daily_progress,
-            'recommendations': recommendations
-        }), 200
+        return timer.apply(jsonify(dashboard)), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch dashboard', 'details': str(e)}), 500
 
+def attempt_topic_loader(*quiz_columns, model=QuizAttempt):
+    """Load each attempt's quiz (only the given columns) and lesson topic in the same query"""
+    return joinedload(model.quiz).load_only(Quiz.lesson_id, *quiz_columns)\
+        .joinedload(Quiz.lesson).load_only(Lesson.topic)
+
+def get_recent_attempts(user, limit=10):
+    """Get the user's most recent quiz attempts with quiz info"""
+    recent_attempts = recent_user_attempts(
+        db.session, user.id, limit,
+        [attempt_topic_loader(Quiz.title)], [attempt_topic_loader(Quiz.title, model=ArchivedAttempt)]
+    )
+    
+    recent_attempts_data = []
+    for attempt in recent_attempts:
+        attempt_dict = attempt.to_dict()
+        attempt_dict['quiz_title'] = attempt.quiz.title
+        attempt_dict['quiz_topic'] = attempt.quiz.lesson.topic if attempt.quiz.lesson else 'General'
+        recent_attempts_data.append(attempt_dict)
+    return recent_attempts_data
+
+def get_weekly_progress(user):
+    """Calculate daily progress over the last 7 days"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    weekly_attempts = QuizAttempt.query.filter(
+        QuizAttempt.user_id == user.id,
+        QuizAttempt.completed_at >= week_ago
+    ).all()
+    
+    daily_progress = {}
+    for i in range(7):
+        date = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
+        daily_progress[date] = {
+            'quizzes_taken': 0,
+            'average_score': 0,
+            'time_spent': 0
+        }
+    
+    for attempt in weekly_attempts:
+        date = attempt.completed_at.strftime('%Y-%m-%d')
+        if date in daily_progress:
+            daily_progress[date]['quizzes_taken'] += 1
+            daily_progress[date]['time_spent'] += attempt.time_taken_minutes or 0
+    
+    # Calculate average scores for each day
+    for date in daily_progress:
+        day_attempts = [a for a in weekly_attempts if a.completed_at.strftime('%Y-%m-%d') == date]
+        if day_attempts:
+            daily_progress[date]['average_score'] = sum(a.score for a in day_attempts) / len(day_attempts)
+    return daily_progress
+
 @statistics_bp.route('/statistics/progress', methods=['GET'])
 @token_required
+@admission_control('statistics')
+@replica_reads
 def get_progress(current_user):
     """Get detailed progress statistics"""
     try:
@@ -94,11 +139,10 @@ def get_progress(current_user):
         else:  # all
             start_date = datetime.min
         
-        # Get quiz attempts in period
-        attempts = QuizAttempt.query.filter(
-            QuizAttempt.user_id == current_user.id,
-            QuizAttempt.completed_at >= start_date
-        ).order_by(QuizAttempt.completed_at).all()
+        # Get quiz attempts in period (older periods also read the archive)
+        attempts = user_attempts(db.session, current_user.id, since=start_date,
+                                 hot_options=[attempt_topic_loader()],
+                                 cold_options=[attempt_topic_loader(model=ArchivedAttempt)])
         
         # Group by topic
         topic_stats = {}
@@ -161,40 +205,39 @@ def get_progress(current_user):
     except Exception as e:
         return jsonify({'error': 'Failed to fetch progress', 'details': str(e)}), 500
 
+def leaderboard_entries(limit=LEADERBOARD_SIZE):
+    """Top users by experience points, as leaderboard entries"""
+    top_users = db.session.query(
+        User.username,
+        User.level,
+        UserStatistics.experience_points,
+        UserStatistics.total_quizzes_taken,
+        UserStatistics.average_score,
+        UserStatistics.current_streak_days
+    ).join(UserStatistics, User.id == UserStatistics.user_id)\
+     .order_by(desc(UserStatistics.experience_points))\
+     .limit(limit).all()
+    return [{
+        'rank': i + 1,
+        'username': user_data.username,
+        'level': user_data.level,
+        'experience_points': user_data.experience_points,
+        'total_quizzes': user_data.total_quizzes_taken,
+        'average_score': round(user_data.average_score, 1),
+        'current_streak': user_data.current_streak_days
+    } for i, user_data in enumerate(top_users)]
+
 @statistics_bp.route('/statistics/leaderboard', methods=['GET'])
 @token_required
+@admission_control('statistics')
+@replica_reads
 def get_leaderboard(current_user):
     """Get leaderboard statistics"""
     try:
-        # Get top users by experience points
-        top_users = db.session.query(
-            User.username,
-            User.level,
-            UserStatistics.experience_points,
-            UserStatistics.total_quizzes_taken,
-            UserStatistics.average_score,
-            UserStatistics.current_streak_days
-        ).join(UserStatistics, User.id == UserStatistics.user_id)\
-         .order_by(desc(UserStatistics.experience_points))\
-         .limit(10).all()
-        
-        leaderboard = []
-        current_user_rank = None
-        
-        for i, user_data in enumerate(top_users):
-            user_info = {
-                'rank': i + 1,
-                'username': user_data.username,
-                'level': user_data.level,
-                'experience_points': user_data.experience_points,
-                'total_quizzes': user_data.total_quizzes_taken,
-                'average_score': round(user_data.average_score, 1),
-                'current_streak': user_data.current_streak_days
-            }
-            leaderboard.append(user_info)
-            
-            if user_data.username == current_user.username:
-                current_user_rank = i + 1
+        leaderboard = leaderboard_entries()
+        current_user_rank = next(
+            (entry['rank'] for entry in leaderboard if entry['username'] == current_user.username), None
+        )
         
         # If current user is not in top 10, find their rank
         if current_user_rank is None:
@@ -213,93 +256,86 @@ def get_leaderboard(current_user):
     except Exception as e:
         return jsonify({'error': 'Failed to fetch leaderboard', 'details': str(e)}), 500
 
+def open_live_stream(current_user, holds_thread):
+    """Validate ?channels= and ?max_seconds=, subscribe and read the snapshot.
+
+    Returns (error_response, None) or (None, stream), where stream holds the
+    event_stream()/aevent_stream() arguments. Shared with the ASGI entry
+    point, which serves the stream without holding a thread.
+    """
+    try:
+        channels = parse_include(request.args.get('channels'), LIVE_CHANNELS)
+        max_seconds = current_app.config.get('LIVE_MAX_STREAM_SECONDS', DEFAULT_MAX_STREAM_SECONDS)
+        max_seconds = min(max(float(request.args.get('max_seconds', max_seconds)), 0), max_seconds)
+    except ValueError as e:
+        return (jsonify({'error': str(e)}), 400), None
+    if not channels:
+        return (jsonify({'error': 'At least one channel is required'}), 400), None
+    if not current_app.config.get('LIVE_ENABLED', True):
+        return (jsonify({'error': 'Live updates are disabled'}), 503), None
+
+    hub = get_live_hub()
+    # Subscribe before reading the snapshot so no update falls in between
+    subscription = hub.subscribe(
+        [LEADERBOARD if channel == LEADERBOARD else user_channel(current_user.id) for channel in channels],
+        holds_thread=holds_thread
+    )
+    if subscription is None:
+        response = jsonify({'error': 'Too many live streams, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response, None
+    try:
+        snapshot = []
+        if LEADERBOARD in channels:
+            version, entries = hub.leaderboard(leaderboard_entries)
+            snapshot.append((LEADERBOARD, {'leaderboard': entries, 'version': version}))
+        if 'statistics' in channels:
+            stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
+            snapshot.append(('statistics', {'statistics': statistics_delta(stats) if stats else None}))
+    except Exception:
+        hub.unsubscribe(subscription)
+        raise
+    heartbeat_seconds = current_app.config.get('LIVE_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    return None, (hub, subscription, snapshot, heartbeat_seconds, max_seconds)
+
+
+def event_stream_response(body):
+    """text/event-stream response around an SSE body iterable"""
+    response = current_app.response_class(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@statistics_bp.route('/statistics/stream', methods=['GET'])
+@token_required
+def stream_updates(current_user):
+    """Server-Sent Events: leaderboard changes and the user's own statistics (?channels=leaderboard,statistics)"""
+    try:
+        # Served here, by the WSGI app, the stream parks this thread until it ends
+        rv, stream = open_live_stream(current_user, holds_thread=True)
+        if rv is not None:
+            return rv
+        return event_stream_response(event_stream(*stream))
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to open the update stream', 'details': str(e)}), 500
+
 @statistics_bp.route('/statistics/achievements', methods=['GET'])
 @token_required
+@admission_control('statistics')
+@replica_reads
 def get_achievements(current_user):
     """Get user achievements and badges"""
     try:
         stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
         if not stats:
             return jsonify({'achievements': [], 'progress': {}}), 200
-        
-        achievements = []
-        progress = {}
-        
-        # Define achievement criteria
-        achievement_criteria = {
-            'first_quiz': {
-                'name': 'First Steps',
-                'description': 'Complete your first quiz',
-                'icon': '🎯',
-                'condition': stats.total_quizzes_taken >= 1
-            },
-            'quiz_master': {
-                'name': 'Quiz Master',
-                'description': 'Complete 10 quizzes',
-                'icon': '🏆',
-                'condition': stats.total_quizzes_taken >= 10,
-                'progress_current': stats.total_quizzes_taken,
-                'progress_target': 10
-            },
-            'perfect_score': {
-                'name': 'Perfect Score',
-                'description': 'Get 100% on a quiz',
-                'icon': '⭐',
-                'condition': QuizAttempt.query.filter_by(user_id=current_user.id, score=100.0).first() is not None
-            },
-            'streak_week': {
-                'name': 'Week Warrior',
-                'description': 'Maintain a 7-day streak',
-                'icon': '🔥',
-                'condition': stats.current_streak_days >= 7,
-                'progress_current': stats.current_streak_days,
-                'progress_target': 7
-            },
-            'high_achiever': {
-                'name': 'High Achiever',
-                'description': 'Maintain 90% average score',
-                'icon': '🌟',
-                'condition': stats.average_score >= 90,
-                'progress_current': round(stats.average_score, 1),
-                'progress_target': 90
-            },
-            'level_up': {
-                'name': 'Level Up',
-                'description': 'Reach intermediate level',
-                'icon': '📈',
-                'condition': stats.current_level in ['intermediate', 'advanced']
-            },
-            'advanced_learner': {
-                'name': 'Advanced Learner',
-                'description': 'Reach advanced level',
-                'icon': '🎓',
-                'condition': stats.current_level == 'advanced'
-            }
-        }
-        
-        # Check achievements
-        for key, criteria in achievement_criteria.items():
-            if criteria['condition']:
-                achievements.append({
-                    'id': key,
-                    'name': criteria['name'],
-                    'description': criteria['description'],
-                    'icon': criteria['icon'],
-                    'earned': True,
-                    'earned_date': stats.updated_at.isoformat()
-                })
-            else:
-                # Track progress for unearned achievements
-                if 'progress_current' in criteria:
-                    progress[key] = {
-                        'name': criteria['name'],
-                        'description': criteria['description'],
-                        'icon': criteria['icon'],
-                        'current': criteria['progress_current'],
-                        'target': criteria['progress_target'],
-                        'percentage': min(100, (criteria['progress_current'] / criteria['progress_target']) * 100)
-                    }
-        
+
+        # Awards are persisted when earned: one indexed read, progress from the stats row
+        achievements, progress = achievements_report(db.session, current_user.id, stats)
+
         return jsonify({
             'achievements': achievements,
             'progress': progress,
@@ -311,13 +347,14 @@ def get_achievements(current_user):
 
 @statistics_bp.route('/statistics/export', methods=['GET'])
 @token_required
+@admission_control('export')
+@replica_reads
 def export_statistics(current_user):
     """Export user statistics as JSON"""
     try:
         # Get all user data
         stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
-        attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
-            .order_by(QuizAttempt.completed_at).all()
+        attempts = user_attempts(db.session, current_user.id)
         
         # Prepare export data
         export_data = {
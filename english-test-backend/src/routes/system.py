@@ -0,0 +1,84 @@
+from flask import Blueprint, jsonify, request, send_file, current_app
+from src.routes.user import token_required
+from src.services.admission import get_admission
+from src.services.replica import get_replica_router
+from src.services.profiling import is_profiling_admin, list_profiles, profile_file
+from src.services.slow_queries import SORT_KEYS, get_slow_query_log
+
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/system/admission', methods=['GET'])
+@token_required
+def get_admission_stats(current_user):
+    """Admitted/rejected counts, in-flight and queue wait per route class"""
+    # Load across all users: admins only, like the profiling endpoints
+    if not is_profiling_admin():
+        return jsonify({'error': 'Admission statistics access denied'}), 403
+    return jsonify(get_admission().stats()), 200
+
+@system_bp.route('/system/replica', methods=['GET'])
+@token_required
+def get_replica_stats(current_user):
+    """Read replica lag and how many routed reads it served, found stale or left to the primary for pinned users"""
+    router = get_replica_router()
+    if router is None:
+        return jsonify({'error': 'No read replica configured'}), 404
+    return jsonify(router.stats()), 200
+
+def profiling_forbidden():
+    """Profiles require PROFILING_ENABLED and the X-Profile admin header"""
+    if not current_app.config.get('PROFILING_ENABLED', False):
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not is_profiling_admin():
+        return jsonify({'error': 'Profiling access denied'}), 403
+    return None
+
+@system_bp.route('/system/profiles', methods=['GET'])
+@token_required
+def get_profiles(current_user):
+    """List recent request profiles, newest first"""
+    error = profiling_forbidden()
+    if error:
+        return error
+    return jsonify({'profiles': list_profiles(current_app)}), 200
+
+@system_bp.route('/system/profiles/<profile_id>', methods=['GET'])
+@token_required
+def get_profile(current_user, profile_id):
+    """Full summary of one profile: SQL statements with timings and top functions"""
+    error = profiling_forbidden()
+    if error:
+        return error
+    path = profile_file(current_app, profile_id, 'summary')
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='application/json')
+
+@system_bp.route('/system/profiles/<profile_id>/download', methods=['GET'])
+@token_required
+def download_profile(current_user, profile_id):
+    """Raw profile: .prof (cProfile) or .folded (collapsed stacks for flame graphs)"""
+    error = profiling_forbidden()
+    if error:
+        return error
+    path = profile_file(current_app, profile_id, 'raw')
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, mimetype='application/octet-stream')
+
+@system_bp.route('/system/slow-queries', methods=['GET'])
+@token_required
+def get_slow_queries(current_user):
+    """Slowest statement fingerprints of the current or previous window"""
+    log = get_slow_query_log()
+    if log is None:
+        return jsonify({'error': 'Slow-query log is disabled'}), 404
+    # Samples carry bound parameters of other users' queries
+    if not is_profiling_admin():
+        return jsonify({'error': 'Slow-query log access denied'}), 403
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    previous = request.args.get('window', 'current') == 'previous'
+    return jsonify(log.report(sort=sort, limit=max(1, min(limit, 200)), previous=previous)), 200
@@ -1,32 +1,46 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, g
 from src.models.user import User, db
 from src.models.statistics import UserStatistics
+from src.services.replica import pin_to_primary
 from functools import wraps
 from datetime import datetime
 import re
 
 user_bp = Blueprint('user', __name__)
 
+def authenticate_request():
+    """Resolve the request's token; returns (user, None) or (None, error_response)"""
+    token = request.headers.get('Authorization')
+    if not token:
+        return None, (jsonify({'error': 'Token is missing'}), 401)
+    # Batched sub-requests share the application context, and the user, of their batch
+    authenticated = g.get('authenticated')
+    if authenticated is not None and authenticated[0] == token:
+        return authenticated[1], None
+    header = token
+    
+    try:
+        # Remove 'Bearer ' prefix if present
+        if token.startswith('Bearer '):
+            token = token[7:]
+        
+        current_user = User.verify_token(token, current_app.config['SECRET_KEY'])
+        if not current_user:
+            return None, (jsonify({'error': 'Token is invalid'}), 401)
+            
+    except Exception as e:
+        return None, (jsonify({'error': 'Token is invalid'}), 401)
+    
+    g.authenticated = (header, current_user)
+    return current_user, None
+
 def token_required(f):
     """Decorator to require authentication token"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            # Remove 'Bearer ' prefix if present
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            current_user = User.verify_token(token, current_app.config['SECRET_KEY'])
-            if not current_user:
-                return jsonify({'error': 'Token is invalid'}), 401
-                
-        except Exception as e:
-            return jsonify({'error': 'Token is invalid'}), 401
-        
+        current_user, error = authenticate_request()
+        if error:
+            return error
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -102,6 +116,8 @@ def register():
         db.session.add(stats)
         db.session.commit()
         print("User statistics created")
+        # Until the replica has them, the new user's reads must see these rows
+        pin_to_primary(user.id)
         
         # Generate token
         token = user.generate_token(current_app.config['SECRET_KEY'])
@@ -0,0 +1,50 @@
+from flask import Blueprint, jsonify, request
+from src.models.user import db
+from src.routes.user import token_required
+from src.services.vocabulary import get_vocabulary_index
+
+vocabulary_bp = Blueprint('vocabulary', __name__)
+
+@vocabulary_bp.route('/vocabulary', methods=['GET'])
+@token_required
+def autocomplete(current_user):
+    """Words starting with ?prefix=, with their definition and lessons"""
+    try:
+        prefix = request.args.get('prefix', '').strip()
+        if not prefix:
+            return jsonify({'error': 'prefix is required'}), 400
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        
+        index = get_vocabulary_index()
+        index.ensure_loaded(db.session)
+        words, total = index.complete(prefix, limit)
+        
+        return jsonify({
+            'prefix': prefix,
+            'words': words,
+            'total': total
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch vocabulary'}), 500
+
+@vocabulary_bp.route('/vocabulary/<path:word>', methods=['GET'])
+@token_required
+def get_word(current_user, word):
+    """One glossary word with every lesson that teaches it"""
+    try:
+        index = get_vocabulary_index()
+        index.ensure_loaded(db.session)
+        entry = index.lookup(word)
+        if entry is None:
+            return jsonify({'error': 'Word not found'}), 404
+        
+        return jsonify({
+            'word': entry['word'],
+            'definition': entry['definition'],
+            'example': entry['example'],
+            'lessons': entry['lessons']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch word'}), 500
@@ -0,0 +1,224 @@
+"""
+Achievement engine: declarative badge rules evaluated when events happen.
+
+Each rule names the events that can change its outcome (quiz submitted,
+streak updated, level changed) and a check over the user's statistics and
+the event context. record_events() evaluates only the rules listening to the
+events and not yet earned, and inserts a user_achievement row with the time
+the badge was actually earned, in the caller's transaction (a concurrent
+submission that awarded it first wins; the duplicate is skipped). Reading a user's
+achievements is then one indexed query; progress toward unearned badges
+comes from the statistics row the caller already has.
+"""
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+QUIZ_SUBMITTED = 'quiz_submitted'
+STREAK_UPDATED = 'streak_updated'
+LEVEL_CHANGED = 'level_changed'
+
+# UserStatistics.get_level_progress thresholds, highest first
+LEVEL_XP = (('advanced', 500), ('intermediate', 100), ('beginner', 0))
+PERFECT_SCORE = 100.0
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING; others insert award by award in a SAVEPOINT
+CONFLICT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+# attempts: [(completed_at, score)] of the submission; at: when the event happened
+EventContext = namedtuple('EventContext', 'stats attempts at')
+
+
+class Rule:
+    """A badge: metadata, the events it listens to, and when it is earned"""
+
+    def __init__(self, key, name, description, icon, events, check, progress=None, earned_at=None):
+        self.key = key
+        self.name = name
+        self.description = description
+        self.icon = icon
+        self.events = events
+        self.check = check
+        # stats -> (current, target), for badges shown with a progress bar
+        self.progress = progress
+        # context -> datetime, when the event time is not the earning time
+        self.earned_at = earned_at
+
+    def describe(self):
+        return {'id': self.key, 'name': self.name, 'description': self.description, 'icon': self.icon}
+
+
+def level_for_xp(xp):
+    return next(level for level, threshold in LEVEL_XP if (xp or 0) >= threshold)
+
+
+def _first_perfect(ctx):
+    return min(at for at, score in ctx.attempts if score == PERFECT_SCORE)
+
+
+RULES = (
+    Rule('first_quiz', 'First Steps', 'Complete your first quiz', '🎯', (QUIZ_SUBMITTED,),
+         lambda ctx: ctx.stats.total_quizzes_taken >= 1,
+         earned_at=lambda ctx: min(at for at, _ in ctx.attempts)),
+    Rule('quiz_master', 'Quiz Master', 'Complete 10 quizzes', '🏆', (QUIZ_SUBMITTED,),
+         lambda ctx: ctx.stats.total_quizzes_taken >= 10,
+         progress=lambda stats: (stats.total_quizzes_taken, 10)),
+    Rule('perfect_score', 'Perfect Score', 'Get 100% on a quiz', '⭐', (QUIZ_SUBMITTED,),
+         lambda ctx: any(score == PERFECT_SCORE for _, score in ctx.attempts),
+         earned_at=_first_perfect),
+    Rule('streak_week', 'Week Warrior', 'Maintain a 7-day streak', '🔥', (STREAK_UPDATED,),
+         lambda ctx: ctx.stats.current_streak_days >= 7,
+         progress=lambda stats: (stats.current_streak_days, 7)),
+    Rule('high_achiever', 'High Achiever', 'Maintain 90% average score', '🌟', (QUIZ_SUBMITTED,),
+         lambda ctx: ctx.stats.average_score >= 90,
+         progress=lambda stats: (round(stats.average_score, 1), 90)),
+    Rule('level_up', 'Level Up', 'Reach intermediate level', '📈', (LEVEL_CHANGED,),
+         lambda ctx: level_for_xp(ctx.stats.experience_points) in ('intermediate', 'advanced')),
+    Rule('advanced_learner', 'Advanced Learner', 'Reach advanced level', '🎓', (LEVEL_CHANGED,),
+         lambda ctx: level_for_xp(ctx.stats.experience_points) == 'advanced'),
+)
+RULES_BY_KEY = {rule.key: rule for rule in RULES}
+
+
+def earned_keys(session, user_id):
+    from src.models.achievement import UserAchievement
+
+    return set(session.scalars(select(UserAchievement.achievement).where(UserAchievement.user_id == user_id)))
+
+
+def record_events(session, user_id, events, stats, attempts=(), at=None):
+    """Evaluate the rules listening to `events` and persist new awards; returns the ones inserted (described)"""
+    from src.models.achievement import UserAchievement
+
+    listening = [rule for rule in RULES if set(rule.events) & set(events)]
+    if not listening:
+        return []
+    at = at or datetime.utcnow()
+    ctx = EventContext(stats, [(completed_at or at, score) for completed_at, score in attempts], at)
+    qualified = [rule for rule in listening if rule.check(ctx)]
+    if not qualified:
+        return []
+    earned = earned_keys(session, user_id)
+    awards = [
+        {'user_id': user_id, 'achievement': rule.key,
+         'earned_at': rule.earned_at(ctx) if rule.earned_at and ctx.attempts else at}
+        for rule in qualified if rule.key not in earned
+    ]
+    if not awards:
+        return []
+    # Another request may have awarded the same badge since earned_keys(): keep its row
+    inserted = insert_awards(session, UserAchievement, awards)
+    return [dict(RULES_BY_KEY[a['achievement']].describe(), earned_date=a['earned_at'].isoformat())
+            for a in awards if a['achievement'] in inserted]
+
+
+def insert_awards(session, model, awards):
+    """Insert the award rows not already recorded; returns the achievement keys inserted"""
+    table = model.__table__
+    conflict_insert = CONFLICT_INSERTS.get(session.get_bind(mapper=model).dialect.name)
+    if conflict_insert is not None:
+        return set(session.scalars(
+            conflict_insert(table).on_conflict_do_nothing(index_elements=['user_id', 'achievement'])
+            .returning(table.c.achievement),
+            awards
+        ))
+    inserted = set()
+    for award in awards:
+        try:
+            with session.begin_nested():
+                session.execute(insert(table), award)
+        except IntegrityError:
+            continue
+        inserted.add(award['achievement'])
+    return inserted
+
+
+def submission_events(before, stats):
+    """Events implied by a submission, from (streak, level) before it and the updated stats"""
+    streak, level = before
+    events = [QUIZ_SUBMITTED]
+    if stats.current_streak_days != streak:
+        events.append(STREAK_UPDATED)
+    new_level = level_for_xp(stats.experience_points)
+    if new_level != level:
+        stats.current_level = new_level
+        events.append(LEVEL_CHANGED)
+    return events
+
+
+def snapshot(stats):
+    """(streak, level) to compare against after a submission"""
+    return stats.current_streak_days, level_for_xp(stats.experience_points)
+
+
+def achievements_report(session, user_id, stats):
+    """Earned badges (one indexed query) and progress toward the others"""
+    from src.models.achievement import UserAchievement
+
+    rows = session.execute(
+        select(UserAchievement.achievement, UserAchievement.earned_at).where(UserAchievement.user_id == user_id)
+    ).all()
+    earned_at = {key: at for key, at in rows}
+    achievements, progress = [], {}
+    for rule in RULES:
+        if rule.key in earned_at:
+            achievements.append(dict(rule.describe(), earned=True, earned_date=earned_at[rule.key].isoformat()))
+        elif rule.progress is not None and stats is not None:
+            current, target = rule.progress(stats)
+            progress[rule.key] = dict(rule.describe(), current=current, target=target,
+                                      percentage=min(100, (current / target) * 100))
+            progress[rule.key].pop('id')
+    return achievements, progress
+
+
+def rebuild_achievements(conn):
+    """Award every badge users already qualify for, dated from their attempts; returns the award count"""
+    from src.models.achievement import UserAchievement
+    from src.models.archive import AttemptRollup
+    from src.models.quiz import QuizAttempt
+    from src.models.statistics import UserStatistics
+
+    conn.execute(delete(UserAchievement.__table__))
+    first_attempt, first_perfect = {}, {}
+    # Archived attempts count through their rollups
+    for found, query in (
+        (first_attempt, select(QuizAttempt.user_id, func.min(QuizAttempt.completed_at)).group_by(QuizAttempt.user_id)),
+        (first_perfect, select(QuizAttempt.user_id, func.min(QuizAttempt.completed_at))
+         .where(QuizAttempt.score == PERFECT_SCORE).group_by(QuizAttempt.user_id)),
+        (first_attempt, select(AttemptRollup.user_id, func.min(AttemptRollup.first_completed_at))
+         .group_by(AttemptRollup.user_id)),
+        (first_perfect, select(AttemptRollup.user_id, func.min(AttemptRollup.first_perfect_at))
+         .where(AttemptRollup.first_perfect_at.isnot(None)).group_by(AttemptRollup.user_id)),
+    ):
+        for user_id, at in conn.execute(query):
+            if at is not None and (user_id not in found or at < found[user_id]):
+                found[user_id] = at
+    rows = conn.execute(select(
+        UserStatistics.user_id, UserStatistics.total_quizzes_taken, UserStatistics.current_streak_days,
+        UserStatistics.average_score, UserStatistics.experience_points, UserStatistics.updated_at
+    ))
+    total = 0
+    while True:
+        batch = rows.fetchmany(2000)
+        if not batch:
+            break
+        awards = []
+        for stats in batch:
+            # Past statistics are not kept: their last update stands in for the earning time
+            at = stats.updated_at or datetime.utcnow()
+            perfect = first_perfect.get(stats.user_id)
+            ctx = EventContext(stats, [(perfect, PERFECT_SCORE)] if perfect else [], at)
+            for rule in RULES:
+                if not rule.check(ctx):
+                    continue
+                if rule.key == 'first_quiz':
+                    earned_at = first_attempt.get(stats.user_id) or at
+                else:
+                    earned_at = rule.earned_at(ctx) if rule.earned_at else at
+                awards.append({'user_id': stats.user_id, 'achievement': rule.key, 'earned_at': earned_at})
+        if awards:
+            conn.execute(insert(UserAchievement.__table__), awards)
+            total += len(awards)
+    return total
@@ -0,0 +1,344 @@
+from collections import deque
+from flask import current_app, g, jsonify
+from functools import wraps
+import asyncio
+import math
+import threading
+import time
+
+GENERATE = 'generate'
+
+# Per route class:
+#   rate / burst      token bucket per user (requests per second, bucket size)
+#   user_concurrency  requests one user may have in flight at once
+#   concurrency       global in-flight cap, with up to `queue` requests waiting
+#                     at most queue_timeout seconds for a slot
+#   retry_after       Retry-After hint (seconds) when a slot is not available
+DEFAULT_ADMISSION_POLICIES = {
+    GENERATE: {'rate': 0.2, 'burst': 3, 'user_concurrency': 1,
+               'concurrency': 8, 'queue': 16, 'queue_timeout': 5.0, 'retry_after': 10},
+    'export': {'rate': 0.05, 'burst': 2, 'user_concurrency': 1, 'retry_after': 5},
+    'statistics': {'rate': 2.0, 'burst': 10, 'user_concurrency': 2, 'retry_after': 1},
+    # A whole POST /api/batch; its sub-requests are not admitted again
+    'batch': {'rate': 1.0, 'burst': 5, 'user_concurrency': 2, 'retry_after': 1},
+}
+
+# Idle buckets are dropped once there are more than this many
+MAX_BUCKETS = 10000
+
+
+class Rejected(Exception):
+    """A request refused by admission control"""
+
+    def __init__(self, route_class, reason, retry_after):
+        super().__init__(f'{route_class}: {reason}')
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """Consume one token; returns 0 on success, else seconds until one is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class ConcurrencyGate:
+    """Global in-flight cap with a bounded FIFO-ish wait queue"""
+
+    def __init__(self, limit, queue, queue_timeout):
+        self.limit = limit
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Take a slot; returns (reason, seconds queued), reason None when admitted"""
+        with self._cond:
+            if self.active < self.limit and self.waiting == 0:
+                self.active += 1
+                return None, 0.0
+            if self.waiting >= self.queue:
+                return 'queue_full', 0.0
+            self.waiting += 1
+            start = time.monotonic()
+            try:
+                ok = self._cond.wait_for(lambda: self.active < self.limit, self.queue_timeout)
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - start
+            if not ok:
+                return 'queue_timeout', waited
+            self.active += 1
+            return None, waited
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class AsyncConcurrencyGate:
+    """ConcurrencyGate for an event loop: queued requests await a slot without holding a thread"""
+
+    def __init__(self, limit, queue, queue_timeout):
+        self.limit = limit
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # Futures of the queued requests; release() hands its slot to the oldest
+        self._waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Take a slot; returns (reason, seconds queued), reason None when admitted"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None, 0.0
+        if len(self._waiters) >= self.queue:
+            return 'queue_full', 0.0
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(slot), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(slot)
+            raise
+        waited = time.monotonic() - start
+        if not slot.done():
+            self._abandon(slot)
+            return 'queue_timeout', waited
+        return None, waited
+
+    def _abandon(self, slot):
+        if slot.done():
+            # Handed a slot just as the wait ended: pass it on
+            self.release()
+        else:
+            self._waiters.remove(slot)
+            slot.cancel()
+
+    def release(self):
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+
+class Ticket:
+    """An admitted request; release() (or leaving the with block) frees its slots"""
+
+    def __init__(self, controller, key, gate):
+        self.controller = controller
+        self.key = key
+        self.gate = gate
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.gate is not None:
+            self.gate.release()
+        self.controller._leave(self.key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """Token buckets per (user, route class) plus per-user and global concurrency caps"""
+
+    def __init__(self, policies):
+        self.policies = policies
+        self.gates = {
+            name: ConcurrencyGate(p['concurrency'], p.get('queue', 0), p.get('queue_timeout', 0))
+            for name, p in policies.items() if p.get('concurrency')
+        }
+        self._buckets = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.admitted = {name: 0 for name in policies}
+        self.rejected = {}
+        self.queue_wait = {name: {'count': 0, 'total_s': 0.0, 'max_s': 0.0} for name in self.gates}
+
+    def use_async_gate(self, route_class, limit):
+        """Replace the class's global cap with an AsyncConcurrencyGate of `limit` slots (same queue settings)"""
+        policy = self.policies[route_class]
+        gate = AsyncConcurrencyGate(limit, policy.get('queue', 0), policy.get('queue_timeout', 0))
+        self.gates[route_class] = gate
+        self.queue_wait.setdefault(route_class, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+        return gate
+
+    def admit(self, user_id, route_class):
+        """Admit a request or raise Rejected without waiting (except in a bounded queue)
+
+        With an AsyncConcurrencyGate the ticket comes back without a slot: the
+        caller then awaits enter_gate() on the event loop.
+        """
+        policy = self.policies.get(route_class)
+        if policy is None:
+            return Ticket(self, None, None)
+        key = (user_id, route_class)
+        now = time.monotonic()
+        with self._lock:
+            if self._inflight.get(key, 0) >= policy.get('user_concurrency', math.inf):
+                raise self._reject(route_class, 'user_concurrency', policy.get('retry_after', 1))
+            if 'rate' in policy:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if len(self._buckets) >= MAX_BUCKETS:
+                        self._prune(now)
+                    bucket = self._buckets[key] = TokenBucket(policy['rate'], policy['burst'], now)
+                wait = bucket.take(now)
+                if wait:
+                    raise self._reject(route_class, 'rate', wait)
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+
+        gate = self.gates.get(route_class)
+        if isinstance(gate, AsyncConcurrencyGate):
+            return Ticket(self, key, None)
+        if gate is not None:
+            reason, waited = gate.acquire()
+            if reason is not None:
+                self._leave(key)
+            self._gate_outcome(route_class, reason, waited)
+        else:
+            with self._lock:
+                self.admitted[route_class] += 1
+        return Ticket(self, key, gate)
+
+    async def enter_gate(self, ticket, route_class):
+        """Await a slot of the class's AsyncConcurrencyGate for an admitted ticket; raises Rejected (ticket released)"""
+        gate = self.gates[route_class]
+        reason, waited = await gate.acquire()
+        if reason is not None:
+            ticket.release()
+        self._gate_outcome(route_class, reason, waited)
+        ticket.gate = gate
+
+    def _gate_outcome(self, route_class, reason, waited):
+        with self._lock:
+            if reason != 'queue_full':
+                self._record_wait(route_class, waited)
+            if reason is not None:
+                raise self._reject(route_class, reason, self.policies[route_class].get('retry_after', 1))
+            self.admitted[route_class] += 1
+
+    def _leave(self, key):
+        if key is None:
+            return
+        with self._lock:
+            count = self._inflight.get(key, 0) - 1
+            if count > 0:
+                self._inflight[key] = count
+            else:
+                self._inflight.pop(key, None)
+
+    def _reject(self, route_class, reason, retry_after):
+        counter = (route_class, reason)
+        self.rejected[counter] = self.rejected.get(counter, 0) + 1
+        return Rejected(route_class, reason, retry_after)
+
+    def _record_wait(self, route_class, waited):
+        wait = self.queue_wait[route_class]
+        wait['count'] += 1
+        wait['total_s'] += waited
+        wait['max_s'] = max(wait['max_s'], waited)
+
+    def _prune(self, now):
+        """Drop buckets that have refilled completely (their users are idle)"""
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            classes = {}
+            for name in self.policies:
+                gate = self.gates.get(name)
+                entry = {
+                    'admitted': self.admitted[name],
+                    'rejected': {reason: n for (cls, reason), n in self.rejected.items() if cls == name},
+                }
+                if gate is not None:
+                    wait = self.queue_wait[name]
+                    entry.update({
+                        'in_flight': gate.active,
+                        'queued': gate.waiting,
+                        'queue_wait': {
+                            'count': wait['count'],
+                            'avg_ms': round(wait['total_s'] / wait['count'] * 1000, 2) if wait['count'] else 0,
+                            'max_ms': round(wait['max_s'] * 1000, 2),
+                        },
+                    })
+                classes[name] = entry
+            return {'classes': classes, 'tracked_buckets': len(self._buckets)}
+
+
+def init_admission(app):
+    """Attach an AdmissionController built from ADMISSION_POLICIES (merged over the defaults)"""
+    policies = {name: dict(policy) for name, policy in DEFAULT_ADMISSION_POLICIES.items()}
+    for name, overrides in app.config.get('ADMISSION_POLICIES', {}).items():
+        policies.setdefault(name, {}).update(overrides)
+    app.extensions['admission'] = AdmissionController(policies)
+
+
+def get_admission():
+    return current_app.extensions['admission']
+
+
+def too_many_requests(rejection):
+    """Fast 429 with a Retry-After hint"""
+    retry_after = max(1, math.ceil(rejection.retry_after))
+    response = jsonify({
+        'error': 'Too many requests',
+        'reason': rejection.reason,
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_control(route_class):
+    """Decorator (below token_required) admitting the request for current_user or returning 429"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            if not current_app.config.get('ADMISSION_ENABLED', True) or g.get('in_batch'):
+                return f(current_user, *args, **kwargs)
+            try:
+                ticket = get_admission().admit(current_user.id, route_class)
+            except Rejected as e:
+                return too_many_requests(e)
+            with ticket:
+                return f(current_user, *args, **kwargs)
+        return decorated
+    return decorator
@@ -0,0 +1,259 @@
+"""
+Hot/cold tiering of quiz attempts.
+
+archive-attempts moves attempts completed more than ATTEMPT_ARCHIVE_AFTER_DAYS
+ago from quiz_attempt into quiz_attempt_archive (same ids, answers
+compressed) and folds them into attempt_rollup, per user, quiz and month:
+counts, score and experience sums, and the grading (correct answers,
+accuracy) done once at archive time. quiz_attempt then only holds recent
+activity, small enough to stay in the page cache.
+
+Statistics read hot rows plus rollups, so totals, average accuracy and topic
+performance do not change when attempts are archived. Attempt listings read
+the archive only when their range reaches past the archive age, so weekly and
+monthly views never touch it.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Integer, bindparam, case, cast, delete, func, insert, literal, select, union_all, update
+import json
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+# Weekly and monthly views must never need the archive
+MIN_ARCHIVE_AFTER_DAYS = 31
+DEFAULT_BATCH_SIZE = 5000
+
+
+def archive_after_days(app=None):
+    config = (app or current_app).config
+    return max(config.get('ATTEMPT_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS), MIN_ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(start):
+    """Whether attempts completed since `start` (None: ever) may be in the archive"""
+    return start is None or start < datetime.utcnow() - timedelta(days=archive_after_days())
+
+
+def attempt_totals(session, user_id):
+    """(taken, experience, total_score, passed) over hot and archived attempts, in one query"""
+    from src.models.archive import AttemptRollup
+    from src.models.quiz import QuizAttempt
+
+    hot = select(
+        func.count(QuizAttempt.id).label('taken'), func.sum(cast(QuizAttempt.score, Integer)).label('experience'),
+        func.sum(QuizAttempt.score).label('total_score'), func.sum(cast(QuizAttempt.is_passed, Integer)).label('passed')
+    ).where(QuizAttempt.user_id == user_id)
+    cold = select(
+        func.sum(AttemptRollup.attempts), func.sum(AttemptRollup.experience),
+        func.sum(AttemptRollup.score_sum), func.sum(AttemptRollup.passed)
+    ).where(AttemptRollup.user_id == user_id)
+    both = union_all(hot, cold).subquery()
+    taken, experience, total_score, passed = session.execute(select(
+        func.coalesce(func.sum(both.c.taken), 0), func.coalesce(func.sum(both.c.experience), 0),
+        func.coalesce(func.sum(both.c.total_score), 0), func.coalesce(func.sum(both.c.passed), 0)
+    )).one()
+    return taken, experience, total_score, passed
+
+
+def archived_count(session, user_id):
+    from src.models.archive import AttemptRollup
+
+    return session.scalar(
+        select(func.coalesce(func.sum(AttemptRollup.attempts), 0)).where(AttemptRollup.user_id == user_id)
+    )
+
+
+def archived_grades(session, user_id):
+    """[(topic, correct_answers, total_questions, accuracy_sum, attempts, best_accuracy)] from rollups"""
+    from src.models.archive import AttemptRollup
+    from src.models.lesson import Lesson
+    from src.models.quiz import Quiz
+
+    return session.execute(
+        select(func.lower(Lesson.topic), func.sum(AttemptRollup.correct_answers),
+               func.sum(AttemptRollup.total_questions), func.sum(AttemptRollup.accuracy_sum),
+               func.sum(AttemptRollup.attempts), func.max(AttemptRollup.best_accuracy))
+        .select_from(AttemptRollup).join(Quiz, Quiz.id == AttemptRollup.quiz_id)
+        .outerjoin(Lesson, Lesson.id == Quiz.lesson_id)
+        .where(AttemptRollup.user_id == user_id).group_by(func.lower(Lesson.topic))
+    ).all()
+
+
+def user_attempts(session, user_id, since=None, quiz_id=None, hot_options=(), cold_options=(), newest_first=False):
+    """The user's attempts (QuizAttempt and ArchivedAttempt rows) ordered by completion time"""
+    from src.models.archive import ArchivedAttempt
+    from src.models.quiz import QuizAttempt
+
+    found = []
+    models = ((QuizAttempt, hot_options), (ArchivedAttempt, cold_options)) if reaches_archive(since) \
+        else ((QuizAttempt, hot_options),)
+    for model, options in models:
+        query = session.query(model).filter(model.user_id == user_id).options(*options)
+        if since is not None:
+            query = query.filter(model.completed_at >= since)
+        if quiz_id is not None:
+            query = query.filter(model.quiz_id == quiz_id)
+        found.extend(query.all())
+    found.sort(key=lambda a: (a.completed_at or datetime.min, a.id), reverse=newest_first)
+    return found
+
+
+def recent_user_attempts(session, user_id, limit, hot_options=(), cold_options=()):
+    """The user's `limit` most recent attempts; the archive is read only when the hot table runs short"""
+    from src.models.archive import ArchivedAttempt
+    from src.models.quiz import QuizAttempt
+
+    def newest(model, options):
+        return session.query(model).filter(model.user_id == user_id).options(*options)\
+            .order_by(model.completed_at.desc(), model.id.desc()).limit(limit).all()
+
+    found = newest(QuizAttempt, hot_options)
+    if len(found) < limit:
+        found.extend(newest(ArchivedAttempt, cold_options))
+        found.sort(key=lambda a: (a.completed_at or datetime.min, a.id), reverse=True)
+    return found[:limit]
+
+
+def attempts_page(session, user_id, offset, limit, hot_options=(), cold_options=()):
+    """One page of the user's attempts across both tables, newest first, in two or three queries"""
+    from src.models.archive import ArchivedAttempt
+    from src.models.quiz import QuizAttempt
+
+    tiers = union_all(
+        select(QuizAttempt.id, QuizAttempt.completed_at, literal(0).label('cold')).where(QuizAttempt.user_id == user_id),
+        select(ArchivedAttempt.id, ArchivedAttempt.completed_at, literal(1).label('cold'))
+        .where(ArchivedAttempt.user_id == user_id),
+    ).subquery()
+    page = session.execute(
+        select(tiers.c.id, tiers.c.cold).order_by(tiers.c.completed_at.desc(), tiers.c.id.desc())
+        .offset(offset).limit(limit)
+    ).all()
+    loaded = {}
+    for cold, model, options in ((0, QuizAttempt, hot_options), (1, ArchivedAttempt, cold_options)):
+        ids = [row.id for row in page if row.cold == cold]
+        if ids:
+            loaded.update(((cold, a.id), a) for a in session.query(model).options(*options).filter(model.id.in_(ids)))
+    return [loaded[(row.cold, row.id)] for row in page if (row.cold, row.id) in loaded]
+
+
+def _rollup_key(row):
+    return row.user_id, row.quiz_id, row.completed_at.strftime('%Y-%m')
+
+
+def _fold(rollups, conn):
+    """Add each {(user_id, quiz_id, month): totals} to its rollup row: one executemany per kind of write"""
+    from src.models.archive import AttemptRollup
+
+    table = AttemptRollup.__table__
+    existing = set(conn.execute(
+        select(table.c.user_id, table.c.quiz_id, table.c.month)
+        .where(table.c.user_id.in_({user_id for user_id, _, _ in rollups}))
+    ).tuples())
+    new = [dict(t, user_id=user_id, quiz_id=quiz_id, month=month)
+           for (user_id, quiz_id, month), t in rollups.items() if (user_id, quiz_id, month) not in existing]
+    if new:
+        conn.execute(insert(table), new)
+    updates = [{**{f'add_{k}': v for k, v in t.items()}, 'key_user_id': user_id, 'key_quiz_id': quiz_id,
+                'key_month': month}
+               for (user_id, quiz_id, month), t in rollups.items() if (user_id, quiz_id, month) in existing]
+    if not updates:
+        return
+    add = {name: bindparam(f'add_{name}') for name in _new_totals()}
+    conn.execute(update(table).where(
+        table.c.user_id == bindparam('key_user_id'), table.c.quiz_id == bindparam('key_quiz_id'),
+        table.c.month == bindparam('key_month')
+    ).values(
+        **{name: table.c[name] + add[name] for name in
+           ('attempts', 'passed', 'perfect', 'score_sum', 'experience', 'time_spent',
+            'correct_answers', 'total_questions', 'accuracy_sum')},
+        best_accuracy=case((table.c.best_accuracy < add['best_accuracy'], add['best_accuracy']),
+                           else_=table.c.best_accuracy),
+        first_completed_at=case((table.c.first_completed_at > add['first_completed_at'], add['first_completed_at']),
+                                else_=table.c.first_completed_at),
+        # NULL comparisons are false: a missing first_perfect_at on either side keeps the other
+        first_perfect_at=func.coalesce(case((table.c.first_perfect_at > add['first_perfect_at'],
+                                             add['first_perfect_at']), else_=table.c.first_perfect_at),
+                                       add['first_perfect_at']),
+    ), updates)
+
+
+def _new_totals():
+    return {'attempts': 0, 'passed': 0, 'perfect': 0, 'score_sum': 0.0, 'experience': 0, 'time_spent': 0.0,
+            'correct_answers': 0, 'total_questions': 0, 'accuracy_sum': 0.0, 'best_accuracy': 0.0,
+            'first_completed_at': None, 'first_perfect_at': None}
+
+
+def archive_batch(conn, before, batch_size=DEFAULT_BATCH_SIZE):
+    """Archive up to batch_size attempts completed before `before`; returns how many"""
+    from src.models.archive import ArchivedAttempt
+    from src.models.quiz import Quiz, QuizAttempt
+    from src.services.achievements import PERFECT_SCORE
+
+    hot = QuizAttempt.__table__
+    # The newest attempt stays hot so SQLite never hands its id out again
+    newest = conn.scalar(select(func.max(hot.c.id)))
+    rows = conn.execute(
+        select(hot).where(hot.c.completed_at < before, hot.c.id != newest).order_by(hot.c.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    # Grade like UserStatistics._grade_attempts, decoding each quiz's questions once
+    quizzes = {}
+    for quiz_id, questions in conn.execute(
+        select(Quiz.id, Quiz.questions).where(Quiz.id.in_({row.quiz_id for row in rows}))
+    ):
+        quiz = Quiz(id=quiz_id, questions=questions)
+        quizzes[quiz_id] = (quiz, quiz.get_questions())
+
+    archived, rollups = [], defaultdict(_new_totals)
+    for row in rows:
+        archived.append({
+            'id': row.id, 'user_id': row.user_id, 'quiz_id': row.quiz_id,
+            'answers': ArchivedAttempt.pack_answers(row.answers), 'score': row.score,
+            'time_taken_minutes': row.time_taken_minutes, 'completed_at': row.completed_at, 'is_passed': row.is_passed
+        })
+        quiz, questions = quizzes.get(row.quiz_id, (None, []))
+        try:
+            answers = json.loads(row.answers)
+        except json.JSONDecodeError:
+            answers = {}
+        correct = quiz.calculate_score(answers, None, questions)[1] if quiz is not None else 0
+        total_questions = len(questions) if isinstance(questions, list) else 0
+        accuracy = (correct / total_questions) * 100 if total_questions else 0
+
+        t = rollups[_rollup_key(row)]
+        t['attempts'] += 1
+        t['passed'] += 1 if row.is_passed else 0
+        t['score_sum'] += row.score
+        t['experience'] += int(row.score)
+        t['time_spent'] += row.time_taken_minutes or 0
+        t['correct_answers'] += correct
+        t['total_questions'] += total_questions
+        t['accuracy_sum'] += accuracy
+        t['best_accuracy'] = max(t['best_accuracy'], accuracy)
+        if t['first_completed_at'] is None or row.completed_at < t['first_completed_at']:
+            t['first_completed_at'] = row.completed_at
+        if row.score == PERFECT_SCORE:
+            t['perfect'] += 1
+            if t['first_perfect_at'] is None or row.completed_at < t['first_perfect_at']:
+                t['first_perfect_at'] = row.completed_at
+
+    conn.execute(insert(ArchivedAttempt.__table__), archived)
+    _fold(rollups, conn)
+    conn.execute(delete(hot).where(hot.c.id.in_([row.id for row in rows])))
+    return len(rows)
+
+
+def archive_attempts(engine, before, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Archive every attempt completed before `before`, one transaction per batch; returns how many"""
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            moved = archive_batch(conn, before, batch_size)
+        total += moved
+        if progress and moved:
+            progress(f'archived {total} attempts')
+        if moved < batch_size:
+            return total
@@ -0,0 +1,131 @@
+"""
+Multiplexed GET sub-requests for POST /api/batch.
+
+Each sub-request runs the matched view directly inside a nested request
+context of the current application context, so it shares the outer
+request's authenticated user (cached on `g` by authenticate_request) and its
+database session; before/after_request hooks (metrics, compression) run once
+for the batch. Only GET routes are allowed, and the session is read-only
+while a sub-request runs: a view that commits (the dashboard creating a
+missing statistics row) has its changes rolled back, so a batch never writes
+on the client's behalf. The batch is admitted once as a whole ('batch'
+admission class); its sub-requests skip the per-route admission checks.
+With `parallel`, sub-requests run on a small thread pool, each in its own
+application context and session, with the already authenticated user merged
+in rather than reloaded.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import current_app, g, request
+from werkzeug.exceptions import HTTPException, NotFound
+
+DEFAULT_MAX_REQUESTS = 20
+DEFAULT_MAX_WORKERS = 4
+# Request headers passed through to sub-requests (Authorization is always shared)
+FORWARDED_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Accept-Language')
+# Response headers reported per sub-request
+RETURNED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Retry-After')
+
+
+class BatchError(ValueError):
+    """An invalid batch as a whole (400)"""
+
+
+def parse_batch(data, max_requests):
+    """Validated list of {'id', 'path', 'headers'} sub-requests"""
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError('requests must be a non-empty list')
+    if len(items) > max_requests:
+        raise BatchError(f'At most {max_requests} requests per batch')
+    parsed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'path': item}
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f'requests[{index}] needs a path')
+        headers = item.get('headers') if isinstance(item.get('headers'), dict) else {}
+        parsed.append({
+            'id': item.get('id', index),
+            'method': str(item.get('method', 'GET')).upper(),
+            'path': item['path'],
+            'headers': {name: str(headers[name]) for name in FORWARDED_HEADERS if name in headers},
+        })
+    return parsed
+
+
+def _result(item, status, body, headers=None):
+    return {'id': item['id'], 'status': status, 'headers': headers or {}, 'body': body}
+
+
+@contextmanager
+def _sub_request_scope(session):
+    """Mark the application context as inside a batch and make its session read-only"""
+    previous = g.get('in_batch', False), session.info.get('read_only', False)
+    g.in_batch = True
+    session.info['read_only'] = True
+    try:
+        yield
+    finally:
+        g.in_batch, session.info['read_only'] = previous
+
+
+def _dispatch(app, item, authorization, batch_path):
+    """Run one sub-request in the current application context"""
+    from src.models.user import db
+
+    path = item['path']
+    if item['method'] != 'GET':
+        return _result(item, 405, {'error': 'Only GET requests can be batched'})
+    if not path.startswith('/api/') or path.split('?', 1)[0].rstrip('/') == batch_path.rstrip('/'):
+        return _result(item, 400, {'error': 'Path must be an /api/ route other than the batch endpoint'})
+    headers = dict(item['headers'])
+    if authorization:
+        headers['Authorization'] = authorization
+    # No autoflush: a change a view leaves behind stays pending, visible below
+    with _sub_request_scope(db.session()), app.test_request_context(path, method='GET', headers=headers), \
+            db.session.no_autoflush:
+        try:
+            if request.routing_exception is None and '.' not in (request.endpoint or ''):
+                # Only blueprint API views, not the catch-all frontend route
+                raise NotFound()
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as e:
+            return _result(item, e.code, {'error': e.description})
+        except Exception:
+            app.logger.exception('Batched request %s failed', path)
+            return _result(item, 500, {'error': 'Internal server error'})
+        finally:
+            session = db.session()
+            if session.new or session.dirty or session.deleted:
+                # Uncommitted changes a view left on the shared session must not leak into the next one
+                session.rollback()
+        if response.is_streamed:
+            # An event stream would hold the whole batch open
+            response.close()
+            return _result(item, 400, {'error': 'Streaming routes cannot be batched'})
+        body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+        return _result(item, response.status_code, body, returned)
+
+
+def _dispatch_in_thread(app, item, authorization, batch_path, user):
+    from src.models.user import db
+
+    with app.app_context():
+        if user is not None:
+            # Same user, attached to this thread's session without a query
+            g.authenticated = (authorization, db.session.merge(user, load=False))
+        return _dispatch(app, item, authorization, batch_path)
+
+
+def run_batch(items, current_user, parallel=False):
+    """Results of every sub-request, in request order"""
+    app = current_app._get_current_object()
+    authorization = request.headers.get('Authorization')
+    workers = min(len(items), app.config.get('BATCH_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+    if not parallel or workers < 2:
+        return [_dispatch(app, item, authorization, request.path) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool:
+        futures = [pool.submit(_dispatch_in_thread, app, item, authorization, request.path, current_user) for item in items]
+        return [future.result() for future in futures]
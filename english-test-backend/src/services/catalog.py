@@ -0,0 +1,212 @@
+"""
+Materialized catalog facets.
+
+catalog_facet holds, per kind (lesson, quiz), the number of active rows for
+each (topic, level, quiz_type). A quiz takes the topic of its lesson. Mapper
+events apply +1/-1 deltas in the same transaction as the lesson or quiz
+write (create, edit, soft or hard delete), so reading the facets is one
+query over a table of a few hundred rows instead of a scan of the catalog.
+Bulk loads that bypass the ORM call rebuild_catalog_facets().
+"""
+from collections import Counter
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+
+LESSON = 'lesson'
+QUIZ = 'quiz'
+
+SUGGESTED_TOPICS = [
+    'Grammar', 'Vocabulary', 'Reading Comprehension', 'Writing Skills',
+    'Speaking Practice', 'Listening Skills', 'Pronunciation', 'Business English',
+    'Travel English', 'Academic English', 'Conversation Skills', 'Idioms and Phrases'
+]
+
+
+def _key(kind, topic, level, quiz_type=None):
+    return kind, topic or '', level or '', quiz_type or ''
+
+
+def apply_deltas(conn, deltas):
+    """Add each delta of {(kind, topic, level, quiz_type): n} to its facet row"""
+    from src.models.catalog import CatalogFacet
+
+    table = CatalogFacet.__table__
+    for (kind, topic, level, quiz_type), delta in deltas.items():
+        if not delta:
+            continue
+        match = (table.c.kind == kind, table.c.topic == topic, table.c.level == level, table.c.quiz_type == quiz_type)
+        if conn.execute(update(table).where(*match).values(count=table.c.count + delta)).rowcount == 0:
+            conn.execute(insert(table).values(kind=kind, topic=topic, level=level, quiz_type=quiz_type,
+                                              count=max(delta, 0)))
+
+
+def rebuild_catalog_facets(conn):
+    """Recount every facet from the lesson and quiz tables; returns the number of facet rows"""
+    from src.models.catalog import CatalogFacet
+    from src.models.lesson import Lesson
+    from src.models.quiz import Quiz
+
+    conn.execute(delete(CatalogFacet.__table__))
+    lessons = conn.execute(
+        select(Lesson.topic, Lesson.level, func.count()).where(Lesson.is_active.is_(True))
+        .group_by(Lesson.topic, Lesson.level)
+    ).all()
+    quizzes = conn.execute(
+        select(Lesson.topic, Quiz.level, Quiz.quiz_type, func.count())
+        .select_from(Quiz).outerjoin(Lesson, Lesson.id == Quiz.lesson_id)
+        .where(Quiz.is_active.is_(True))
+        .group_by(Lesson.topic, Quiz.level, Quiz.quiz_type)
+    ).all()
+    deltas = Counter()
+    for topic, level, count in lessons:
+        deltas[_key(LESSON, topic, level)] += count
+    for topic, level, quiz_type, count in quizzes:
+        deltas[_key(QUIZ, topic, level, quiz_type)] += count
+    if deltas:
+        conn.execute(insert(CatalogFacet.__table__), [
+            {'kind': kind, 'topic': topic, 'level': level, 'quiz_type': quiz_type, 'count': count}
+            for (kind, topic, level, quiz_type), count in deltas.items()
+        ])
+    return len(deltas)
+
+
+def catalog_facets(conn):
+    """Lesson and quiz counts per facet, with totals by topic, level and quiz type"""
+    from src.models.catalog import CatalogFacet
+
+    result = {
+        'lessons': {'total': 0, 'by_topic': {}, 'by_level': {}, 'facets': []},
+        'quizzes': {'total': 0, 'by_topic': {}, 'by_level': {}, 'by_quiz_type': {}, 'facets': []},
+    }
+    rows = conn.execute(
+        select(CatalogFacet.kind, CatalogFacet.topic, CatalogFacet.level, CatalogFacet.quiz_type, CatalogFacet.count)
+        .where(CatalogFacet.count > 0)
+        .order_by(CatalogFacet.kind, CatalogFacet.topic, CatalogFacet.level, CatalogFacet.quiz_type)
+    )
+    for kind, topic, level, quiz_type, count in rows:
+        section = result['lessons' if kind == LESSON else 'quizzes']
+        topic, level = topic or None, level or None
+        section['total'] += count
+        # JSON object keys cannot be null: quizzes without a lesson are grouped under ''
+        section['by_topic'][topic or ''] = section['by_topic'].get(topic or '', 0) + count
+        section['by_level'][level or ''] = section['by_level'].get(level or '', 0) + count
+        facet = {'topic': topic, 'level': level, 'count': count}
+        if kind == QUIZ:
+            section['by_quiz_type'][quiz_type] = section['by_quiz_type'].get(quiz_type, 0) + count
+            facet['quiz_type'] = quiz_type or None
+        section['facets'].append(facet)
+    return result
+
+
+# Sync ----------------------------------------------------------------------
+
+def _sync_enabled():
+    return has_app_context() and current_app.config.get('CATALOG_FACETS_SYNC_ENABLED', True)
+
+
+def _values(target, names):
+    """(before, after) values of `names`, from the attribute history of a flushed update"""
+    attrs = inspect(target).attrs
+    before, after = [], []
+    for name in names:
+        history = getattr(attrs, name).history
+        current = getattr(target, name)
+        before.append(history.deleted[0] if history.deleted else current)
+        after.append(current)
+    return before, after
+
+
+def _lesson_topic(conn, lesson_id):
+    from src.models.lesson import Lesson
+
+    if lesson_id is None:
+        return None
+    return conn.execute(select(Lesson.topic).where(Lesson.id == lesson_id)).scalar()
+
+
+def _lesson_inserted(mapper, connection, target):
+    if _sync_enabled() and target.is_active is not False:
+        apply_deltas(connection, {_key(LESSON, target.topic, target.level): 1})
+
+
+def _lesson_updated(mapper, connection, target):
+    if not _sync_enabled():
+        return
+    from src.models.quiz import Quiz
+
+    (old_topic, old_level, was_active), (topic, level, active) = _values(target, ('topic', 'level', 'is_active'))
+    deltas = Counter()
+    if was_active is not False:
+        deltas[_key(LESSON, old_topic, old_level)] -= 1
+    if active is not False:
+        deltas[_key(LESSON, topic, level)] += 1
+    if old_topic != topic:
+        # Quizzes carry their lesson's topic
+        quizzes = connection.execute(
+            select(Quiz.level, Quiz.quiz_type, func.count())
+            .where(Quiz.lesson_id == target.id, Quiz.is_active.is_(True))
+            .group_by(Quiz.level, Quiz.quiz_type)
+        )
+        for quiz_level, quiz_type, count in quizzes:
+            deltas[_key(QUIZ, old_topic, quiz_level, quiz_type)] -= count
+            deltas[_key(QUIZ, topic, quiz_level, quiz_type)] += count
+    apply_deltas(connection, deltas)
+
+
+def _lesson_deleted(mapper, connection, target):
+    if not _sync_enabled():
+        return
+    (old_topic, old_level, was_active), _ = _values(target, ('topic', 'level', 'is_active'))
+    if was_active is not False:
+        apply_deltas(connection, {_key(LESSON, old_topic, old_level): -1})
+
+
+def _quiz_inserted(mapper, connection, target):
+    if _sync_enabled() and target.is_active is not False:
+        topic = _lesson_topic(connection, target.lesson_id)
+        apply_deltas(connection, {_key(QUIZ, topic, target.level, target.quiz_type): 1})
+
+
+def _quiz_updated(mapper, connection, target):
+    if not _sync_enabled():
+        return
+    names = ('lesson_id', 'level', 'quiz_type', 'is_active')
+    before, after = _values(target, names)
+    if before == after:
+        return
+    (old_lesson, old_level, old_type, was_active), (lesson_id, level, quiz_type, active) = before, after
+    deltas = Counter()
+    if was_active is not False:
+        deltas[_key(QUIZ, _lesson_topic(connection, old_lesson), old_level, old_type)] -= 1
+    if active is not False:
+        deltas[_key(QUIZ, _lesson_topic(connection, lesson_id), level, quiz_type)] += 1
+    apply_deltas(connection, deltas)
+
+
+def _quiz_deleted(mapper, connection, target):
+    if not _sync_enabled():
+        return
+    (old_lesson, old_level, old_type, was_active), _ = _values(target, ('lesson_id', 'level', 'quiz_type', 'is_active'))
+    if was_active is not False:
+        apply_deltas(connection, {_key(QUIZ, _lesson_topic(connection, old_lesson), old_level, old_type): -1})
+
+
+def _keep_previous(target, value, oldvalue, initiator):
+    """No-op: registered with active_history so updates know the value being replaced"""
+
+
+def init_catalog(app):
+    """Keep catalog_facet counts in step with lesson and quiz writes (CATALOG_FACETS_SYNC_ENABLED)"""
+    from src.models.lesson import Lesson
+    from src.models.quiz import Quiz
+
+    if not event.contains(Lesson, 'after_insert', _lesson_inserted):
+        for attribute in (Lesson.topic, Lesson.level, Lesson.is_active,
+                          Quiz.lesson_id, Quiz.level, Quiz.quiz_type, Quiz.is_active):
+            event.listen(attribute, 'set', _keep_previous, active_history=True)
+        event.listen(Lesson, 'after_insert', _lesson_inserted)
+        event.listen(Lesson, 'after_update', _lesson_updated)
+        event.listen(Lesson, 'after_delete', _lesson_deleted)
+        event.listen(Quiz, 'after_insert', _quiz_inserted)
+        event.listen(Quiz, 'after_update', _quiz_updated)
+        event.listen(Quiz, 'after_delete', _quiz_deleted)
@@ -0,0 +1,137 @@
+from flask import current_app, request, send_file
+import gzip
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+DEFAULT_MIN_BYTES = 1024
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'application/manifest+json', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon'
+}
+
+# Build tools put a content hash in these file names, so they never change
+HASHED_ASSET = re.compile(r'(^|/)_next/static/|[.-][0-9a-f]{8,}\.[a-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(encodings=None):
+    """Pick the best encoding the client accepts, or None for identity"""
+    encodings = encodings or available_encodings()
+    accepted = request.accept_encodings
+    for encoding in encodings:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def compress_response(response):
+    """after_request hook compressing large text/JSON bodies"""
+    min_bytes = current_app.config.get('COMPRESSION_MIN_BYTES', DEFAULT_MIN_BYTES)
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or not is_compressible(response.mimetype)):
+        return response
+
+    if not response.content_encoding:
+        if (response.content_length or 0) < min_bytes:
+            return response
+        encoding = negotiate_encoding()
+        response.vary.add('Accept-Encoding')
+        if encoding is None:
+            return response
+        response.set_data(compress(response.get_data(), encoding))
+        response.content_encoding = encoding
+
+    # An encoded body is no longer byte-identical to the strong validator's representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+class StaticAsset:
+    """One static file with its precompressed variants held in memory"""
+
+    def __init__(self, path, rel_path, min_bytes):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET.search(rel_path) else REVALIDATE_CACHE_CONTROL
+        self.variants = {}
+        size = os.path.getsize(path)
+        if not is_compressible(self.mimetype) or size < min_bytes:
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        mtime = int(os.path.getmtime(path))
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            # Prefer variants produced by the frontend build, else compress once now
+            if os.path.isfile(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    body = f.read()
+            elif encoding in available_encodings():
+                body = compress(data, encoding)
+            else:
+                continue
+            if len(body) < size:
+                self.variants[encoding] = (body, f'{mtime:x}-{size:x}-{encoding}')
+
+    def to_response(self):
+        encoding = negotiate_encoding(tuple(self.variants)) if self.variants else None
+        if encoding is None:
+            response = send_file(self.path, mimetype=self.mimetype, conditional=True)
+        else:
+            body, etag = self.variants[encoding]
+            response = current_app.response_class(body, mimetype=self.mimetype)
+            response.content_encoding = encoding
+            response.set_etag(etag)
+            response.make_conditional(request)
+        if self.variants:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = self.cache_control
+        return response
+
+
+def build_static_manifest(static_folder, min_bytes=DEFAULT_MIN_BYTES):
+    """Map every servable path under static_folder to a StaticAsset"""
+    manifest = {}
+    if not static_folder or not os.path.isdir(static_folder):
+        return manifest
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            # Precompressed siblings are served through their source asset
+            if name.endswith(('.gz', '.br')) and os.path.isfile(path[:-3]):
+                continue
+            manifest[rel_path] = StaticAsset(path, rel_path, min_bytes)
+    return manifest
+
+
+def init_compression(app):
+    """Compress API responses and precompress static assets at startup"""
+    app.after_request(compress_response)
+    app.extensions['static_manifest'] = build_static_manifest(
+        app.static_folder, app.config.get('COMPRESSION_MIN_BYTES', DEFAULT_MIN_BYTES)
+    )
@@ -0,0 +1,40 @@
+from flask import current_app, jsonify
+from src.models.user import db
+
+
+class GenerationSpec:
+    """An LLM-backed creation endpoint split into phases.
+
+    prepare(current_user, data) -> (params, None) or (None, error_response)
+    generate(params)            -> result of the blocking LLM call
+    agenerate(params)           -> coroutine doing the same call with AsyncOpenAI
+    save(current_user, params, result) -> response
+
+    The Flask view runs every phase in one worker with run(); the ASGI entry
+    point (src/asgi.py) runs prepare/save in threads and awaits agenerate, so
+    a request waiting on the LLM does not hold a thread.
+    """
+
+    def __init__(self, name, prepare, generate, agenerate, save, error_message):
+        self.name = name
+        self.prepare = prepare
+        self.generate = generate
+        self.agenerate = agenerate
+        self.save = save
+        self.error_message = error_message
+
+    def failure(self, error):
+        """Roll back and build the 500 response for an exception in any phase"""
+        current_app.logger.exception('%s failed', self.name, exc_info=error)
+        db.session.rollback()
+        return jsonify({'error': self.error_message, 'details': str(error)}), 500
+
+    def run(self, current_user, data):
+        """Run all phases synchronously"""
+        try:
+            params, error = self.prepare(current_user, data)
+            if error is not None:
+                return error
+            return self.save(current_user, params, self.generate(params))
+        except Exception as e:
+            return self.failure(e)
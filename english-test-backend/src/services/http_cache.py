@@ -0,0 +1,62 @@
+from flask import current_app, request
+from werkzeug.http import is_resource_modified, quote_etag
+import hashlib
+
+# Cache-Control policies by resource class; override with app.config['CACHE_CONTROL_POLICIES'].
+# Lesson and quiz bodies are the same for every user, so shared caches (CDN) may
+# store them, but "no-cache" forces revalidation so the token is re-checked on use.
+DEFAULT_CACHE_POLICIES = {
+    'catalog': 'public, no-cache',
+    # Answer keys stay in the browser cache only
+    'answers': 'private, no-cache',
+    # Listings depend on query parameters and change often
+    'listing': 'private, no-cache',
+}
+
+
+def make_etag(*parts):
+    """Build an opaque ETag value from version parts"""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def cache_policy(name):
+    policies = current_app.config.get('CACHE_CONTROL_POLICIES') or {}
+    return policies.get(name, DEFAULT_CACHE_POLICIES[name])
+
+
+def apply_validators(response, etag, last_modified=None, policy='catalog', weak=False):
+    """Set ETag, Last-Modified and Cache-Control on a response and return it"""
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_policy(policy)
+    return response
+
+
+def not_modified(etag, last_modified=None, policy='catalog', weak=False):
+    """Return a 304 response when the request's validators match, else None.
+
+    Follows RFC 9110: If-None-Match takes precedence over If-Modified-Since.
+    """
+    if is_resource_modified(request.environ, etag=quote_etag(etag, weak), last_modified=last_modified):
+        return None
+    response = current_app.response_class(status=304)
+    return apply_validators(response, etag, last_modified, policy, weak)
+
+
+def count_field(item, field):
+    """A count field's value: the related rows plus the field's COUNT_OFFSETS column, if any"""
+    count = len(getattr(item, item.COUNTED_RELATIONS[field]))
+    offset = item.COUNT_OFFSETS.get(field)
+    return count + getattr(item, offset) if offset else count
+
+
+def listing_etag(model, items, fields=None, *extra):
+    """Weak ETag for a page of rows, from their ids, update times and requested counts"""
+    fields = fields or model.FIELDS
+    counted = [field for field in model.COUNTED_RELATIONS if field in fields]
+    parts = [model.__tablename__, tuple(fields), *extra]
+    for item in items:
+        parts.append((item.id, item.updated_at, *[count_field(item, f) for f in counted]))
+    return make_etag(*parts)
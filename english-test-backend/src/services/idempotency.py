@@ -0,0 +1,208 @@
+"""
+Idempotency-Key support for non-idempotent POST routes.
+
+A request carrying `Idempotency-Key: <key>` first claims (user, key) by
+inserting an in-flight row in its own committed transaction, so every worker
+sees the claim. The view then runs once; its response (any status below 500
+except 429) is stored on the row until IDEMPOTENCY_TTL_SECONDS. A retry with
+the same key and the same request gets the stored response back with
+`Idempotent-Replayed: true`; a retry arriving while the original is still
+running polls the row until it completes (at most IDEMPOTENCY_WAIT_SECONDS,
+then 409). Server errors and rejections release the claim so the client can
+retry for real. Reusing a key for a different request is a 422.
+"""
+from datetime import datetime, timedelta
+from flask import Response, current_app, jsonify, request
+from functools import wraps
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import threading
+import time
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_WAIT_SECONDS = 60
+# Longer than the slowest generation: past it an in-flight claim is taken over
+DEFAULT_LOCK_SECONDS = 300
+PURGE_INTERVAL_SECONDS = 300
+POLL_SECONDS = (0.05, 0.5)
+# Never replayed, like 5xx: the retry should run for real
+NOT_STORED = {429}
+
+OWNER, REPLAY, IN_PROGRESS, MISMATCH = 'owner', 'replay', 'in_progress', 'mismatch'
+
+
+def request_hash():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.full_path}\n'.encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Claims, waits for and replays keys stored in the idempotency_key table"""
+
+    def __init__(self, engine_getter, ttl_seconds=DEFAULT_TTL_SECONDS, wait_seconds=DEFAULT_WAIT_SECONDS,
+                 lock_seconds=DEFAULT_LOCK_SECONDS):
+        self._engine = engine_getter
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.wait_seconds = wait_seconds
+        self.lock = timedelta(seconds=lock_seconds)
+        self._purge_lock = threading.Lock()
+        self._purged_at = 0.0
+
+    @property
+    def table(self):
+        from src.models.idempotency import IdempotencyKey
+        return IdempotencyKey.__table__
+
+    def claim(self, user_id, key, fingerprint):
+        """(OWNER, row_id), (REPLAY, row), (IN_PROGRESS, None) or (MISMATCH, None)"""
+        self._maybe_purge()
+        table = self.table
+        deadline = time.monotonic() + self.wait_seconds
+        delay = POLL_SECONDS[0]
+        while True:
+            now = datetime.utcnow()
+            try:
+                with self._engine().begin() as conn:
+                    row_id = conn.execute(insert(table).values(
+                        user_id=user_id, key=key, request_hash=fingerprint, state='in_flight',
+                        locked_until=now + self.lock, created_at=now, expires_at=now + self.ttl
+                    )).inserted_primary_key[0]
+                return OWNER, row_id
+            except IntegrityError:
+                pass
+            with self._engine().begin() as conn:
+                row = conn.execute(select(table).where(table.c.user_id == user_id, table.c.key == key)).first()
+                if row is None:
+                    continue
+                if row.request_hash != fingerprint:
+                    return MISMATCH, None
+                if row.expires_at <= now:
+                    conn.execute(delete(table).where(table.c.id == row.id, table.c.expires_at == row.expires_at))
+                    continue
+                if row.state == 'done':
+                    return REPLAY, row
+                if row.locked_until is not None and row.locked_until <= now:
+                    # The original died mid-request: take the claim over (compare-and-set on the lock)
+                    taken = conn.execute(
+                        update(table).where(table.c.id == row.id, table.c.state == 'in_flight',
+                                            table.c.locked_until == row.locked_until)
+                        .values(locked_until=now + self.lock)
+                    ).rowcount
+                    if taken:
+                        return OWNER, row.id
+                    continue
+            if time.monotonic() + delay > deadline:
+                return IN_PROGRESS, None
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_SECONDS[1])
+
+    def complete(self, row_id, response):
+        """Store the response for replay, or release the key when it should not be replayed"""
+        table = self.table
+        with self._engine().begin() as conn:
+            if response.status_code >= 500 or response.status_code in NOT_STORED or response.is_streamed:
+                conn.execute(delete(table).where(table.c.id == row_id))
+                return
+            now = datetime.utcnow()
+            conn.execute(update(table).where(table.c.id == row_id).values(
+                state='done', locked_until=None, response_status=response.status_code,
+                response_body=response.get_data(), response_content_type=response.content_type,
+                expires_at=now + self.ttl
+            ))
+
+    def release(self, row_id):
+        table = self.table
+        with self._engine().begin() as conn:
+            conn.execute(delete(table).where(table.c.id == row_id))
+
+    def purge(self):
+        """Delete expired keys; returns how many"""
+        table = self.table
+        with self._engine().begin() as conn:
+            return conn.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
+
+    def _maybe_purge(self):
+        if time.monotonic() - self._purged_at < PURGE_INTERVAL_SECONDS or not self._purge_lock.acquire(False):
+            return
+        try:
+            self._purged_at = time.monotonic()
+            self.purge()
+        finally:
+            self._purge_lock.release()
+
+
+def get_idempotency_store():
+    return current_app.extensions['idempotency']
+
+
+def replay(row):
+    response = Response(row.response_body, status=row.response_status, content_type=row.response_content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def claim_request(current_user):
+    """Claim the request's Idempotency-Key for current_user.
+
+    Returns (response, None) when the view must not run (invalid key, replay,
+    mismatch, still in progress), else (None, claimed): claimed is None
+    without a key, otherwise the row id to complete() or release() once the
+    view is done. May wait up to IDEMPOTENCY_WAIT_SECONDS: call it off the
+    event loop.
+    """
+    key = request.headers.get(HEADER)
+    if key is None or not current_app.config.get('IDEMPOTENCY_ENABLED', True):
+        return None, None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return (jsonify({'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'}), 400), None
+
+    outcome, claimed = get_idempotency_store().claim(current_user.id, key, request_hash())
+    if outcome == MISMATCH:
+        return (jsonify({'error': f'{HEADER} was already used for a different request'}), 422), None
+    if outcome == IN_PROGRESS:
+        response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response, None
+    if outcome == REPLAY:
+        return replay(claimed), None
+    return None, claimed
+
+
+def idempotent(f):
+    """Decorator (below token_required, above admission_control) honouring the Idempotency-Key header"""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        rv, claimed = claim_request(current_user)
+        if rv is not None:
+            return rv
+        if claimed is None:
+            return f(current_user, *args, **kwargs)
+
+        store = get_idempotency_store()
+        try:
+            response = current_app.make_response(f(current_user, *args, **kwargs))
+        except BaseException:
+            store.release(claimed)
+            raise
+        store.complete(claimed, response)
+        return response
+    return decorated
+
+
+def init_idempotency(app):
+    """Attach the Idempotency-Key store (IDEMPOTENCY_TTL_SECONDS, _WAIT_SECONDS, _LOCK_SECONDS)"""
+    from src.models.user import db
+
+    app.extensions['idempotency'] = IdempotencyStore(
+        lambda: db.engine,
+        ttl_seconds=app.config.get('IDEMPOTENCY_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+        wait_seconds=app.config.get('IDEMPOTENCY_WAIT_SECONDS', DEFAULT_WAIT_SECONDS),
+        lock_seconds=app.config.get('IDEMPOTENCY_LOCK_SECONDS', DEFAULT_LOCK_SECONDS),
+    )
@@ -0,0 +1,389 @@
+"""
+Server-Sent Events push of leaderboard and statistics updates.
+
+Writers publish small deltas after their commit to channels: 'leaderboard'
+(the submitter's leaderboard entry) and 'user:<id>' (their own statistics).
+A broker fans every event out to the streams subscribed to its channel. The
+default LocalBroker is in-process, which is enough for one worker;
+RedisBroker relays events through Redis pub/sub (LIVE_BROKER_URL) so each
+worker receives every event and fans it out to its own streams. LIVE_BROKER
+may also be any object with the same publish/subscribe/unsubscribe methods.
+
+An idle stream costs no database work: the top of the leaderboard is loaded
+once per worker and then kept current from the deltas. Under the ASGI entry
+point (src/asgi.py) a stream is a coroutine awaiting its subscription, so
+LIVE_MAX_SUBSCRIBERS can be large. Served by the WSGI app, each stream parks
+a worker thread for up to LIVE_MAX_STREAM_SECONDS, so those are capped
+separately by LIVE_MAX_BLOCKING_STREAMS, which must stay well below the
+worker's thread count.
+"""
+from collections import deque
+from flask import current_app
+from src.services.achievements import level_for_xp
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # optional: only needed for LIVE_BROKER_URL
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD = 'leaderboard'
+LEADERBOARD_SIZE = 10
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_SUBSCRIBERS = 1000
+# Streams holding a WSGI thread: a quarter of the ASGI bridge's 32-thread pool
+DEFAULT_MAX_BLOCKING_STREAMS = 8
+DEFAULT_HEARTBEAT_SECONDS = 15
+# Streams are recycled so sync workers and proxies do not hold them forever
+DEFAULT_MAX_STREAM_SECONDS = 300
+DEFAULT_CHANNEL_PREFIX = 'english-test:live:'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """A stream's bounded event queue; a slow reader loses the oldest events, never blocks writers"""
+
+    def __init__(self, channels, max_queue=DEFAULT_QUEUE_SIZE):
+        self.channels = frozenset(channels)
+        self._events = deque(maxlen=max_queue)
+        self._ready = threading.Condition()
+        # Wakes an aget() waiting on an event loop
+        self._waker = None
+        self.dropped = 0
+
+    def put(self, channel, event):
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append((channel, event))
+            self._ready.notify()
+            waker = self._waker
+        if waker is not None:
+            waker()
+
+    def get(self, timeout):
+        """Next (channel, event), or None after `timeout` seconds without one"""
+        with self._ready:
+            if not self._events:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    async def aget(self, timeout):
+        """get() for an event loop: waits without holding a thread"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:  # the loop has closed
+                pass
+
+        with self._ready:
+            if self._events:
+                return self._events.popleft()
+            self._waker = wake
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._ready:
+                self._waker = None
+        with self._ready:
+            return self._events.popleft() if self._events else None
+
+
+class LocalBroker:
+    """In-process fan-out of events to the subscriptions of each channel"""
+
+    def __init__(self, max_queue=DEFAULT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, self.max_queue)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = tuple(self._channels.get(channel, ()))
+        self.published += 1
+        for subscription in subscribers:
+            subscription.put(channel, event)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return len({s for subscribers in self._channels.values() for s in subscribers})
+
+
+class RedisBroker:
+    """Cross-worker broker: events go through Redis pub/sub, then fan out locally"""
+
+    def __init__(self, url, prefix=DEFAULT_CHANNEL_PREFIX, max_queue=DEFAULT_QUEUE_SIZE):
+        if redis is None:
+            raise RuntimeError('LIVE_BROKER_URL needs the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.local = LocalBroker(max_queue)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return self.local.subscribe(channels)
+
+    def unsubscribe(self, subscription):
+        self.local.unsubscribe(subscription)
+
+    def publish(self, channel, event):
+        self._client.publish(self.prefix + channel, json.dumps(event))
+
+    def subscriber_count(self, channel=None):
+        return self.local.subscriber_count(channel)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='live-broker', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # One Redis subscription per worker, whatever the number of streams
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    self.local.publish(channel[len(self.prefix):], json.loads(message['data']))
+            except Exception:
+                logger.exception('Live broker lost its Redis subscription, reconnecting')
+                time.sleep(1)
+
+
+class LiveHub:
+    """The broker plus this worker's in-memory copy of the leaderboard top"""
+
+    def __init__(self, broker, max_subscribers=DEFAULT_MAX_SUBSCRIBERS,
+                 max_blocking_streams=DEFAULT_MAX_BLOCKING_STREAMS):
+        self.broker = broker
+        self.max_subscribers = max_subscribers
+        self.max_blocking_streams = max_blocking_streams
+        # Subscriptions of streams served by a WSGI thread
+        self._blocking = set()
+        self._leaderboard = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self):
+        return next(self._ids)
+
+    def subscribe(self, channels, holds_thread=False):
+        """A Subscription, or None at max_subscribers (max_blocking_streams for a stream holding a thread)"""
+        if self.broker.subscriber_count() >= self.max_subscribers:
+            return None
+        if not holds_thread:
+            return self.broker.subscribe(channels)
+        with self._lock:
+            if len(self._blocking) >= self.max_blocking_streams:
+                return None
+            subscription = self.broker.subscribe(channels)
+            self._blocking.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        self.broker.unsubscribe(subscription)
+        with self._lock:
+            self._blocking.discard(subscription)
+        if LEADERBOARD in subscription.channels and not self.broker.subscriber_count(LEADERBOARD):
+            # Nobody keeps it current any more: reload on the next subscription
+            with self._lock:
+                self._leaderboard = None
+
+    def leaderboard(self, loader):
+        """(version, entries) of the top of the leaderboard, loaded with `loader()` once"""
+        with self._lock:
+            if self._leaderboard is None:
+                self._leaderboard = loader()
+                self._version += 1
+            return self._version, list(self._leaderboard)
+
+    def merge_leaderboard(self, entry):
+        """Apply a leaderboard delta (idempotent); returns (version, entries)"""
+        with self._lock:
+            if self._leaderboard is None:
+                return self._version, None
+            entries = [e for e in self._leaderboard if e['username'] != entry['username']]
+            floor = entries[-1]['experience_points'] if len(entries) >= LEADERBOARD_SIZE else None
+            if floor is None or entry['experience_points'] > floor or len(entries) < len(self._leaderboard):
+                entries.append(entry)
+            entries.sort(key=lambda e: -e['experience_points'])
+            entries = [dict(e, rank=rank) for rank, e in enumerate(entries[:LEADERBOARD_SIZE], 1)]
+            if entries != self._leaderboard:
+                self._leaderboard = entries
+                self._version += 1
+            return self._version, list(self._leaderboard)
+
+
+def get_live_hub():
+    return current_app.extensions['live']
+
+
+def format_event(event_id, name, data):
+    return f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def statistics_delta(stats):
+    """The statistics pushed to a user's stream (the compact submit-batch fields plus the level)"""
+    return {
+        'total_quizzes_taken': stats.total_quizzes_taken,
+        'average_score': stats.average_score,
+        'experience_points': stats.experience_points,
+        'current_streak_days': stats.current_streak_days,
+        'current_level': level_for_xp(stats.experience_points)
+    }
+
+
+def submission_update(user, stats):
+    """What publish_submission() pushes; build it before the commit expires user and stats"""
+    return {'user_id': user.id, 'username': user.username, 'level': user.level, 'statistics': statistics_delta(stats)}
+
+
+# Comment line: keeps proxies from closing an idle stream
+KEEP_ALIVE = ': keep-alive\n\n'
+# Sent at max_seconds: asks the client to reconnect promptly to a fresh stream
+RECONNECT = 'retry: 1000\n\n'
+
+
+class StreamWriter:
+    """Formats one stream's snapshot and queued items, skipping leaderboard versions already sent"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.sent_version = None
+
+    def snapshot(self, snapshot):
+        for name, data in snapshot:
+            if name == LEADERBOARD:
+                self.sent_version = data.pop('version')
+            yield format_event(self.hub.next_id(), name, data)
+
+    def item(self, item):
+        """SSE text for a subscription item (None: heartbeat), or None when there is nothing to send"""
+        if item is None:
+            return KEEP_ALIVE
+        channel, event = item
+        if channel != LEADERBOARD:
+            return format_event(self.hub.next_id(), 'statistics', event)
+        version, entries = self.hub.merge_leaderboard(event)
+        if entries is None or version == self.sent_version:
+            return None
+        self.sent_version = version
+        return format_event(self.hub.next_id(), LEADERBOARD, {'leaderboard': entries})
+
+
+def event_stream(hub, subscription, snapshot, heartbeat_seconds, max_seconds):
+    """SSE body: the snapshot events, then deltas until max_seconds; needs no app context"""
+    writer = StreamWriter(hub)
+    try:
+        yield from writer.snapshot(snapshot)
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            text = writer.item(subscription.get(min(heartbeat_seconds, remaining)))
+            if text is not None:
+                yield text
+        yield RECONNECT
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def aevent_stream(hub, subscription, snapshot, heartbeat_seconds, max_seconds):
+    """event_stream() as an async generator: waiting for events holds no thread"""
+    writer = StreamWriter(hub)
+    try:
+        for text in writer.snapshot(snapshot):
+            yield text
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = min(heartbeat_seconds, remaining)
+            if hasattr(subscription, 'aget'):
+                item = await subscription.aget(timeout)
+            else:
+                # A custom LIVE_BROKER's subscription: wait on the default executor
+                item = await asyncio.get_running_loop().run_in_executor(None, subscription.get, timeout)
+            text = writer.item(item)
+            if text is not None:
+                yield text
+        yield RECONNECT
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def publish_submission(update, new_achievements=()):
+    """Publish a submitter's new statistics and leaderboard entry (after the commit, never raises)"""
+    if not current_app.config.get('LIVE_ENABLED', True):
+        return
+    statistics = update['statistics']
+    try:
+        broker = get_live_hub().broker
+        broker.publish(user_channel(update['user_id']),
+                       {'statistics': statistics, 'new_achievements': list(new_achievements)})
+        broker.publish(LEADERBOARD, {
+            'username': update['username'],
+            'level': update['level'],
+            'experience_points': statistics['experience_points'],
+            'total_quizzes': statistics['total_quizzes_taken'],
+            'average_score': round(statistics['average_score'] or 0, 1),
+            'current_streak': statistics['current_streak_days']
+        })
+    except Exception:
+        logger.exception('Failed to publish live update for user %s', update['user_id'])
+
+
+def init_live(app):
+    """Attach the live hub (LIVE_BROKER, LIVE_BROKER_URL, LIVE_QUEUE_SIZE, LIVE_MAX_SUBSCRIBERS, _BLOCKING_STREAMS)"""
+    broker = app.config.get('LIVE_BROKER')
+    queue_size = app.config.get('LIVE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+    if broker is None and app.config.get('LIVE_BROKER_URL'):
+        broker = RedisBroker(app.config['LIVE_BROKER_URL'],
+                             prefix=app.config.get('LIVE_CHANNEL_PREFIX', DEFAULT_CHANNEL_PREFIX), max_queue=queue_size)
+    app.extensions['live'] = LiveHub(
+        broker or LocalBroker(queue_size),
+        max_subscribers=app.config.get('LIVE_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS),
+        max_blocking_streams=app.config.get('LIVE_MAX_BLOCKING_STREAMS', DEFAULT_MAX_BLOCKING_STREAMS),
+    )
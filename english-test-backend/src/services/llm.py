@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+import weakref
+
+_client = None
+_client_settings = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Get a shared OpenAI client.
+
+    The SDK (and httpx/pydantic behind it) is imported on first use rather than
+    at app import, and the client is reused so its connection pool is kept.
+    """
+    global _client, _client_settings
+    settings = (os.getenv('OPENAI_API_KEY'), os.getenv('OPENAI_API_BASE'))
+    with _client_lock:
+        if _client is None or _client_settings != settings:
+            from openai import OpenAI
+            _client = OpenAI(api_key=settings[0], base_url=settings[1])
+            _client_settings = settings
+        return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_openai_client():
+    """Get an AsyncOpenAI client for the running event loop (its pool is loop-bound)"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    settings = (os.getenv('OPENAI_API_KEY'), os.getenv('OPENAI_API_BASE'))
+    cached = _async_clients.get(loop)
+    if cached is None or cached[0] != settings:
+        from openai import AsyncOpenAI
+        cached = (settings, AsyncOpenAI(api_key=settings[0], base_url=settings[1]))
+        _async_clients[loop] = cached
+    return cached[1]
+
+
+def chat_completion(operation, **kwargs):
+    """client.chat.completions.create() timed and recorded in the LLM metrics"""
+    from src.services.metrics import record_llm_call
+    started = time.perf_counter()
+    try:
+        response = get_openai_client().chat.completions.create(**kwargs)
+    except Exception:
+        record_llm_call(operation, kwargs.get('model', ''), time.perf_counter() - started, outcome='error')
+        raise
+    record_llm_call(operation, kwargs.get('model', ''), time.perf_counter() - started, response.usage)
+    return response
+
+
+async def achat_completion(operation, **kwargs):
+    """Async counterpart of chat_completion()"""
+    from src.services.metrics import record_llm_call
+    started = time.perf_counter()
+    try:
+        response = await get_async_openai_client().chat.completions.create(**kwargs)
+    except Exception:
+        record_llm_call(operation, kwargs.get('model', ''), time.perf_counter() - started, outcome='error')
+        raise
+    record_llm_call(operation, kwargs.get('model', ''), time.perf_counter() - started, response.usage)
+    return response
@@ -0,0 +1,256 @@
+from bisect import bisect_left
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import hmac
+import math
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Scrapers allowed without METRICS_TOKEN
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect plus two additions under a lock"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, [le])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}'
+
+
+class Registry:
+    """Process-wide metrics plus collectors that read other subsystems' stats at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector(app) yields (name, type, documentation, [(labels_dict, value)])"""
+        self._collectors.append(collector)
+
+    def render(self, app):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector(app):
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by blueprint and endpoint',
+    ('blueprint', 'endpoint', 'method'))
+REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests by endpoint and status code',
+    ('blueprint', 'endpoint', 'method', 'status'))
+SQL_STATEMENTS = REGISTRY.histogram(
+    'db_statements_per_request', 'SQL statements executed per request',
+    ('blueprint', 'endpoint'), buckets=STATEMENT_BUCKETS)
+SQL_TIME = REGISTRY.histogram(
+    'db_time_per_request_seconds', 'Total SQL execution time per request',
+    ('blueprint', 'endpoint'))
+LLM_LATENCY = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'LLM call latency',
+    ('operation', 'model', 'outcome'), buckets=LLM_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'LLM token usage', ('operation', 'model', 'kind'))
+
+
+def route_labels():
+    endpoint = request.endpoint or 'unmatched'
+    return request.blueprint or '', endpoint
+
+
+def start_request(started=None):
+    """Start timing the current request (started: perf_counter() value, default now)"""
+    g.metrics_started = time.perf_counter() if started is None else started
+    g.metrics_sql = [0, 0.0]
+
+
+def record_request(response):
+    """after_request hook, registered first so it runs after every other hook"""
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    blueprint, endpoint = route_labels()
+    REQUEST_LATENCY.observe(time.perf_counter() - started, (blueprint, endpoint, request.method))
+    REQUESTS.inc((blueprint, endpoint, request.method, str(response.status_code)))
+    statements, seconds = g.pop('metrics_sql')
+    SQL_STATEMENTS.observe(statements, (blueprint, endpoint))
+    SQL_TIME.observe(seconds, (blueprint, endpoint))
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_sql' in g:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context() and 'metrics_sql' in g:
+        sql = g.metrics_sql
+        sql[0] += 1
+        sql[1] += time.perf_counter() - started
+
+
+_engine_hooks = []
+
+
+def listen_sql():
+    """Count statements and their time for the current request, on every engine"""
+    if not _engine_hooks:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_hooks.append(True)
+
+
+def record_llm_call(operation, model, seconds, usage=None, outcome='ok'):
+    LLM_LATENCY.observe(seconds, (operation, model, outcome))
+    if usage is not None:
+        LLM_TOKENS.inc((operation, model, 'prompt'), usage.prompt_tokens or 0)
+        LLM_TOKENS.inc((operation, model, 'completion'), usage.completion_tokens or 0)
+
+
+def response_cache_metrics(app):
+    cache = app.extensions.get('response_cache')
+    if cache is None:
+        return
+    stats = cache.stats()
+    yield 'response_cache_hits_total', 'counter', 'Response cache hits', [({}, stats['hits'])]
+    yield 'response_cache_misses_total', 'counter', 'Response cache misses', [({}, stats['misses'])]
+    yield 'response_cache_evictions_total', 'counter', 'Response cache evictions', [({}, stats['evictions'])]
+    yield 'response_cache_hit_ratio', 'gauge', 'Response cache hits / lookups', [({}, stats['hit_ratio'])]
+    yield 'response_cache_bytes', 'gauge', 'Bytes held by the response cache', [({}, stats['bytes'])]
+
+
+def admission_metrics(app):
+    controller = app.extensions.get('admission')
+    if controller is None:
+        return
+    classes = controller.stats()['classes']
+    yield ('admission_admitted_total', 'counter', 'Requests admitted by route class',
+           [({'route_class': name}, c['admitted']) for name, c in classes.items()])
+    yield ('admission_rejected_total', 'counter', 'Requests rejected with 429 by route class and reason',
+           [({'route_class': name, 'reason': reason}, n)
+            for name, c in classes.items() for reason, n in c['rejected'].items()])
+    gated = {name: c for name, c in classes.items() if 'queue_wait' in c}
+    yield ('admission_in_flight', 'gauge', 'Requests holding a global concurrency slot',
+           [({'route_class': name}, c['in_flight']) for name, c in gated.items()])
+    yield ('admission_queued', 'gauge', 'Requests waiting for a global concurrency slot',
+           [({'route_class': name}, c['queued']) for name, c in gated.items()])
+    yield ('admission_queue_wait_avg_seconds', 'gauge', 'Average time spent queued',
+           [({'route_class': name}, c['queue_wait']['avg_ms'] / 1000) for name, c in gated.items()])
+
+
+REGISTRY.add_collector(response_cache_metrics)
+REGISTRY.add_collector(admission_metrics)
+
+
+def metrics_view():
+    """GET /metrics in the Prometheus text format: Bearer METRICS_TOKEN, or loopback clients when it is unset"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in LOOPBACK_ADDRESSES:
+        return current_app.response_class('Forbidden: set METRICS_TOKEN\n', status=403, mimetype='text/plain')
+    return current_app.response_class(REGISTRY.render(current_app), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """Instrument requests, SQL and serve /metrics; call before other after_request hooks"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    listen_sql()
+    app.before_request(start_request)
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
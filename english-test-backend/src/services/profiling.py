@@ -0,0 +1,254 @@
+"""
+Opt-in request profiling.
+
+With PROFILING_ENABLED, a request is profiled when it carries
+`X-Profile: <PROFILING_TOKEN>` or is picked by PROFILING_SAMPLE_RATE. Each
+profile is written to PROFILING_DIR (the newest PROFILING_MAX_FILES are kept,
+0 keeps them all):
+
+    <id>.json    request, SQL statements with timings, top functions
+    <id>.prof    cProfile stats (PROFILING_MODE='cprofile', snakeviz/pstats)
+    <id>.folded  collapsed stacks (PROFILING_MODE='sample', flamegraph.pl/speedscope)
+
+When profiling is disabled no hook or SQL listener is installed at all.
+"""
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_ID = re.compile(r'^[0-9T]+-[0-9a-f]{8}$')
+DEFAULT_MAX_FILES = 200
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 30
+
+
+class StackSampler:
+    """Sample one thread's stack every `interval` seconds into collapsed stacks"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top(self, limit=TOP_FUNCTIONS):
+        """Functions by number of samples they were on the stack"""
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack.split(';')):
+                inclusive[frame] += count
+        total = sum(self.stacks.values()) or 1
+        return [{'function': f, 'samples': n, 'share': round(n / total, 3)} for f, n in inclusive.most_common(limit)]
+
+
+def cprofile_top(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            'function': f'{name} ({os.path.basename(filename)}:{line})',
+            'calls': nc,
+            'tottime_ms': round(tt * 1000, 3),
+            'cumtime_ms': round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def should_profile():
+    # Reading profiles must not produce new ones
+    if request.blueprint == 'system':
+        return None
+    config = current_app.config
+    if is_profiling_admin():
+        return 'header'
+    rate = config.get('PROFILING_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def start_profile():
+    trigger = should_profile()
+    if trigger is None:
+        return
+    mode = current_app.config.get('PROFILING_MODE', 'cprofile')
+    profile = {'trigger': trigger, 'mode': mode, 'sql': [], 'started': time.perf_counter()}
+    if mode == 'sample':
+        profile['sampler'] = StackSampler(threading.get_ident())
+        profile['sampler'].start()
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active on this thread
+            return
+        profile['profiler'] = profiler
+    g.request_profile = profile
+
+
+def finish_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return response
+    if 'profiler' in profile:
+        profile['profiler'].disable()
+    else:
+        profile['sampler'].stop()
+    duration = time.perf_counter() - profile['started']
+    now = time.time()
+    # Sortable ids: rotation and listing order by name
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+    directory = profile_dir(current_app)
+    os.makedirs(directory, exist_ok=True)
+
+    if 'profiler' in profile:
+        profile['profiler'].dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+        top = cprofile_top(profile['profiler'])
+    else:
+        with open(os.path.join(directory, f'{profile_id}.folded'), 'w') as f:
+            f.write(profile['sampler'].folded())
+        top = profile['sampler'].top()
+
+    sql = profile['sql']
+    summary = {
+        'id': profile_id,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'trigger': profile['trigger'],
+        'mode': profile['mode'],
+        'sql': {
+            'count': len(sql),
+            'total_ms': round(sum(ms for _, ms in sql), 3),
+            'statements': [{'statement': statement, 'ms': ms} for statement, ms in sql],
+        },
+        'top_functions': top,
+    }
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as f:
+        json.dump(summary, f, indent=1)
+    rotate(directory, current_app.config.get('PROFILING_MAX_FILES', DEFAULT_MAX_FILES))
+    response.headers[PROFILE_ID_HEADER] = profile_id
+    return response
+
+
+def rotate(directory, max_files):
+    """Keep only the newest max_files profiles (all files of a profile share its id); 0 or None keeps all"""
+    if not max_files or max_files < 0:
+        return
+    ids = sorted({name.rsplit('.', 1)[0] for name in os.listdir(directory) if PROFILE_ID.match(name.rsplit('.', 1)[0])})
+    for old in ids[:-max_files]:
+        for suffix in ('.json', '.prof', '.folded'):
+            try:
+                os.remove(os.path.join(directory, old + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_profile' in g:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_profile_started', None)
+    if started is not None and has_request_context() and 'request_profile' in g:
+        g.request_profile['sql'].append((' '.join(statement.split()), round((time.perf_counter() - started) * 1000, 3)))
+
+
+_sql_listening = []
+
+
+def profile_dir(app):
+    return app.config.get('PROFILING_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def list_profiles(app, limit=50):
+    """Summaries (without statements and functions) of the newest profiles"""
+    directory = profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True)[:limit]
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary['sql'] = {k: v for k, v in summary['sql'].items() if k != 'statements'}
+        summary.pop('top_functions', None)
+        profiles.append(summary)
+    return profiles
+
+
+def profile_file(app, profile_id, kind):
+    """Path of one stored file of a profile, or None"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    suffixes = {'summary': ('.json',), 'raw': ('.prof', '.folded')}[kind]
+    for suffix in suffixes:
+        path = os.path.join(profile_dir(app), profile_id + suffix)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def is_profiling_admin():
+    token = current_app.config.get('PROFILING_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get(PROFILE_HEADER, '').encode('utf-8'), token.encode('utf-8'))
+
+
+def init_profiling(app):
+    """Install the profiling hooks only when PROFILING_ENABLED is set"""
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+    if not _sql_listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _sql_listening.append(True)
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
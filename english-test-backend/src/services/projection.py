@@ -0,0 +1,51 @@
+from sqlalchemy.orm import load_only, selectinload
+
+VIEWS = ('full', 'summary')
+
+
+def resolve_fields(args, model):
+    """Return the fields requested through ?fields= or ?view=, or None for the full view.
+
+    Raises ValueError for unknown fields or views so routes can answer 400.
+    """
+    fields_arg = args.get('fields')
+    if fields_arg:
+        requested = []
+        for field in fields_arg.split(','):
+            field = field.strip()
+            if field and field not in requested:
+                requested.append(field)
+        unknown = [f for f in requested if f not in model.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if 'id' not in requested:
+            requested.insert(0, 'id')
+        return requested
+
+    view = args.get('view', 'full')
+    if view not in VIEWS:
+        raise ValueError(f"view must be one of: {', '.join(VIEWS)}")
+    return list(model.SUMMARY_FIELDS) if view == 'summary' else None
+
+
+def projection_options(model, fields=None):
+    """Loader options that select only the columns backing the requested fields.
+
+    Unrequested columns (e.g. the JSON blobs) stay deferred, and count fields are
+    loaded for the whole page with one selectin query on the related ids (plus
+    their COUNT_OFFSETS columns).
+    updated_at is always loaded since listing ETags are built from it.
+    """
+    fields = fields or model.FIELDS
+    columns = model.__table__.columns
+    loaded = [f for f in fields if f in columns]
+    if 'updated_at' not in loaded:
+        loaded.append('updated_at')
+    loaded += [column for field, column in model.COUNT_OFFSETS.items() if field in fields]
+    options = [load_only(*[getattr(model, f) for f in loaded])]
+    for field, relation in model.COUNTED_RELATIONS.items():
+        if field in fields:
+            related = getattr(model, relation)
+            target = related.property.mapper.class_
+            options.append(selectinload(related).load_only(target.id))
+    return options
@@ -0,0 +1,311 @@
+"""
+Read-replica routing for read-heavy routes.
+
+With a `replica` entry in SQLALCHEMY_BINDS, routes decorated with
+@replica_reads run their SELECTs on the replica; flushes and INSERT, UPDATE
+or DELETE statements always go to the primary. A route only reads from the
+replica when both hold:
+
+- staleness bound: the replica's copy of the heartbeat row, read at most every
+  REPLICA_CHECK_SECONDS, is no older than REPLICA_MAX_LAG_SECONDS. The
+  heartbeat is written on the primary by a background timer (every
+  REPLICA_HEARTBEAT_SECONDS, 0 to leave it to another writer; one timer per
+  process, none when TESTING) and by `flask sync-replica`, never by a request;
+- read-your-writes: the user has no write the replica has not seen yet. A
+  successful POST/PUT/PATCH/DELETE stamps the user's row in replica_write on
+  the primary, so every worker keeps the user's reads on the primary until a
+  heartbeat written after that stamp shows up on the replica. Each worker
+  caches the stamps it reads for REPLICA_CHECK_SECONDS, and its own writes
+  immediately, so a routed read does not query the primary.
+
+An unreachable replica, or one without the heartbeat table, is treated as
+stale.
+"""
+from flask import current_app, g, request
+from functools import wraps
+from sqlalchemy import delete, func, inspect, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+import logging
+import threading
+import time
+
+REPLICA_BIND = 'replica'
+DEFAULT_MAX_LAG_SECONDS = 5.0
+DEFAULT_CHECK_SECONDS = 1.0
+DEFAULT_HEARTBEAT_SECONDS = 1.0
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# POST endpoints that only read: they do not pin their user to the primary
+READ_ONLY_ENDPOINTS = ('batch.batch',)
+HEARTBEAT_ID = 1
+
+logger = logging.getLogger(__name__)
+
+
+def write_heartbeat(engine):
+    """Stamp the heartbeat row on `engine` (the primary); returns the time written"""
+    from src.models.replica import ReplicaHeartbeat
+
+    table = ReplicaHeartbeat.__table__
+    now = time.time()
+    with engine.begin() as conn:
+        if not conn.execute(update(table).where(table.c.id == HEARTBEAT_ID).values(beat_at=now)).rowcount:
+            conn.execute(insert(table).values(id=HEARTBEAT_ID, beat_at=now))
+    return now
+
+
+def read_heartbeat(engine):
+    from src.models.replica import ReplicaHeartbeat
+
+    table = ReplicaHeartbeat.__table__
+    with engine.connect() as conn:
+        return conn.scalar(select(table.c.beat_at).where(table.c.id == HEARTBEAT_ID))
+
+
+def write_user_write(engine, user_id):
+    """Stamp the user's last write on `engine` (the primary)"""
+    from src.models.replica import ReplicaWrite
+
+    table = ReplicaWrite.__table__
+    now = time.time()
+    with engine.begin() as conn:
+        if not conn.execute(update(table).where(table.c.user_id == user_id).values(written_at=now)).rowcount:
+            conn.execute(insert(table).values(user_id=user_id, written_at=now))
+    return now
+
+
+def read_user_write(engine, user_id):
+    from src.models.replica import ReplicaWrite
+
+    table = ReplicaWrite.__table__
+    with engine.connect() as conn:
+        return conn.scalar(select(table.c.written_at).where(table.c.user_id == user_id))
+
+
+def prune_user_writes(engine, beat):
+    """Forget the writes a replica carrying heartbeat `beat` has already seen"""
+    from src.models.replica import ReplicaWrite
+
+    table = ReplicaWrite.__table__
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.written_at < beat))
+
+
+class ReplicaRouter:
+    """Decides per request whether the replica is fresh enough, and tracks users' pending writes"""
+
+    def __init__(self, primary, replica, max_lag_seconds=DEFAULT_MAX_LAG_SECONDS,
+                 check_seconds=DEFAULT_CHECK_SECONDS):
+        # Callables returning the engines, resolved in the app context
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._replica_beat = None
+        # user_id -> (last write stamp or None, monotonic time it was read)
+        self._pins = {}
+        self.replica_reads = 0
+        self.stale_reads = 0
+        self.pinned_reads = 0
+
+    def replica_beat(self):
+        """The heartbeat time seen on the replica (None: unreachable), refreshed at most every check_seconds"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return self._replica_beat
+            # Other threads keep using the last value while this one refreshes it
+            self._checked_at = now
+            self._pins = {user_id: pin for user_id, pin in self._pins.items()
+                          if now - pin[1] < self.check_seconds}
+        try:
+            beat = read_heartbeat(self.replica())
+        except SQLAlchemyError as e:
+            logger.warning('Read replica heartbeat unavailable: %s', e)
+            beat = None
+        with self._lock:
+            self._replica_beat = beat
+        return beat
+
+    def engine_for(self, user_id):
+        """The replica engine when it may serve this user's reads, else None"""
+        beat = self.replica_beat()
+        if beat is None or time.time() - beat > self.max_lag_seconds:
+            with self._lock:
+                self.stale_reads += 1
+            return None
+        written = self.user_write(user_id)
+        with self._lock:
+            if written is not None and written >= beat:
+                self.pinned_reads += 1
+                return None
+            self.replica_reads += 1
+        return self.replica()
+
+    def user_write(self, user_id):
+        """The user's last write stamp (None: no pending write), read from the primary at most every check_seconds"""
+        with self._lock:
+            cached = self._pins.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.check_seconds:
+            return cached[0]
+        return self._remember(user_id, read_user_write(self.primary(), user_id))
+
+    def pin(self, user_id):
+        """Send the user's reads to the primary, in every worker, until the replica has caught up with this moment"""
+        self._remember(user_id, write_user_write(self.primary(), user_id))
+
+    def _remember(self, user_id, written):
+        with self._lock:
+            cached = self._pins.get(user_id)
+            # A read that started before this worker's own pin must not hide it
+            if cached is not None and cached[0] is not None and (written is None or cached[0] > written):
+                written = cached[0]
+            self._pins[user_id] = (written, time.monotonic())
+        return written
+
+    def beat(self):
+        """Write the heartbeat on the primary and forget the pins the replica has caught up with"""
+        write_heartbeat(self.primary())
+        seen = read_heartbeat(self.replica())
+        if seen is not None:
+            prune_user_writes(self.primary(), seen)
+
+    def pinned_users(self):
+        from src.models.replica import ReplicaWrite
+
+        table = ReplicaWrite.__table__
+        query = select(func.count()).select_from(table)
+        if self._replica_beat is not None:
+            query = query.where(table.c.written_at >= self._replica_beat)
+        with self.primary().connect() as conn:
+            return conn.scalar(query)
+
+    def lag_seconds(self):
+        beat = self._replica_beat
+        return None if beat is None else max(0.0, time.time() - beat)
+
+    def stats(self):
+        lag = self.lag_seconds()
+        return {
+            'lag_seconds': round(lag, 3) if lag is not None else None,
+            'max_lag_seconds': self.max_lag_seconds,
+            'replica_reads': self.replica_reads,
+            'stale_reads': self.stale_reads,
+            'pinned_reads': self.pinned_reads,
+            'pinned_users': self.pinned_users()
+        }
+
+
+def init_replica(app):
+    """Attach a ReplicaRouter when SQLALCHEMY_BINDS has a 'replica' (REPLICA_MAX_LAG_SECONDS, _CHECK_SECONDS,
+    _HEARTBEAT_SECONDS)"""
+    from src.models.user import db
+
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        app.extensions['replica'] = None
+        return
+    router = app.extensions['replica'] = ReplicaRouter(
+        lambda: db.engine, lambda: db.engines[REPLICA_BIND],
+        max_lag_seconds=app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS),
+        check_seconds=app.config.get('REPLICA_CHECK_SECONDS', DEFAULT_CHECK_SECONDS),
+    )
+    app.after_request(_pin_writers)
+    interval = app.config.get('REPLICA_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    if interval and not app.testing:
+        start_heartbeat(app, router, interval)
+
+
+# The process's heartbeat timer: (thread, stop event), started by the first app that needs one
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+
+
+def start_heartbeat(app, router, interval):
+    """Start the heartbeat timer unless this process already runs one; returns its thread"""
+    global _heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None or not _heartbeat[0].is_alive():
+            stop = threading.Event()
+            thread = threading.Thread(target=_beat_forever, args=(app, router, interval, stop),
+                                      name='replica-heartbeat', daemon=True)
+            thread.start()
+            _heartbeat = thread, stop
+        return _heartbeat[0]
+
+
+def stop_heartbeat():
+    """Stop the process's heartbeat timer, if any, and wait for it"""
+    global _heartbeat
+    with _heartbeat_lock:
+        heartbeat, _heartbeat = _heartbeat, None
+    if heartbeat is not None:
+        thread, stop = heartbeat
+        stop.set()
+        thread.join()
+
+
+def _beat_forever(app, router, interval, stop):
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                router.beat()
+            except SQLAlchemyError as e:
+                logger.warning('Replica heartbeat not written: %s', e)
+        stop.wait(interval)
+
+
+def get_replica_router():
+    return current_app.extensions.get('replica')
+
+
+def pin_to_primary(user_id):
+    """Record a write by a user the request did not authenticate by token (registration, login)"""
+    router = get_replica_router()
+    if router is not None:
+        router.pin(user_id)
+
+
+def _pin_writers(response):
+    authenticated = g.get('authenticated')
+    if (request.method not in READ_METHODS and request.endpoint not in READ_ONLY_ENDPOINTS
+            and response.status_code < 400 and authenticated is not None):
+        # The identity key needs no reload of an instance the commit expired
+        get_replica_router().pin(inspect(authenticated[1]).identity[0])
+    return response
+
+
+def replica_reads(f):
+    """Decorator (below token_required) running the route's reads on the replica when it is fresh for the user"""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        router = get_replica_router()
+        engine = router.engine_for(current_user.id) if router is not None else None
+        if engine is None:
+            return f(current_user, *args, **kwargs)
+        # Batched sub-requests share g: restore whatever the enclosing request had
+        previous = g.get('replica_engine')
+        g.replica_engine = engine
+        try:
+            return f(current_user, *args, **kwargs)
+        finally:
+            g.replica_engine = previous
+    return decorated
+
+
+def copy_sqlite_database(source, target):
+    """Copy the SQLite database of engine `source` into that of `target` with SQLite's online backup"""
+    source_conn, target_conn = source.raw_connection(), target.raw_connection()
+    try:
+        source_conn.driver_connection.backup(target_conn.driver_connection)
+    finally:
+        target_conn.close()
+        source_conn.close()
+
+
+def sync_sqlite_replica(primary, replica):
+    """Refresh a stand-in SQLite replica from the primary; returns the heartbeat it now carries"""
+    beat = write_heartbeat(primary)
+    copy_sqlite_database(primary, replica)
+    prune_user_writes(primary, beat)
+    return beat
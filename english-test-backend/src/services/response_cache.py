@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from flask import current_app, request
+import gzip
+import threading
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Bodies smaller than this are not worth a gzip variant
+DEFAULT_GZIP_MIN_BYTES = 1024
+
+
+class CachedPayload:
+    """A JSON body encoded once, plus a gzip variant for bodies worth compressing"""
+
+    def __init__(self, body, gzip_min_bytes=DEFAULT_GZIP_MIN_BYTES):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= gzip_min_bytes else None
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.gzipped) if self.gzipped else 0)
+
+    def to_response(self):
+        """Build a response, serving the gzip variant when the client accepts it"""
+        response = current_app.response_class(mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        # 'gzip;q=0' lists gzip but refuses it
+        if self.gzipped is not None and request.accept_encodings['gzip'] > 0:
+            response.set_data(self.gzipped)
+            response.content_encoding = 'gzip'
+        else:
+            response.set_data(self.body)
+        return response
+
+
+class ResponseCache:
+    """Thread-safe LRU of CachedPayloads capped by total size in bytes.
+
+    Keys are tuples starting with (kind, object_id) so every version of an
+    object can be dropped at once with invalidate().
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, gzip_min_bytes=DEFAULT_GZIP_MIN_BYTES):
+        self.max_bytes = max_bytes
+        self.gzip_min_bytes = gzip_min_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, body):
+        payload = CachedPayload(body, self.gzip_min_bytes)
+        if payload.size > self.max_bytes:
+            return payload
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = payload
+            self.current_bytes += payload.size
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+        return payload
+
+    def invalidate(self, kind, object_id):
+        """Drop every cached variant of one object"""
+        with self._lock:
+            for key in [k for k in self._entries if k[:2] == (kind, object_id)]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+        }
+
+    def _discard(self, key):
+        payload = self._entries.pop(key, None)
+        if payload is not None:
+            self.current_bytes -= payload.size
+
+
+def init_response_cache(app):
+    """Attach a ResponseCache sized from RESPONSE_CACHE_MAX_BYTES to the app"""
+    app.extensions['response_cache'] = ResponseCache(
+        max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+        gzip_min_bytes=app.config.get('RESPONSE_CACHE_GZIP_MIN_BYTES', DEFAULT_GZIP_MIN_BYTES)
+    )
+
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
+
+
+def encode_json(data):
+    """Encode data exactly as jsonify would"""
+    return f"{current_app.json.dumps(data)}\n".encode('utf-8')
+
+
+def cached_json(key, build):
+    """Return a response for key, calling build() to produce the data on a miss"""
+    cache = get_response_cache()
+    payload = cache.get(key)
+    if payload is None:
+        payload = cache.put(key, encode_json(build()))
+    return payload.to_response()
@@ -0,0 +1,244 @@
+"""
+Full-text lesson search backed by an SQLite FTS5 table.
+
+`lesson_search` holds one row per active lesson (rowid = lesson id) with its
+title, description, topic and the text of its decoded content (introduction,
+theory, examples, exercises, vocabulary, summary), plus the level. Level and topic filters are
+column filters inside the MATCH expression, so they use the index too. Mapper events keep it in
+step with the lesson table inside the same transaction; bulk loads that
+bypass the ORM call rebuild_search_index(). On other databases, or before
+init-db created the table, search falls back to a LIKE scan.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_, text
+import json
+import re
+import time
+
+SEARCH_TABLE = 'lesson_search'
+# bm25 column weights: title, description, topic, body, level
+COLUMN_WEIGHTS = (10.0, 4.0, 6.0, 1.0, 0.0)
+TEXT_COLUMNS = '{title description topic body}'
+SNIPPET_TOKENS = 16
+MAX_QUERY_TERMS = 12
+REBUILD_BATCH = 2000
+
+CREATE_SEARCH_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    title, description, topic, body, level,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+INSERT_DOCUMENT = text(
+    f'INSERT INTO {SEARCH_TABLE} (rowid, title, description, topic, body, level) '
+    'VALUES (:id, :title, :description, :topic, :body, :level)'
+)
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# Engines (by URL) whose search table is known to exist
+_ready = set()
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def content_text(content):
+    """Every string of a lesson's JSON content, one per line"""
+    try:
+        decoded = json.loads(content) if isinstance(content, str) else content
+    except (TypeError, ValueError):
+        return content or ''
+    return '\n'.join(_strings(decoded))
+
+
+def _phrase(value):
+    return '"' + ' '.join(t.lower() for t in _TERM.findall(value)) + '"'
+
+
+def build_match(query, level=None, topic=None):
+    """FTS5 MATCH expression: every term required, the last one as a prefix"""
+    terms = [t.lower() for t in _TERM.findall(query or '')][:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += '*'
+    match = f"{TEXT_COLUMNS} : ({' '.join(quoted)})"
+    if level and _TERM.search(level):
+        match += f' AND level : {_phrase(level)}'
+    if topic and _TERM.search(topic):
+        match += f' AND topic : {_phrase(topic)}'
+    return match
+
+
+def search_supported(conn):
+    """True when the connection is SQLite and the search table exists"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    key = str(conn.engine.url)
+    if key not in _ready:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}
+        ).first()
+        if exists is None:
+            return False
+        _ready.add(key)
+    return True
+
+
+def create_search_index(conn):
+    """Create the FTS5 table and fill it if it did not exist (called by init-db)"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    _ready.discard(str(conn.engine.url))
+    existed = search_supported(conn)
+    if not existed:
+        conn.exec_driver_sql(CREATE_SEARCH_TABLE)
+        _ready.add(str(conn.engine.url))
+        rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn):
+    """Re-index every active lesson; returns the number of indexed lessons"""
+    if not search_supported(conn):
+        return 0
+    conn.exec_driver_sql(f'DELETE FROM {SEARCH_TABLE}')
+    rows = conn.execute(text(
+        'SELECT id, title, description, topic, content, level FROM lesson WHERE is_active = 1 ORDER BY id'
+    ))
+    total = 0
+    while True:
+        batch = rows.fetchmany(REBUILD_BATCH)
+        if not batch:
+            break
+        conn.execute(
+            INSERT_DOCUMENT,
+            [{'id': r.id, 'title': r.title, 'description': r.description or '', 'topic': r.topic,
+              'body': content_text(r.content), 'level': r.level} for r in batch]
+        )
+        total += len(batch)
+    return total
+
+
+def index_lesson(conn, lesson):
+    """Upsert one lesson's document, or drop it if the lesson is inactive"""
+    if not search_supported(conn):
+        return
+    conn.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': lesson.id})
+    if lesson.is_active is False:
+        return
+    conn.execute(
+        INSERT_DOCUMENT,
+        {'id': lesson.id, 'title': lesson.title, 'description': lesson.description or '',
+         'topic': lesson.topic, 'body': content_text(lesson.content), 'level': lesson.level}
+    )
+
+
+def remove_lesson(conn, lesson_id):
+    if search_supported(conn):
+        conn.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': lesson_id})
+
+
+def _sync_enabled():
+    return has_app_context() and current_app.config.get('SEARCH_SYNC_ENABLED', True)
+
+
+def _after_save(mapper, connection, target):
+    if _sync_enabled():
+        index_lesson(connection, target)
+
+
+def _after_delete(mapper, connection, target):
+    if _sync_enabled():
+        remove_lesson(connection, target.id)
+
+
+def listen_lessons(model):
+    """Keep the search table in step with ORM inserts, updates and deletes of `model`"""
+    if not event.contains(model, 'after_insert', _after_save):
+        event.listen(model, 'after_insert', _after_save)
+        event.listen(model, 'after_update', _after_save)
+        event.listen(model, 'after_delete', _after_delete)
+
+
+def search_lessons(session, query, page=1, per_page=10, level=None, topic=None):
+    """Ranked page of active lessons matching `query`, with highlighted snippets"""
+    from src.models.lesson import Lesson
+
+    started = time.perf_counter()
+    match = build_match(query, level, topic)
+    if match is None:
+        return {'results': [], 'total': 0, 'engine': 'none', 'took_ms': 0.0}
+    conn = session.connection()
+    offset = (page - 1) * per_page
+
+    if search_supported(conn):
+        params = {'match': match, 'limit': per_page, 'offset': offset}
+        where = f'WHERE {SEARCH_TABLE} MATCH :match'
+        weights = ', '.join(str(w) for w in COLUMN_WEIGHTS)
+        # Rank first: snippets and lesson columns are only computed for the page
+        ranked = session.execute(text(
+            f'SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} '
+            f'{where} ORDER BY score LIMIT :limit OFFSET :offset'
+        ), params).all()
+        scores = {r.rowid: r.score for r in ranked}
+        total = session.execute(text(f'SELECT count(*) FROM {SEARCH_TABLE} {where}'), params).scalar() \
+            if ranked or offset else 0
+        details = {}
+        if ranked:
+            rows = session.execute(text(
+                'SELECT lesson.id, lesson.title, lesson.description, lesson.level, lesson.topic, '
+                'lesson.duration_minutes, '
+                f"highlight({SEARCH_TABLE}, 0, '<mark>', '</mark>') AS title_highlight, "
+                f"snippet({SEARCH_TABLE}, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet "
+                f'FROM {SEARCH_TABLE} JOIN lesson ON lesson.id = {SEARCH_TABLE}.rowid '
+                f"WHERE {SEARCH_TABLE} MATCH :match AND {SEARCH_TABLE}.rowid IN "
+                f"({', '.join(str(int(rowid)) for rowid in scores)})"
+            ), {'match': match}).all()
+            details = {r.id: r for r in rows}
+        results = [{
+            'id': r.id, 'title': r.title, 'description': r.description, 'level': r.level, 'topic': r.topic,
+            'duration_minutes': r.duration_minutes, 'title_highlight': r.title_highlight,
+            'snippet': r.snippet, 'score': round(-scores[r.id], 4)
+        } for r in (details[rowid] for rowid in scores if rowid in details)]
+        engine = 'fts5'
+    else:
+        # No FTS table: unranked substring match on the short fields
+        terms = _TERM.findall(query)
+        base = Lesson.query.filter_by(is_active=True)
+        for term in terms[:MAX_QUERY_TERMS]:
+            pattern = f'%{term}%'
+            base = base.filter(or_(Lesson.title.ilike(pattern), Lesson.description.ilike(pattern),
+                                   Lesson.topic.ilike(pattern)))
+        if level:
+            base = base.filter_by(level=level)
+        if topic:
+            base = base.filter(Lesson.topic.ilike(topic))
+        total = base.count()
+        lessons = base.order_by(Lesson.id).offset(offset).limit(per_page).all()
+        results = [dict(lesson.to_dict(('id', 'title', 'description', 'level', 'topic', 'duration_minutes')),
+                        title_highlight=lesson.title, snippet=lesson.description or '', score=None)
+                   for lesson in lessons]
+        engine = 'like'
+    return {
+        'results': results,
+        'total': total,
+        'engine': engine,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def init_search(app):
+    """Sync lesson writes into the search table (SEARCH_SYNC_ENABLED, default on)"""
+    from src.models.lesson import Lesson
+    listen_lessons(Lesson)
@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+import time
+
+
+def parse_include(value, allowed):
+    """Parse an ?include=a,b query value into a list of section names.
+
+    A missing parameter means every section; an empty one means none.
+    Raises ValueError for unknown sections so routes can answer 400.
+    """
+    if value is None:
+        return list(allowed)
+    sections = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in sections if s not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return sections
+
+
+class SectionTimer:
+    """Collect per-section durations and render them as a Server-Timing header"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def header_value(self):
+        return ', '.join(f'{name};dur={ms:.2f}' for name, ms in self.timings.items())
+
+    def apply(self, response):
+        """Attach the Server-Timing header to a response and return it"""
+        if self.timings:
+            response.headers['Server-Timing'] = self.header_value()
+        return response
@@ -0,0 +1,333 @@
+"""
+Offline near-duplicate and related-content detection with MinHash + LSH.
+
+Every lesson (title, description, topic, content text) and every quiz
+question (stem and options) gets a 64-value MinHash signature over its word
+bigrams; agreement between two signatures estimates the Jaccard similarity
+of their bigram sets. Signatures are cut into bands, and documents sharing a
+band bucket become candidates:
+
+    lessons    16 bands x 4 rows   (likely found from ~0.4 similarity)
+    questions   8 bands x 8 rows   (near duplicates, ~0.8 and above)
+
+Signatures and buckets live in two indexed tables, written by mapper events
+in the same transaction as the lesson or quiz, so the index grows
+incrementally and every worker sees the same data. A query reads the
+buckets of one signature, keeps the candidates sharing the most bands and
+scores only those. NumPy, when installed, vectorizes hashing and scoring;
+results are identical without it.
+"""
+from collections import Counter
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, inspect, select, text, union_all
+import hashlib
+import json
+import re
+import struct
+
+try:
+    import numpy
+except ImportError:  # pure Python hashing and scoring
+    numpy = None
+
+LESSON = 'lesson'
+QUESTION = 'question'
+
+NUM_HASHES = 64
+BANDS = {LESSON: 16, QUESTION: 8}
+SHINGLE_SIZE = 2
+MAX_CANDIDATES = 200
+MAX_BUCKET_READ = 500
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+DEFAULT_RELATED_MIN_SIMILARITY = 0.3
+REBUILD_BATCH = 1000
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_UNPACK = struct.Struct(f'<{NUM_HASHES}I').unpack
+
+
+def tokens(text_value):
+    return _TOKEN.findall((text_value or '').lower())
+
+
+def shingles(text_value, size=SHINGLE_SIZE):
+    """Distinct word n-grams (the words themselves for texts shorter than n)"""
+    words = tokens(text_value)
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hashes(shingle):
+    # One XOF call yields all 64 independent 32-bit hash values of a shingle
+    return hashlib.shake_128(shingle.encode('utf-8')).digest(NUM_HASHES * 4)
+
+
+def signature(text_value):
+    """MinHash signature as bytes (NUM_HASHES little-endian uint32), None for empty text"""
+    found = shingles(text_value)
+    if not found:
+        return None
+    if numpy is not None:
+        matrix = numpy.frombuffer(b''.join(map(_hashes, found)), dtype='<u4').reshape(-1, NUM_HASHES)
+        return matrix.min(axis=0).astype('<u4').tobytes()
+    return struct.pack(f'<{NUM_HASHES}I', *map(min, zip(*(_UNPACK(_hashes(s)) for s in found))))
+
+
+def buckets(sig, bands):
+    """LSH bucket id of every band (56-bit, fits an SQLite INTEGER)"""
+    width = len(sig) // bands
+    return [int.from_bytes(hashlib.blake2b(sig[i * width:(i + 1) * width], digest_size=7).digest(), 'little')
+            for i in range(bands)]
+
+
+def estimate(sig_a, sig_b):
+    """Estimated Jaccard similarity: share of equal MinHash values"""
+    return sum(a == b for a, b in zip(_UNPACK(sig_a), _UNPACK(sig_b))) / NUM_HASHES
+
+
+def estimate_many(sig, others):
+    if not others:
+        return []
+    if numpy is not None:
+        matrix = numpy.frombuffer(b''.join(others), dtype='<u4').reshape(-1, NUM_HASHES)
+        return ((matrix == numpy.frombuffer(sig, dtype='<u4')).sum(axis=1) / NUM_HASHES).tolist()
+    return [estimate(sig, other) for other in others]
+
+
+def lesson_text(title, description, topic, content):
+    from src.services.search import content_text
+    return '\n'.join(filter(None, (title, description, topic, content_text(content))))
+
+
+def question_text(question):
+    if not isinstance(question, dict):
+        return str(question)
+    options = question.get('options')
+    parts = [question.get('question') or '']
+    if isinstance(options, list):
+        parts.extend(str(option) for option in options)
+    return '\n'.join(parts)
+
+
+def _decode_questions(questions):
+    try:
+        decoded = json.loads(questions) if isinstance(questions, str) else questions
+    except (TypeError, ValueError):
+        return []
+    return decoded if isinstance(decoded, list) else []
+
+
+# Index maintenance ---------------------------------------------------------
+
+def _remove(conn, kind, object_id):
+    from src.models.similarity import SimilarityBand, SimilaritySignature
+
+    conn.execute(delete(SimilaritySignature.__table__).where(
+        SimilaritySignature.kind == kind, SimilaritySignature.object_id == object_id))
+    conn.execute(delete(SimilarityBand.__table__).where(
+        SimilarityBand.kind == kind, SimilarityBand.object_id == object_id))
+
+
+def _write(conn, kind, documents):
+    """documents: [(object_id, item, signature)]"""
+    from src.models.similarity import SimilarityBand, SimilaritySignature
+
+    if not documents:
+        return 0
+    conn.execute(insert(SimilaritySignature.__table__), [
+        {'kind': kind, 'object_id': object_id, 'item': item, 'signature': sig}
+        for object_id, item, sig in documents
+    ])
+    conn.execute(insert(SimilarityBand.__table__), [
+        {'kind': kind, 'band': band, 'bucket': bucket, 'object_id': object_id, 'item': item}
+        for object_id, item, sig in documents
+        for band, bucket in enumerate(buckets(sig, BANDS[kind]))
+    ])
+    return len(documents)
+
+
+def _lesson_documents(rows):
+    documents = []
+    for lesson_id, title, description, topic, content in rows:
+        sig = signature(lesson_text(title, description, topic, content))
+        if sig is not None:
+            documents.append((lesson_id, 0, sig))
+    return documents
+
+
+def _question_documents(rows):
+    documents = []
+    for quiz_id, questions in rows:
+        for item, question in enumerate(_decode_questions(questions)):
+            sig = signature(question_text(question))
+            if sig is not None:
+                documents.append((quiz_id, item, sig))
+    return documents
+
+
+def index_lesson(conn, lesson):
+    _remove(conn, LESSON, lesson.id)
+    if lesson.is_active is not False:
+        _write(conn, LESSON, _lesson_documents(
+            [(lesson.id, lesson.title, lesson.description, lesson.topic, lesson.content)]))
+
+
+def index_quiz(conn, quiz):
+    _remove(conn, QUESTION, quiz.id)
+    if quiz.is_active is not False:
+        _write(conn, QUESTION, _question_documents([(quiz.id, quiz.questions)]))
+
+
+def rebuild_similarity_index(conn, progress=None):
+    """Re-index every active lesson and quiz; returns {'lessons': n, 'questions': n}"""
+    from src.models.similarity import SimilarityBand, SimilaritySignature
+
+    conn.execute(delete(SimilaritySignature.__table__))
+    conn.execute(delete(SimilarityBand.__table__))
+    counts = {}
+    for name, kind, sql, documents in (
+        ('lessons', LESSON, 'SELECT id, title, description, topic, content FROM lesson WHERE is_active = 1',
+         _lesson_documents),
+        ('questions', QUESTION, 'SELECT id, questions FROM quiz WHERE is_active = 1', _question_documents),
+    ):
+        rows = conn.execute(text(sql))
+        total = 0
+        while True:
+            batch = rows.fetchmany(REBUILD_BATCH)
+            if not batch:
+                break
+            # Materialize before writing: the read cursor stays open on the same connection
+            total += _write(conn, kind, documents(batch))
+        counts[name] = total
+        if progress:
+            progress(f'similarity index: {total} {name}')
+    return counts
+
+
+def _sync_enabled():
+    return has_app_context() and current_app.config.get('SIMILARITY_SYNC_ENABLED', True)
+
+
+def _changed(target, names):
+    attrs = inspect(target).attrs
+    return any(getattr(attrs, name).history.has_changes() for name in names)
+
+
+def _lesson_saved(mapper, connection, target):
+    if _sync_enabled():
+        index_lesson(connection, target)
+
+
+def _lesson_updated(mapper, connection, target):
+    if _sync_enabled() and _changed(target, ('title', 'description', 'topic', 'content', 'is_active')):
+        index_lesson(connection, target)
+
+
+def _lesson_deleted(mapper, connection, target):
+    if _sync_enabled():
+        _remove(connection, LESSON, target.id)
+
+
+def _quiz_saved(mapper, connection, target):
+    if _sync_enabled():
+        index_quiz(connection, target)
+
+
+def _quiz_updated(mapper, connection, target):
+    if _sync_enabled() and _changed(target, ('questions', 'is_active')):
+        index_quiz(connection, target)
+
+
+def _quiz_deleted(mapper, connection, target):
+    if _sync_enabled():
+        _remove(connection, QUESTION, target.id)
+
+
+# Queries -------------------------------------------------------------------
+
+def candidates(session, kind, sig, exclude=None, limit=MAX_CANDIDATES):
+    """[(object_id, item, shared_bands)] sharing at least one bucket, most shared first"""
+    from src.models.similarity import SimilarityBand
+
+    # One index range read per band, capped: a huge bucket is a crowd of near-identical
+    # documents and any slice of it makes good candidates
+    per_band = [
+        select(SimilarityBand.object_id, SimilarityBand.item)
+        .where(SimilarityBand.kind == kind, SimilarityBand.band == band, SimilarityBand.bucket == bucket)
+        .limit(MAX_BUCKET_READ).subquery().select()
+        for band, bucket in enumerate(buckets(sig, BANDS[kind]))
+    ]
+    shared = Counter(tuple(row) for row in session.execute(union_all(*per_band)))
+    if exclude is not None:
+        shared = Counter({key: n for key, n in shared.items() if key[0] != exclude})
+    ranked = sorted(shared.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+    return [(object_id, item, n) for (object_id, item), n in ranked]
+
+
+def _scored(session, kind, sig, exclude=None):
+    """[(similarity, object_id, item)] of the candidates, best first"""
+    from src.models.similarity import SimilaritySignature
+
+    found = {(object_id, item) for object_id, item, _ in candidates(session, kind, sig, exclude)}
+    if not found:
+        return []
+    rows = [row for row in session.execute(
+        select(SimilaritySignature.object_id, SimilaritySignature.item, SimilaritySignature.signature)
+        .where(SimilaritySignature.kind == kind,
+               SimilaritySignature.object_id.in_({object_id for object_id, _ in found}))
+    ) if (row.object_id, row.item) in found]
+    scores = estimate_many(sig, [row.signature for row in rows])
+    return sorted(((score, row.object_id, row.item) for score, row in zip(scores, rows)),
+                  key=lambda entry: (-entry[0], entry[1], entry[2]))
+
+
+def related_lessons(session, lesson, limit=5, min_similarity=DEFAULT_RELATED_MIN_SIMILARITY):
+    """Active lessons most similar to `lesson`: [(similarity, lesson_id)]"""
+    sig = signature(lesson_text(lesson.title, lesson.description, lesson.topic, lesson.content))
+    if sig is None:
+        return []
+    return [(round(score, 3), object_id) for score, object_id, _ in _scored(session, LESSON, sig, exclude=lesson.id)
+            if score >= min_similarity][:limit]
+
+
+def find_duplicate_questions(session, questions, threshold=None, exclude_quiz_id=None):
+    """Near-duplicates of each new question among indexed questions and earlier ones of the same batch.
+
+    Returns [{'question_index', 'quiz_id', 'question_index_in_quiz', 'similarity'}], the
+    best match per flagged question; quiz_id is None for a duplicate inside `questions`.
+    """
+    if threshold is None:
+        threshold = current_app.config.get('SIMILARITY_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD)
+    flags = []
+    seen = []
+    for index, question in enumerate(questions):
+        sig = signature(question_text(question))
+        if sig is None:
+            continue
+        best = None
+        for score, quiz_id, item in _scored(session, QUESTION, sig, exclude=exclude_quiz_id)[:1]:
+            if score >= threshold:
+                best = {'quiz_id': quiz_id, 'question_index_in_quiz': item, 'similarity': round(score, 3)}
+        for earlier, earlier_sig in seen:
+            score = estimate(sig, earlier_sig)
+            if score >= threshold and (best is None or score > best['similarity']):
+                best = {'quiz_id': None, 'question_index_in_quiz': earlier, 'similarity': round(score, 3)}
+        if best is not None:
+            flags.append(dict(best, question_index=index))
+        seen.append((index, sig))
+    return flags
+
+
+def init_similarity(app):
+    """Index lessons and quiz questions as they are written (SIMILARITY_SYNC_ENABLED)"""
+    from src.models.lesson import Lesson
+    from src.models.quiz import Quiz
+
+    if not event.contains(Lesson, 'after_insert', _lesson_saved):
+        event.listen(Lesson, 'after_insert', _lesson_saved)
+        event.listen(Lesson, 'after_update', _lesson_updated)
+        event.listen(Lesson, 'after_delete', _lesson_deleted)
+        event.listen(Quiz, 'after_insert', _quiz_saved)
+        event.listen(Quiz, 'after_update', _quiz_updated)
+        event.listen(Quiz, 'after_delete', _quiz_deleted)
@@ -0,0 +1,236 @@
+"""
+Slow-query log.
+
+Every SQL statement slower than SLOW_QUERY_THRESHOLD_MS (default 100) is
+recorded with its bound parameters, the route that issued it and the query
+plan (`EXPLAIN QUERY PLAN` on SQLite, captured once per statement shape).
+Statements are aggregated by fingerprint - the SQL with literals and IN-lists
+collapsed - over a rolling SLOW_QUERY_WINDOW (one day); the previous window is
+kept so a full day of traffic can be read back from /api/system/slow-queries.
+"""
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import hashlib
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_WINDOW = 24 * 3600
+DEFAULT_MAX_FINGERPRINTS = 500
+SAMPLES_PER_FINGERPRINT = 5
+PARAM_REPR_LIMIT = 100
+
+SORT_KEYS = ('total_ms', 'max_ms', 'count', 'avg_ms')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_POSTCOMPILE = re.compile(r'\(\[POSTCOMPILE_\w+\]\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(statement):
+    """SQL with literals, placeholders lists and whitespace collapsed"""
+    sql = _STRING.sub('?', statement)
+    sql = _NUMBER.sub('?', sql)
+    sql = _POSTCOMPILE.sub('(?)', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def _short(value):
+    text = repr(value)
+    return text if len(text) <= PARAM_REPR_LIMIT else text[:PARAM_REPR_LIMIT] + '...'
+
+
+def render_parameters(parameters, executemany):
+    if executemany:
+        rows = list(parameters or ())
+        return {'rows': len(rows), 'first': [render_parameters(p, False) for p in rows[:3]]}
+    if isinstance(parameters, dict):
+        return {k: _short(v) for k, v in parameters.items()}
+    return [_short(v) for v in parameters or ()]
+
+
+def origin():
+    """'GET lesson.get_lessons' inside a request, otherwise 'background'"""
+    if has_request_context():
+        return f'{request.method} {request.endpoint or request.path}'
+    return 'background'
+
+
+def explain(conn, statement, parameters):
+    """Query plan rows for a read statement, or None when the dialect has no plan support here"""
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect in ('postgresql', 'mysql', 'mariadb'):
+        prefix = 'EXPLAIN '
+    else:
+        return None
+    # Raw DBAPI cursor: runs inside the same transaction without re-entering these events
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        cursor.close()
+    if dialect == 'sqlite':
+        # (id, parent, notused, detail): indent each step under its parent
+        depth = {0: -1}
+        plan = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            plan.append('  ' * depth[row[0]] + str(row[3]))
+        return plan
+    return [str(row[0]) for row in rows]
+
+
+class SlowQueryLog:
+    """Per-fingerprint aggregates of slow statements over a rolling window"""
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, window=DEFAULT_WINDOW,
+                 max_fingerprints=DEFAULT_MAX_FINGERPRINTS, explain=True):
+        self.threshold_ms = threshold_ms
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._since = time.time()
+        self._previous = None
+        self._dropped = 0
+
+    def _roll(self, now):
+        if now - self._since >= self.window:
+            self._previous = self._snapshot(self._entries, self._since, now, self._dropped)
+            self._entries = {}
+            self._since = now
+            self._dropped = 0
+
+    def needs_plan(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return self.explain and (entry is None or entry['plan'] is None)
+
+    def record(self, normalized, key, elapsed_ms, parameters, route, plan=None):
+        now = time.time()
+        sample = {'at': now, 'ms': round(elapsed_ms, 3), 'route': route, 'parameters': parameters}
+        with self._lock:
+            self._roll(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    self._dropped += 1
+                    return
+                entry = self._entries[key] = {
+                    'fingerprint': key, 'statement': normalized, 'count': 0, 'total_ms': 0.0,
+                    'max_ms': 0.0, 'routes': {}, 'samples': [], 'plan': None, 'first_seen': now,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            entry['last_seen'] = now
+            # Keep the slowest few executions with their parameters
+            entry['samples'].append(sample)
+            entry['samples'].sort(key=lambda s: s['ms'], reverse=True)
+            del entry['samples'][SAMPLES_PER_FINGERPRINT:]
+            if plan is not None and entry['plan'] is None:
+                entry['plan'] = plan
+
+    @staticmethod
+    def _snapshot(entries, since, until, dropped):
+        return {
+            'since': since,
+            'until': until,
+            'dropped_fingerprints': dropped,
+            'entries': [
+                dict(e, routes=dict(e['routes']), samples=list(e['samples']),
+                     total_ms=round(e['total_ms'], 3), max_ms=round(e['max_ms'], 3),
+                     avg_ms=round(e['total_ms'] / e['count'], 3))
+                for e in entries.values()
+            ],
+        }
+
+    def report(self, sort='total_ms', limit=20, previous=False):
+        """Worst offenders of the current (or previous) window"""
+        with self._lock:
+            self._roll(time.time())
+            if previous:
+                snapshot = self._previous or {'since': None, 'until': None, 'dropped_fingerprints': 0, 'entries': []}
+            else:
+                snapshot = self._snapshot(self._entries, self._since, time.time(), self._dropped)
+        entries = sorted(snapshot['entries'], key=lambda e: e[sort], reverse=True)
+        return {
+            'threshold_ms': self.threshold_ms,
+            'window_seconds': self.window,
+            'since': snapshot['since'],
+            'until': snapshot['until'],
+            'fingerprints': len(entries),
+            'dropped_fingerprints': snapshot['dropped_fingerprints'],
+            'queries': entries[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+            self._previous = None
+            self._since = time.time()
+            self._dropped = 0
+
+
+def get_slow_query_log():
+    return current_app.extensions.get('slow_queries')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_query_started', None)
+    if started is None or not has_app_context():
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log = current_app.extensions.get('slow_queries')
+    if log is None or elapsed_ms < log.threshold_ms:
+        return
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    plan = explain(conn, statement, parameters) if not executemany and log.needs_plan(key) else None
+    route = origin()
+    log.record(normalized, key, elapsed_ms, render_parameters(parameters, executemany), route, plan)
+    logger.warning('Slow query %.1f ms [%s] %s: %s', elapsed_ms, key, route, normalized[:200])
+
+
+_engine_hooks = []
+
+
+def init_slow_queries(app):
+    """Time every statement and keep the slow ones in app.extensions['slow_queries']"""
+    if not app.config.get('SLOW_QUERY_ENABLED', True):
+        return
+    app.extensions['slow_queries'] = SlowQueryLog(
+        threshold_ms=app.config.get('SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS),
+        window=app.config.get('SLOW_QUERY_WINDOW', DEFAULT_WINDOW),
+        max_fingerprints=app.config.get('SLOW_QUERY_MAX_FINGERPRINTS', DEFAULT_MAX_FINGERPRINTS),
+        explain=app.config.get('SLOW_QUERY_EXPLAIN', True),
+    )
+    if not _engine_hooks:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_hooks.append(True)
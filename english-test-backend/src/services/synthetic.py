@@ -0,0 +1,380 @@
+"""
+Synthetic data for load and scale testing, written with Core bulk inserts.
+
+    flask --app src.main seed-synthetic --users 100000 --lessons 10000 \
+        --quizzes 50000 --attempts 5000000 --seed 42
+
+The output is a pure function of (sizes, seed, distributions, anchor): the
+same arguments produce the same rows. Ids continue after the current maximum
+of each table, so seeding into a database that already has data is safe.
+"""
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+import json
+import random
+import time
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from src.models.user import User, db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.statistics import UserStatistics
+from src.services.search import rebuild_search_index
+from src.services.vocabulary import rebuild_vocabulary_index
+from src.services.similarity import rebuild_similarity_index
+from src.services.catalog import rebuild_catalog_facets
+from src.services.achievements import rebuild_achievements
+
+DEFAULT_SIZES = {'users': 100000, 'lessons': 10000, 'quizzes': 50000, 'attempts': 5000000}
+
+DEFAULT_DISTRIBUTIONS = {
+    'user_levels': {'beginner': 0.5, 'intermediate': 0.35, 'advanced': 0.15},
+    'lesson_levels': {'beginner': 0.4, 'intermediate': 0.4, 'advanced': 0.2},
+    'lesson_topics': {'Grammar': 0.3, 'Vocabulary': 0.3, 'Reading': 0.2, 'Listening': 0.1, 'Writing': 0.1},
+    'quiz_types': {'multiple_choice': 0.7, 'true_false': 0.2, 'fill_blank': 0.1},
+    # Inclusive range of questions per quiz
+    'questions_per_quiz': [5, 10],
+    'vocabulary_per_lesson': [4, 10],
+    'quizzes_without_lesson': 0.05,
+    # Share of lessons/quizzes that are soft deleted
+    'inactive_rate': 0.02,
+    # Attempts per user follow a lognormal activity (sigma), quiz choice a Zipf law (exponent)
+    'user_activity_sigma': 1.0,
+    'quiz_popularity_skew': 0.8,
+    # Mean probability of answering a question right, per user level (stddev between users)
+    'skill_by_level': {'beginner': 0.55, 'intermediate': 0.7, 'advanced': 0.85},
+    'skill_stddev': 0.12,
+    # Probability a correct answer was fast enough for the +5 bonus
+    'fast_answer_rate': 0.25,
+    'minutes_per_question': 1.0,
+    # Accounts are spread over history_days; attempts lean towards recent days
+    'history_days': 365,
+    'recency_bias': 2.0,
+}
+
+SUBTOPICS = {
+    'Grammar': ['Present Simple', 'Past Tense', 'Present Perfect', 'Conditionals', 'Passive Voice',
+                'Modal Verbs', 'Articles', 'Prepositions', 'Reported Speech', 'Relative Clauses'],
+    'Vocabulary': ['Travel', 'Food', 'Work', 'Family', 'Health', 'Technology', 'Weather', 'Shopping',
+                   'Phrasal Verbs', 'Idioms'],
+    'Reading': ['Short Stories', 'News Articles', 'Emails', 'Advertisements', 'Biographies'],
+    'Listening': ['Conversations', 'Announcements', 'Interviews', 'Podcasts'],
+    'Writing': ['Formal Letters', 'Essays', 'Reviews', 'Reports'],
+}
+SYLLABLES = ['ab', 'ac', 'ad', 'al', 'am', 'an', 'ar', 'at', 'ba', 'be', 'bi', 'bo', 'ca', 'ce', 'co',
+             'da', 'de', 'di', 'do', 'el', 'em', 'en', 'er', 'fa', 'fe', 'fo', 'ga', 'ge', 'go', 'ha',
+             'he', 'in', 'is', 'la', 'le', 'li', 'lo', 'ma', 'me', 'mi', 'mo', 'na', 'ne', 'no', 'or',
+             'pa', 'pe', 'po', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te', 'ti', 'to',
+             'un', 'ur', 'va', 've', 'vi', 'wa', 'we', 'ya', 'za']
+OPTIONS = {'multiple_choice': ['A', 'B', 'C', 'D'], 'true_false': ['True', 'False'], 'fill_blank': []}
+TOPIC_SCORE_COLUMNS = {'grammar': 'grammar_score', 'vocabulary': 'vocabulary_score',
+                       'reading': 'reading_score', 'listening': 'listening_score'}
+# UserStatistics.get_level_progress thresholds
+LEVEL_XP = (('advanced', 500), ('intermediate', 100), ('beginner', 0))
+# Consecutive days tracked per user for streaks
+STREAK_WINDOW_DAYS = 60
+
+
+def merge_distributions(overrides=None):
+    distributions = json.loads(json.dumps(DEFAULT_DISTRIBUTIONS))
+    for key, value in (overrides or {}).items():
+        if key not in distributions:
+            raise ValueError(f'Unknown distribution: {key}')
+        if isinstance(distributions[key], dict):
+            distributions[key] = dict(value)
+        else:
+            distributions[key] = value
+    return distributions
+
+
+def weighted(rng, weights):
+    """Return a sampler drawing keys of `weights` (a {value: weight} mapping)"""
+    values = list(weights)
+    cumulative = list(accumulate(weights[v] for v in values))
+    total = cumulative[-1]
+    return lambda: values[bisect(cumulative, rng.random() * total)]
+
+
+def make_words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def next_id(conn, model):
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+class SyntheticDataset:
+    """Generate and insert one dataset; progress(message) is called after each table"""
+
+    def __init__(self, sizes=None, seed=42, distributions=None, anchor=None, batch_size=20000, progress=None):
+        self.sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+        self.seed = seed
+        self.dist = merge_distributions(distributions)
+        # Default anchor: today at midnight UTC, so dashboards see recent activity
+        self.anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.counts = {}
+
+    def run(self):
+        started = time.perf_counter()
+        engine = db.engine
+        with engine.begin() as conn:
+            if engine.dialect.name == 'sqlite':
+                # A throwaway bulk load: no need to fsync every batch
+                conn.exec_driver_sql('PRAGMA synchronous = OFF')
+            self.insert_users(conn)
+            self.insert_lessons(conn)
+            # Core inserts bypass the ORM events that keep the search table in sync
+            indexed = rebuild_search_index(conn)
+            if indexed:
+                self.progress(f'search index: {indexed} lessons')
+            self.progress(f'vocabulary: {rebuild_vocabulary_index(conn)} entries')
+            self.insert_quizzes(conn)
+            self.insert_attempts(conn)
+            self.insert_statistics(conn)
+            rebuild_similarity_index(conn, progress=self.progress)
+            self.progress(f'catalog facets: {rebuild_catalog_facets(conn)} rows')
+            self.progress(f'achievements: {rebuild_achievements(conn)} awards')
+        self.counts['seconds'] = round(time.perf_counter() - started, 1)
+        return self.counts
+
+    def _bulk(self, conn, model, rows, name):
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                conn.execute(insert(model.__table__), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.execute(insert(model.__table__), batch)
+            total += len(batch)
+        self.counts[name] = total
+        self.progress(f'{name}: {total} rows')
+
+    def _past(self, max_days):
+        return self.anchor - timedelta(seconds=self.rng.random() * max_days * 86400)
+
+    def insert_users(self, conn):
+        rng, dist = self.rng, self.dist
+        level = weighted(rng, dist['user_levels'])
+        # Hashing is deliberately slow; every synthetic account shares one password
+        password_hash = generate_password_hash('password123')
+        first = next_id(conn, User)
+        self.user_ids = range(first, first + self.sizes['users'])
+        self.user_levels = {}
+        self.user_created = {}
+
+        def rows():
+            for user_id in self.user_ids:
+                user_level = level()
+                created_at = self._past(dist['history_days'])
+                self.user_levels[user_id] = user_level
+                self.user_created[user_id] = created_at
+                yield {
+                    'id': user_id, 'username': f'synthetic_{user_id}', 'email': f'synthetic_{user_id}@example.com',
+                    'password_hash': password_hash, 'first_name': None, 'last_name': None, 'level': user_level,
+                    'created_at': created_at, 'last_login': None, 'is_active': True
+                }
+        self._bulk(conn, User, rows(), 'users')
+
+    def insert_lessons(self, conn):
+        rng, dist = self.rng, self.dist
+        topic, level = weighted(rng, dist['lesson_topics']), weighted(rng, dist['lesson_levels'])
+        vocabulary = make_words(rng, 5000)
+        first = next_id(conn, Lesson)
+        self.lesson_meta = {}
+
+        def rows():
+            for lesson_id in range(first, first + self.sizes['lessons']):
+                lesson_topic, lesson_level = topic(), level()
+                subtopic = rng.choice(SUBTOPICS.get(lesson_topic, [lesson_topic]))
+                words = rng.sample(vocabulary, rng.randint(*dist['vocabulary_per_lesson']))
+                content = {
+                    'introduction': f'Welcome to this {lesson_level} level lesson on {subtopic}.',
+                    'objectives': [f'Understand {subtopic}', f'Practice {subtopic}', f'Apply {subtopic} in context'],
+                    'content': {
+                        'theory': f'{subtopic} ({lesson_topic.lower()}) explained for {lesson_level} students. '
+                                  + ' '.join(rng.sample(vocabulary, 40)),
+                        'examples': [f'Example {n} using {rng.choice(words)}.' for n in range(1, 4)],
+                        'practice_exercises': [{'instruction': f'Use "{w}" in a sentence.', 'example': f'I {w} every day.'}
+                                               for w in words[:2]]
+                    },
+                    'vocabulary': [{'word': w, 'definition': f'definition of {w}', 'example': f'This is {w}.'} for w in words],
+                    'summary': f'In this lesson, we covered {subtopic}.',
+                    'next_steps': 'Continue practicing and review the vocabulary.'
+                }
+                created_at = self._past(dist['history_days'])
+                self.lesson_meta[lesson_id] = (lesson_topic, lesson_level, subtopic, created_at)
+                yield {
+                    'id': lesson_id, 'title': f'{subtopic} - {lesson_level.title()} Level',
+                    'description': f'Learn about {subtopic} at {lesson_level} level', 'content': json.dumps(content),
+                    'level': lesson_level, 'topic': lesson_topic, 'duration_minutes': rng.choice((10, 15, 20, 30)),
+                    'created_at': created_at, 'updated_at': created_at,
+                    'is_active': rng.random() >= dist['inactive_rate'], 'generated_by_ai': True,
+                    'ai_prompt': f'Topic: {subtopic}, Level: {lesson_level}, Duration: 15 minutes'
+                }
+        self._bulk(conn, Lesson, rows(), 'lessons')
+
+    def insert_quizzes(self, conn):
+        rng, dist = self.rng, self.dist
+        quiz_type = weighted(rng, dist['quiz_types'])
+        topic, level = weighted(rng, dist['lesson_topics']), weighted(rng, dist['lesson_levels'])
+        lesson_ids = list(self.lesson_meta)
+        first = next_id(conn, Quiz)
+        # Per quiz: (correct answers, lowercase topic or None)
+        self.quiz_answers = []
+        self.quiz_ids = []
+
+        def rows():
+            for quiz_id in range(first, first + self.sizes['quizzes']):
+                if lesson_ids and rng.random() >= dist['quizzes_without_lesson']:
+                    lesson_id = rng.choice(lesson_ids)
+                    quiz_topic, quiz_level, subtopic, lesson_created = self.lesson_meta[lesson_id]
+                    created_at = lesson_created + (self.anchor - lesson_created) * rng.random()
+                else:
+                    lesson_id, quiz_topic, quiz_level = None, topic(), level()
+                    subtopic = rng.choice(SUBTOPICS.get(quiz_topic, [quiz_topic]))
+                    created_at = self._past(dist['history_days'])
+                kind = quiz_type()
+                questions = []
+                for n in range(1, rng.randint(*dist['questions_per_quiz']) + 1):
+                    options = OPTIONS[kind]
+                    questions.append({
+                        'id': n, 'question': f'{subtopic} question {n}?', 'type': kind, 'options': options,
+                        'correct_answer': rng.choice(options) if options else f'answer{n}',
+                        'explanation': f'Explanation for question {n}.'
+                    })
+                self.quiz_ids.append(quiz_id)
+                self.quiz_answers.append(([q['correct_answer'] for q in questions], quiz_topic.lower()))
+                yield {
+                    'id': quiz_id, 'lesson_id': lesson_id, 'title': f'{subtopic} Quiz - {quiz_level.title()} Level',
+                    'description': f'Test your knowledge of {subtopic} at {quiz_level} level',
+                    'questions': json.dumps(questions), 'level': quiz_level, 'quiz_type': kind,
+                    'time_limit_minutes': 10, 'passing_score': 70, 'created_at': created_at, 'updated_at': created_at,
+                    'is_active': rng.random() >= dist['inactive_rate'], 'generated_by_ai': True,
+                    'ai_prompt': f'Topic: {subtopic}, Level: {quiz_level}, Questions: {len(questions)}, Type: {kind}'
+                }
+        self._bulk(conn, Quiz, rows(), 'quizzes')
+
+    def attempts_per_user(self):
+        """Split the attempt total over users by a lognormal activity level"""
+        rng = self.rng
+        activity = [rng.lognormvariate(0, self.dist['user_activity_sigma']) for _ in self.user_ids]
+        scale = self.sizes['attempts'] / sum(activity)
+        counts = [int(a * scale) for a in activity]
+        # Hand the rounding remainder to the most active users
+        remainder = self.sizes['attempts'] - sum(counts)
+        for index in sorted(range(len(counts)), key=activity.__getitem__, reverse=True)[:remainder]:
+            counts[index] += 1
+        return counts
+
+    def insert_attempts(self, conn):
+        rng, dist = self.rng, self.dist
+        self.user_stats = {}
+        if not self.user_ids or not self.quiz_ids:
+            self.counts['attempts'] = 0
+            return
+        popularity = list(accumulate(1 / (rank ** dist['quiz_popularity_skew'])
+                                     for rank in range(1, len(self.quiz_ids) + 1)))
+        # Popularity rank is independent of quiz id
+        order = list(range(len(self.quiz_ids)))
+        rng.shuffle(order)
+        total_weight = popularity[-1]
+        skill_by_level, skill_stddev = dist['skill_by_level'], dist['skill_stddev']
+        fast_rate, minutes_per_question = dist['fast_answer_rate'], dist['minutes_per_question']
+        recency_bias = dist['recency_bias']
+        first = next_id(conn, QuizAttempt)
+        counts = self.attempts_per_user()
+        anchor_day = self.anchor.date().toordinal()
+
+        def rows():
+            attempt_id = first
+            for user_id, count in zip(self.user_ids, counts):
+                if not count:
+                    continue
+                skill = min(0.98, max(0.05, rng.gauss(skill_by_level.get(self.user_levels[user_id], 0.7), skill_stddev)))
+                active_seconds = (self.anchor - self.user_created[user_id]).total_seconds()
+                # [taken, passed, score_sum, xp, minutes, last_completed, recent_days, {topic: [sum, n]}]
+                stats = [0, 0, 0.0, 0, 0, None, set(), {}]
+                self.user_stats[user_id] = stats
+                for _ in range(count):
+                    quiz_index = order[bisect(popularity, rng.random() * total_weight)]
+                    correct_answers, topic = self.quiz_answers[quiz_index]
+                    answers = {}
+                    score = 0
+                    for n, correct in enumerate(correct_answers, 1):
+                        if rng.random() < skill:
+                            answers[str(n)] = correct
+                            score += 15 if rng.random() < fast_rate else 10
+                        else:
+                            answers[str(n)] = 'wrong'
+                    completed_at = self.anchor - timedelta(seconds=active_seconds * rng.random() ** recency_bias)
+                    minutes = round(max(0.5, rng.gauss(minutes_per_question, 0.3) * len(correct_answers)), 1)
+                    passed = score >= 70
+
+                    stats[0] += 1
+                    stats[1] += passed
+                    stats[2] += score
+                    stats[3] += int(score)
+                    stats[4] += int(minutes)
+                    if stats[5] is None or completed_at > stats[5]:
+                        stats[5] = completed_at
+                    day = completed_at.date().toordinal()
+                    if anchor_day - day < STREAK_WINDOW_DAYS:
+                        stats[6].add(day)
+                    topic_total = stats[7].setdefault(topic, [0.0, 0])
+                    topic_total[0] += score
+                    topic_total[1] += 1
+
+                    yield {
+                        'id': attempt_id, 'user_id': user_id, 'quiz_id': self.quiz_ids[quiz_index],
+                        'answers': json.dumps(answers), 'score': float(score), 'time_taken_minutes': minutes,
+                        'completed_at': completed_at, 'is_passed': passed
+                    }
+                    attempt_id += 1
+        self._bulk(conn, QuizAttempt, rows(), 'attempts')
+
+    def insert_statistics(self, conn):
+        """One UserStatistics row per user, consistent with the attempts just written"""
+        def streaks(days):
+            longest = current = run = 0
+            previous = None
+            for day in sorted(days):
+                run = run + 1 if previous is not None and day == previous + 1 else 1
+                longest = max(longest, run)
+                previous = day
+            if previous is not None and self.anchor.date().toordinal() - previous <= 1:
+                current = run
+            return current, longest
+
+        def rows():
+            for user_id in self.user_ids:
+                taken, passed, score_sum, xp, minutes, last, days, topics = \
+                    self.user_stats.get(user_id, (0, 0, 0.0, 0, 0, None, set(), {}))
+                current, longest = streaks(days)
+                row = {
+                    'user_id': user_id, 'total_lessons_completed': 0, 'total_quizzes_taken': taken,
+                    'total_quizzes_passed': passed, 'average_score': round(score_sum / taken, 2) if taken else 0.0,
+                    'total_study_time_minutes': minutes, 'experience_points': xp,
+                    'current_level': next(level for level, threshold in LEVEL_XP if xp >= threshold),
+                    'current_streak_days': current, 'longest_streak_days': longest,
+                    'last_activity_date': last.date() if last else None,
+                    'created_at': self.user_created[user_id], 'updated_at': last or self.user_created[user_id]
+                }
+                for column in TOPIC_SCORE_COLUMNS.values():
+                    row[column] = 0.0
+                for topic, (total, n) in topics.items():
+                    if topic in TOPIC_SCORE_COLUMNS:
+                        row[TOPIC_SCORE_COLUMNS[topic]] = round(total / n, 2)
+                yield row
+        self._bulk(conn, UserStatistics, rows(), 'user_statistics')
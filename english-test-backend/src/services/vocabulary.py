@@ -0,0 +1,252 @@
+"""
+Site-wide vocabulary index.
+
+Words from each lesson's `content.vocabulary[]` are copied into the
+vocabulary_entry table whenever a lesson is created, its content changes or
+it is deleted (mapper events, same transaction). Each process keeps a sorted
+array of the distinct normalized words; a prefix lookup is two bisects and a
+slice. The array is rebuilt after a local commit touched vocabulary; every
+VOCABULARY_REFRESH_SECONDS a cheap version query picks up writes made by
+other workers.
+"""
+from bisect import bisect_left
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, inspect, insert, select, text
+from sqlalchemy.orm import Session, object_session
+import json
+import threading
+import time
+
+DEFAULT_REFRESH_SECONDS = 60
+WORD_MAX_LENGTH = 100
+# Lessons listed per word in autocomplete results
+LESSONS_PER_WORD = 5
+REBUILD_BATCH = 2000
+
+
+def normalize_word(word):
+    return ' '.join(word.split()).lower()
+
+
+def extract_vocabulary(content):
+    """Distinct vocabulary rows of a lesson content (JSON string or dict), in lesson order"""
+    try:
+        decoded = json.loads(content) if isinstance(content, str) else content
+    except (TypeError, ValueError):
+        return []
+    items = decoded.get('vocabulary') if isinstance(decoded, dict) else None
+    rows = []
+    seen = set()
+    for item in items if isinstance(items, list) else ():
+        if isinstance(item, str):
+            item = {'word': item}
+        if not isinstance(item, dict) or not isinstance(item.get('word'), str):
+            continue
+        word = ' '.join(item['word'].split())[:WORD_MAX_LENGTH]
+        normalized = word.lower()
+        if not normalized or normalized in seen:
+            continue
+        seen.add(normalized)
+        rows.append({
+            'word': word,
+            'normalized': normalized,
+            'definition': item.get('definition') if isinstance(item.get('definition'), str) else None,
+            'example': item.get('example') if isinstance(item.get('example'), str) else None,
+            'position': len(rows),
+        })
+    return rows
+
+
+class VocabularyIndex:
+    """Sorted array of normalized words, each with its display form, definition and lessons"""
+
+    def __init__(self, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._keys = []
+        self._words = []
+        self._loaded_at = None
+        self._version = None
+        self._stale = True
+        self.loads = 0
+
+    def invalidate(self):
+        self._stale = True
+
+    def _fresh(self):
+        return not self._stale and self._loaded_at is not None \
+            and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure_loaded(self, session):
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            # Cleared before reading so an invalidation during the load triggers another one
+            stale, self._stale = self._stale, False
+            version = self._read_version(session)
+            if stale or version != self._version:
+                self._load(session)
+                self._version = version
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _read_version(session):
+        """Changes whenever rows are rewritten (new ids) or removed, or a lesson is edited"""
+        from src.models.lesson import Lesson
+        from src.models.vocabulary import VocabularyEntry
+
+        return tuple(session.execute(select(
+            select(func.max(VocabularyEntry.id)).scalar_subquery(),
+            select(func.count(VocabularyEntry.id)).scalar_subquery(),
+            select(func.max(Lesson.updated_at)).scalar_subquery(),
+        )).one())
+
+    def _load(self, session):
+        from src.models.lesson import Lesson
+        from src.models.vocabulary import VocabularyEntry
+
+        conn = session.connection()
+        # Two scans (the entries in unique-index order) instead of a join sorted by word
+        lessons = {
+            row.id: {'id': row.id, 'title': row.title, 'level': row.level, 'topic': row.topic}
+            for row in conn.execute(select(Lesson.id, Lesson.title, Lesson.level, Lesson.topic)
+                                    .where(Lesson.is_active.is_(True)))
+        }
+        rows = conn.execute(select(VocabularyEntry.normalized, VocabularyEntry.lesson_id, VocabularyEntry.word,
+                                   VocabularyEntry.definition, VocabularyEntry.example)
+                            .order_by(VocabularyEntry.normalized, VocabularyEntry.lesson_id))
+        keys, words = [], []
+        for normalized, lesson_id, word, definition, example in rows:
+            lesson = lessons.get(lesson_id)
+            if lesson is None:
+                continue
+            if not keys or keys[-1] != normalized:
+                keys.append(normalized)
+                # The first lesson (lowest id) provides the definition shown
+                words.append({'word': word, 'definition': definition, 'example': example, 'lessons': []})
+            words[-1]['lessons'].append(lesson)
+        self._keys, self._words = keys, words
+        self.loads += 1
+
+    def complete(self, prefix, limit=10):
+        """Words starting with prefix, alphabetically"""
+        prefix = normalize_word(prefix)
+        keys, words = self._keys, self._words
+        start = bisect_left(keys, prefix)
+        # Every key with this prefix sorts before prefix + U+10FFFF
+        end = bisect_left(keys, prefix + '\U0010ffff', start)
+        return [self._result(words[i]) for i in range(start, min(end, start + limit))], end - start
+
+    def lookup(self, word):
+        keys = self._keys
+        normalized = normalize_word(word)
+        i = bisect_left(keys, normalized)
+        if i < len(keys) and keys[i] == normalized:
+            return self._words[i]
+        return None
+
+    @staticmethod
+    def _result(entry):
+        return {
+            'word': entry['word'],
+            'definition': entry['definition'],
+            'example': entry['example'],
+            'lesson_count': len(entry['lessons']),
+            'lessons': entry['lessons'][:LESSONS_PER_WORD],
+        }
+
+    def stats(self):
+        return {'words': len(self._keys), 'loads': self.loads, 'refresh_seconds': self.refresh_seconds}
+
+
+def get_vocabulary_index():
+    return current_app.extensions['vocabulary_index']
+
+
+def sync_lesson_vocabulary(conn, lesson):
+    """Replace a lesson's vocabulary rows (none for inactive lessons)"""
+    from src.models.vocabulary import VocabularyEntry
+
+    conn.execute(delete(VocabularyEntry.__table__).where(VocabularyEntry.lesson_id == lesson.id))
+    if lesson.is_active is False:
+        return
+    rows = extract_vocabulary(lesson.content)
+    if rows:
+        conn.execute(insert(VocabularyEntry.__table__), [dict(row, lesson_id=lesson.id) for row in rows])
+
+
+def rebuild_vocabulary_index(conn):
+    """Re-extract the vocabulary of every active lesson; returns the number of rows written"""
+    from src.models.vocabulary import VocabularyEntry
+
+    conn.execute(delete(VocabularyEntry.__table__))
+    lessons = conn.execute(text('SELECT id, content FROM lesson WHERE is_active = 1 ORDER BY id'))
+    total = 0
+    while True:
+        batch = lessons.fetchmany(REBUILD_BATCH)
+        if not batch:
+            break
+        rows = [dict(row, lesson_id=lesson_id) for lesson_id, content in batch for row in extract_vocabulary(content)]
+        if rows:
+            conn.execute(insert(VocabularyEntry.__table__), rows)
+            total += len(rows)
+    return total
+
+
+def _mark_changed(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['vocabulary_changed'] = True
+
+
+def _after_insert(mapper, connection, target):
+    if has_app_context():
+        sync_lesson_vocabulary(connection, target)
+        _mark_changed(target)
+
+
+def _after_update(mapper, connection, target):
+    if not has_app_context():
+        return
+    attrs = inspect(target).attrs
+    if attrs.content.history.has_changes() or attrs.is_active.history.has_changes():
+        sync_lesson_vocabulary(connection, target)
+        _mark_changed(target)
+    elif any(getattr(attrs, name).history.has_changes() for name in ('title', 'level', 'topic')):
+        # Rows unchanged, but the index shows these lesson columns
+        _mark_changed(target)
+
+
+def _after_delete(mapper, connection, target):
+    if has_app_context():
+        from src.models.vocabulary import VocabularyEntry
+        connection.execute(delete(VocabularyEntry.__table__).where(VocabularyEntry.lesson_id == target.id))
+        _mark_changed(target)
+
+
+def _after_commit(session):
+    if session.info.pop('vocabulary_changed', False) and has_app_context():
+        index = current_app.extensions.get('vocabulary_index')
+        if index is not None:
+            index.invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop('vocabulary_changed', None)
+
+
+def init_vocabulary(app):
+    """Extract lesson vocabulary on writes and keep a per-process prefix index"""
+    from src.models.lesson import Lesson
+
+    app.extensions['vocabulary_index'] = VocabularyIndex(
+        refresh_seconds=app.config.get('VOCABULARY_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    )
+    if not event.contains(Lesson, 'after_insert', _after_insert):
+        event.listen(Lesson, 'after_insert', _after_insert)
+        event.listen(Lesson, 'after_update', _after_update)
+        event.listen(Lesson, 'after_delete', _after_delete)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.main import create_app
+from src.commands import init_db
+from src.models.user import User, db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.statistics import UserStatistics
+
+TOPICS = ('Grammar', 'Vocabulary', 'Reading', 'Listening')
+LEVELS = ('beginner', 'intermediate', 'advanced')
+
+
+def seed_dataset(users=5, lessons=12, quizzes_per_lesson=2, attempts_per_user=40):
+    """A small but realistic dataset: every N+1 shows up as dozens of extra queries"""
+    now = datetime.utcnow()
+    accounts = []
+    for u in range(users):
+        user = User(username=f'user{u}', email=f'user{u}@example.com', level=LEVELS[u % 3])
+        user.set_password('password123')
+        db.session.add(user)
+        accounts.append(user)
+    db.session.flush()
+
+    quizzes = []
+    for i in range(lessons):
+        topic = TOPICS[i % len(TOPICS)]
+        lesson = Lesson(
+            title=f'{topic} lesson {i}', description=f'About {topic.lower()}', level=LEVELS[i % 3], topic=topic,
+            content=json.dumps({'introduction': 'Intro', 'vocabulary': [{'word': f'word{i}'}]})
+        )
+        db.session.add(lesson)
+        for q in range(quizzes_per_lesson):
+            quiz = Quiz(lesson=lesson, title=f'{topic} quiz {i}.{q}', level=lesson.level)
+            quiz.set_questions([
+                {'id': n, 'question': f'Q{n}?', 'options': ['a', 'b', 'c'], 'correct_answer': 'a'}
+                for n in range(1, 6)
+            ])
+            db.session.add(quiz)
+            quizzes.append(quiz)
+    # Quizzes without a lesson fall back to the 'General' topic
+    for q in range(2):
+        quiz = Quiz(title=f'General quiz {q}', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'Q?', 'options': ['a', 'b'], 'correct_answer': 'a'}])
+        db.session.add(quiz)
+        quizzes.append(quiz)
+    db.session.flush()
+
+    for u, user in enumerate(accounts):
+        stats = UserStatistics(user_id=user.id)
+        db.session.add(stats)
+        db.session.flush()
+        for n in range(attempts_per_user):
+            quiz = quizzes[(u * 7 + n) % len(quizzes)]
+            attempt = QuizAttempt(
+                user_id=user.id, quiz_id=quiz.id, score=float((n * 13 + u * 29) % 101),
+                time_taken_minutes=5 + n % 7, completed_at=now - timedelta(days=n * 1.5, hours=u)
+            )
+            attempt.set_answers({'1': 'a'})
+            attempt.is_passed = attempt.score >= 70
+            db.session.add(attempt)
+            stats.update_quiz_stats(attempt)
+    db.session.commit()
+    return accounts
+
+
+def make_app(tmp_path, factory=create_app, **config):
+    """A fresh app on its own SQLite file under tmp_path, schema created; config overrides the defaults.
+
+    factory: create_app, or src.asgi.create_asgi_app for the ASGI bridge around it.
+    """
+    settings = {
+        'SECRET_KEY': 'test-secret',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'ADMISSION_ENABLED': False,
+    }
+    settings.update(config)
+    app = factory(settings)
+    with getattr(app, 'flask_app', app).app_context():
+        init_db()
+    return app
+
+
+def add_user(username, **fields):
+    """Add a user (password 'password123') to the session and flush it so it has an id"""
+    user = User(username=username, email=f'{username}@example.com', **fields)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def bearer(app, user):
+    return {'Authorization': f'Bearer {user.generate_token(app.config["SECRET_KEY"])}'}
+
+
+async def asgi_call(asgi_app, method, path, headers=None, body=b'', query_string=b''):
+    """Send one HTTP request through an ASGI app; the client never disconnects"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query_string,
+        'headers': [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in (headers or {}).items()],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body).encode()
+        scope['headers'].append((b'content-type', b'application/json'))
+    received = []
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Future()
+
+    async def send(message):
+        received.append(message)
+
+    await asgi_app(scope, receive, send)
+    start = next(m for m in received if m['type'] == 'http.response.start')
+    chunks = [m['body'] for m in received if m['type'] == 'http.response.body' and m.get('body')]
+    return SimpleNamespace(
+        status=start['status'], headers={k.decode('latin1'): v.decode('latin1') for k, v in start['headers']},
+        chunks=chunks, body=b''.join(chunks), json=lambda: json.loads(b''.join(chunks))
+    )
+
+
+def asgi_request(asgi_app, method, path, **kwargs):
+    return asyncio.run(asgi_call(asgi_app, method, path, **kwargs))
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Replace AsyncOpenAI: records each call, answers after `delay` with `content` (default: valid JSON)"""
+    from src.services import llm
+
+    fake = SimpleNamespace(calls=[], delay=0.05, content=None)
+
+    async def create(**kwargs):
+        fake.calls.append(kwargs)
+        await asyncio.sleep(fake.delay)
+        content = fake.content
+        if content is None:
+            # Quiz prompts ask for a JSON array of questions, lesson prompts for an object
+            wants_questions = 'JSON array' in kwargs['messages'][0]['content']
+            content = json.dumps([{'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}]
+                                 if wants_questions else {'introduction': 'Generated', 'vocabulary': []})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm, 'get_async_openai_client', lambda: client)
+    return fake
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test-secret',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'ADMISSION_ENABLED': False,
+    })
+    with app.app_context():
+        init_db()
+        seed_dataset()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth_headers(app):
+    with app.app_context():
+        return bearer(app, User.query.filter_by(username='user0').first())
+
+
+@pytest.fixture
+def headers_for():
+    """Authorization headers of a user of any app: headers_for(app, user)"""
+    return bearer
+
+
+@pytest.fixture
+def engine(app):
+    with app.app_context():
+        return db.engine
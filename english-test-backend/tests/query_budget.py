@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryRecorder:
+    """Collect every SQL statement an engine executes while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join(
+            f'  {i}. {" ".join(statement.split())}  {parameters!r}'
+            for i, (statement, parameters) in enumerate(self.statements, 1)
+        )
+
+
+@contextmanager
+def query_budget(engine, budget, label=''):
+    """Fail with the full statement list if more than `budget` statements run inside the block"""
+    with QueryRecorder(engine) as recorder:
+        yield recorder
+    if recorder.count > budget:
+        raise AssertionError(
+            f'{label or "block"} ran {recorder.count} SQL statements, budget is {budget}:\n{recorder.report()}'
+        )
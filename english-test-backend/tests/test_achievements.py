@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.statistics import UserStatistics
+from src.models.achievement import UserAchievement
+from src.services import achievements
+from src.services.achievements import QUIZ_SUBMITTED, rebuild_achievements, record_events
+
+
+@pytest.fixture
+def badge_app(tmp_path, headers_for):
+    app = make_app(tmp_path, OFFLINE_MAX_DAYS=3650)
+    with app.app_context():
+        user = add_user('learner', created_at=datetime(2025, 1, 1))
+        quiz = Quiz(title='Articles', level='beginner')
+        # Ten points a question: all ten right is a perfect 100
+        quiz.set_questions([{'id': n, 'question': f'A or an: ___ apple ({n})', 'options': ['a', 'an'],
+                             'correct_answer': 'an'} for n in range(1, 11)])
+        db.session.add(quiz)
+        db.session.commit()
+        headers, ids = headers_for(app, user), (user.id, quiz.id)
+    return app, headers, ids
+
+
+ALL_RIGHT = {str(n): 'an' for n in range(1, 11)}
+
+
+def test_submit_awards_badges_once_with_their_earned_time(badge_app):
+    app, headers, (user_id, quiz_id) = badge_app
+    client = app.test_client()
+
+    first = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': ALL_RIGHT}, headers=headers).get_json()
+    assert {a['id'] for a in first['new_achievements']} == {'first_quiz', 'perfect_score', 'high_achiever', 'level_up'}
+    again = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': ALL_RIGHT}, headers=headers).get_json()
+    assert again['new_achievements'] == []
+
+    # Offline attempts are dated from when they were taken
+    batch = client.post('/api/quizzes/submit-batch', headers=headers, json={'attempts': [
+        {'quiz_id': quiz_id, 'answers': ALL_RIGHT, 'completed_at': '2026-01-0%dT10:00:00Z' % day}
+        for day in range(1, 9)
+    ]}).get_json()
+    assert [a['id'] for a in batch['new_achievements']] == ['quiz_master', 'advanced_learner']
+
+    data = client.get('/api/statistics/achievements', headers=headers).get_json()
+    assert data['total_earned'] == 6
+    assert 'streak_week' in data['progress'] and 'quiz_master' not in data['progress']
+    with app.app_context():
+        assert UserAchievement.query.filter_by(user_id=user_id).count() == 6
+        assert UserStatistics.query.filter_by(user_id=user_id).one().current_level == 'advanced'
+
+
+def test_rebuild_backfills_existing_progress(badge_app):
+    app, headers, (user_id, quiz_id) = badge_app
+    with app.app_context():
+        db.session.add_all([
+            QuizAttempt(user_id=user_id, quiz_id=quiz_id, answers='{}', score=100.0, is_passed=True, completed_at=datetime(2025, 3, 1)),
+            QuizAttempt(user_id=user_id, quiz_id=quiz_id, answers='{}', score=50.0, is_passed=False, completed_at=datetime(2025, 2, 1)),
+            UserStatistics(user_id=user_id, total_quizzes_taken=2, average_score=75.0, experience_points=150,
+                           current_streak_days=1, updated_at=datetime(2025, 3, 1)),
+        ])
+        db.session.commit()
+        with db.engine.begin() as conn:
+            assert rebuild_achievements(conn) == 3
+
+    earned = {a['id']: a['earned_date'] for a in
+              app.test_client().get('/api/statistics/achievements', headers=headers).get_json()['achievements']}
+    assert earned == {'first_quiz': '2025-02-01T00:00:00', 'perfect_score': '2025-03-01T00:00:00',
+                      'level_up': '2025-03-01T00:00:00'}
+
+
+@pytest.mark.parametrize('on_conflict', [True, False], ids=['on-conflict', 'savepoint'])
+def test_a_badge_awarded_concurrently_is_not_reported_twice(badge_app, monkeypatch, on_conflict):
+    app, _, (user_id, _) = badge_app
+    if not on_conflict:
+        # A dialect without ON CONFLICT: one SAVEPOINT per award
+        monkeypatch.setattr(achievements, 'CONFLICT_INSERTS', {})
+    with app.app_context():
+        db.session.add(UserAchievement(user_id=user_id, achievement='first_quiz', earned_at=datetime(2026, 1, 1)))
+        db.session.commit()
+        # Another submission committed its award after this one read the earned badges
+        monkeypatch.setattr(achievements, 'earned_keys', lambda session, user_id: set())
+        stats = UserStatistics(user_id=user_id, total_quizzes_taken=1, average_score=100.0, experience_points=10)
+
+        awarded = record_events(db.session, user_id, [QUIZ_SUBMITTED], stats, [(datetime(2026, 1, 2), 100.0)])
+        assert {a['id'] for a in awarded} == {'perfect_score', 'high_achiever'}
+        db.session.commit()
+        assert UserAchievement.query.filter_by(user_id=user_id).count() == 3
+        assert UserAchievement.query.filter_by(achievement='first_quiz').one().earned_at == datetime(2026, 1, 1)
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+from conftest import add_user, asgi_call, make_app
+from src.asgi import create_asgi_app
+from src.models.user import db
+from src.models.statistics import UserStatistics
+from src.services.admission import AdmissionController, AsyncConcurrencyGate, ConcurrencyGate, Rejected, TokenBucket, GENERATE
+
+
+def test_token_bucket_spends_its_burst_then_refills_at_its_rate():
+    bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+    assert (bucket.take(0.0), bucket.take(0.0)) == (0, 0)
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.25) == pytest.approx(0.25)
+    assert bucket.take(0.5) == 0
+    # Never more than the burst, however long the user was idle
+    bucket.refill(100.0)
+    assert bucket.tokens == 2
+
+
+def test_concurrency_gate_queues_then_times_out_or_rejects():
+    gate = ConcurrencyGate(limit=1, queue=1, queue_timeout=0.05)
+    assert gate.acquire() == (None, 0.0)
+    reason, waited = gate.acquire()
+    assert reason == 'queue_timeout' and waited >= 0.05
+
+    outcomes = []
+    waiter = threading.Thread(target=lambda: outcomes.append(gate.acquire()))
+    gate.queue_timeout = 5
+    waiter.start()
+    while gate.waiting == 0:
+        pass
+    # The queue holds one request: the next one is refused at once
+    assert gate.acquire() == ('queue_full', 0.0)
+    gate.release()
+    waiter.join()
+    assert outcomes[0][0] is None and gate.active == 1
+
+
+def test_async_gate_hands_slots_over_without_a_thread():
+    async def scenario():
+        gate = AsyncConcurrencyGate(limit=1, queue=2, queue_timeout=0.05)
+        assert await gate.acquire() == (None, 0.0)
+        assert (await gate.acquire())[0] == 'queue_timeout'
+
+        gate.queue_timeout = 5
+        first, second = asyncio.ensure_future(gate.acquire()), asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        assert (gate.waiting, (await gate.acquire())[0]) == (2, 'queue_full')
+        # A cancelled waiter leaves the queue; the released slot goes to the next one
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.release()
+        assert (await second)[0] is None
+        return gate
+    gate = asyncio.run(scenario())
+    assert (gate.active, gate.waiting) == (1, 0)
+
+
+def test_admission_rejects_per_user_and_counts_outcomes():
+    controller = AdmissionController({'export': {'rate': 0.001, 'burst': 1, 'user_concurrency': 1, 'retry_after': 5}})
+    ticket = controller.admit(1, 'export')
+    with pytest.raises(Rejected) as busy:
+        controller.admit(1, 'export')
+    assert (busy.value.reason, busy.value.retry_after) == ('user_concurrency', 5)
+    ticket.release()
+    with pytest.raises(Rejected) as limited:
+        controller.admit(1, 'export')
+    assert limited.value.reason == 'rate' and limited.value.retry_after > 900
+    controller.admit(2, 'export').release()
+    assert controller.stats()['classes']['export'] == {
+        'admitted': 2, 'rejected': {'user_concurrency': 1, 'rate': 1}
+    }
+
+
+@pytest.fixture
+def limited_app(tmp_path, headers_for):
+    app = make_app(tmp_path, ADMISSION_ENABLED=True, PROFILING_TOKEN='admin-secret',
+                   ADMISSION_POLICIES={'statistics': {'rate': 0.5, 'burst': 1}})
+    with app.app_context():
+        user = add_user('busy')
+        db.session.add(UserStatistics(user_id=user.id))
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def test_rate_limited_route_answers_429_with_retry_after(limited_app):
+    app, headers = limited_app
+    client = app.test_client()
+    assert client.get('/api/statistics/dashboard', headers=headers).status_code == 200
+    limited = client.get('/api/statistics/dashboard', headers=headers)
+    assert (limited.status_code, limited.headers['Retry-After']) == (429, '2')
+    assert limited.get_json() == {'error': 'Too many requests', 'reason': 'rate', 'retry_after': 2}
+
+
+def test_admission_stats_are_for_admins(limited_app):
+    app, headers = limited_app
+    client = app.test_client()
+    assert client.get('/api/system/admission', headers=headers).status_code == 403
+    assert client.get('/api/system/admission', headers=dict(headers, **{'X-Profile': 'wrong'})).status_code == 403
+    stats = client.get('/api/system/admission', headers=dict(headers, **{'X-Profile': 'admin-secret'}))
+    assert stats.status_code == 200 and 'in_flight' in stats.get_json()['classes'][GENERATE]
+
+
+def generate_concurrently(tmp_path, headers_for, fake_llm, **policy):
+    # One thread: a queued generation holding it would starve the running one's save phase
+    app = make_app(tmp_path, factory=create_asgi_app, ADMISSION_ENABLED=True, ASGI_THREADS=1,
+                   ASGI_GENERATE_CONCURRENCY=1,
+                   ADMISSION_POLICIES={GENERATE: dict({'burst': 10, 'user_concurrency': 5}, **policy)})
+    with app.flask_app.app_context():
+        headers = headers_for(app.flask_app, add_user('writer'))
+        db.session.commit()
+    fake_llm.delay = 0.2
+
+    async def both():
+        return await asyncio.gather(*(
+            asgi_call(app, 'POST', '/api/lessons/generate', headers=headers, body={'topic': t, 'level': 'beginner'})
+            for t in ('Travel', 'Food')
+        ))
+    try:
+        return [r.status for r in asyncio.run(both())], app.admission.stats()['classes'][GENERATE]
+    finally:
+        app.executor.shutdown()
+
+
+def test_asgi_generations_queue_on_the_loop(tmp_path, headers_for, fake_llm):
+    statuses, stats = generate_concurrently(tmp_path, headers_for, fake_llm, queue=1, queue_timeout=5)
+    assert statuses == [201, 201]
+    assert stats['admitted'] == 2 and stats['queue_wait']['max_ms'] >= 100
+    assert (stats['in_flight'], stats['queued']) == (0, 0)
+
+
+def test_asgi_generation_beyond_the_queue_gets_429(tmp_path, headers_for, fake_llm):
+    statuses, stats = generate_concurrently(tmp_path, headers_for, fake_llm, queue=0)
+    assert sorted(statuses) == [201, 429]
+    assert stats['rejected'] == {'queue_full': 1} and len(fake_llm.calls) == 1
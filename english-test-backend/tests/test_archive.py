@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.archive import ArchivedAttempt, AttemptRollup
+from src.services.archive import archive_attempts
+
+
+@pytest.fixture
+def archive_app(tmp_path, headers_for):
+    app = make_app(tmp_path, ATTEMPT_ARCHIVE_AFTER_DAYS=90)
+    with app.app_context():
+        user = add_user('veteran')
+        lesson = Lesson(title='Articles', description='a/an', content='{}', level='beginner', topic='Grammar')
+        db.session.add(lesson)
+        db.session.flush()
+        quiz = Quiz(title='Articles', level='beginner', lesson_id=lesson.id)
+        quiz.set_questions([{'id': n, 'question': f'A or an ({n})', 'options': ['a', 'an'], 'correct_answer': 'an'}
+                            for n in (1, 2)])
+        db.session.add(quiz)
+        db.session.flush()
+        now = datetime.utcnow()
+        # Two years of history, one attempt a month, then a recent week
+        for days_ago in list(range(720, 100, -30)) + [5, 3, 1]:
+            answers = {'1': 'an', '2': 'an' if days_ago % 60 else 'a'}
+            score, _ = quiz.calculate_score(answers)
+            db.session.add(QuizAttempt(user_id=user.id, quiz_id=quiz.id, answers=json.dumps(answers), score=score,
+                                       time_taken_minutes=2, is_passed=score >= 70,
+                                       completed_at=now - timedelta(days=days_ago)))
+        db.session.commit()
+        headers, quiz_id = headers_for(app, user), quiz.id
+    return app, headers, quiz_id
+
+
+def snapshot(client, headers, quiz_id):
+    dashboard = client.get('/api/statistics/dashboard?include=topic_performance,average_score,recent_attempts',
+                           headers=headers).get_json()
+    statistics = dashboard['user_statistics']
+    pages = [client.get(f'/api/my-attempts?page={page}&per_page=7', headers=headers).get_json()
+             for page in (1, 2, 3, 4)]
+    quiz = client.get(f'/api/quizzes/{quiz_id}', headers=headers)
+    quizzes = client.get('/api/quizzes?view=summary', headers=headers)
+    return {
+        'quiz': (quiz.headers['ETag'], quiz.get_json()['attempt_count']),
+        'quizzes': (quizzes.headers['ETag'], [q['attempt_count'] for q in quizzes.get_json()['quizzes']]),
+        'statistics': {key: statistics[key] for key in
+                       ('total_quizzes_taken', 'experience_points', 'average_score', 'topic_performance')},
+        'recent': [a['id'] for a in dashboard['recent_attempts']],
+        'progress': client.get('/api/statistics/progress?period=all', headers=headers).get_json(),
+        'month': client.get('/api/statistics/progress?period=month', headers=headers).get_json(),
+        'pages': [([a['id'] for a in page['attempts']], page['total'], page['pages']) for page in pages],
+        'quiz_attempts': client.get(f'/api/quizzes/{quiz_id}/attempts', headers=headers).get_json(),
+        'export': client.get('/api/statistics/export', headers=headers).get_json()['quiz_attempts'],
+    }
+
+
+def test_archiving_keeps_statistics_and_listings_unchanged(archive_app):
+    app, headers, quiz_id = archive_app
+    client = app.test_client()
+    submitted = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an', '2': 'an'}}, headers=headers)
+    assert submitted.status_code == 200
+    before = snapshot(client, headers, quiz_id)
+    assert before['statistics']['total_quizzes_taken'] == 25
+    assert before['quiz'][1] == 25
+
+    with app.app_context():
+        moved = archive_attempts(db.engine, datetime.utcnow() - timedelta(days=90), batch_size=8)
+        assert moved == 21
+        assert QuizAttempt.query.count() == 4
+        assert sum(r.attempts for r in AttemptRollup.query) == 21
+        assert ArchivedAttempt.query.first().get_answers()['1'] == 'an'
+
+    after = snapshot(client, headers, quiz_id)
+    for key, value in before.items():
+        assert after[key] == value, key
+
+    # Later runs add to the existing rollups
+    with app.app_context():
+        oldest = ArchivedAttempt.query.order_by(ArchivedAttempt.completed_at).first()
+        db.session.add(QuizAttempt(user_id=oldest.user_id, quiz_id=quiz_id, answers='{"1": "an", "2": "an"}',
+                                   score=20.0, is_passed=False, completed_at=oldest.completed_at + timedelta(seconds=1)))
+        # The newest attempt (highest id) always stays hot
+        db.session.add(QuizAttempt(user_id=oldest.user_id, quiz_id=quiz_id, answers='{}', score=0.0, is_passed=False))
+        db.session.commit()
+        rollups = AttemptRollup.query.count()
+        assert archive_attempts(db.engine, datetime.utcnow() - timedelta(days=90)) == 1
+        rollup = AttemptRollup.query.filter_by(month=oldest.completed_at.strftime('%Y-%m')).one()
+        assert (AttemptRollup.query.count(), rollup.attempts, rollup.correct_answers, rollup.best_accuracy) == \
+            (rollups, 2, 1 + 2, 100.0)
+        assert rollup.first_completed_at == oldest.completed_at
+
+    # The totals a new submission recomputes still include the archive
+    again = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an', '2': 'an'}}, headers=headers)
+    assert again.get_json()['statistics']['total_quizzes_taken'] == 28
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import add_user, asgi_request, make_app
+from src.asgi import build_environ, create_asgi_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.routes.lesson import lesson_generation
+
+
+@pytest.fixture
+def asgi_app(tmp_path, headers_for):
+    app = make_app(tmp_path, factory=create_asgi_app)
+    with app.flask_app.app_context():
+        user = add_user('async')
+        lesson = Lesson(title='Articles', topic='Grammar', level='beginner', content='{}')
+        db.session.add(lesson)
+        db.session.commit()
+        headers, lesson_id = headers_for(app.flask_app, user), lesson.id
+    yield app, headers, lesson_id
+    app.executor.shutdown()
+
+
+def test_build_environ_maps_scope_and_headers():
+    scope = {
+        'method': 'POST', 'root_path': '/app', 'path': '/app/api/lessons', 'query_string': b'page=2',
+        'http_version': '1.1', 'server': ('example.com', 8443), 'scheme': 'https', 'client': ('10.0.0.1', 1234),
+        'headers': [(b'content-type', b'application/json'), (b'accept', b'text/html'), (b'accept', b'*/*'),
+                    (b'transfer-encoding', b'chunked')],
+    }
+    environ = build_environ(scope, b'{"a": 1}')
+    assert (environ['SCRIPT_NAME'], environ['PATH_INFO'], environ['QUERY_STRING']) == ('/app', '/api/lessons', 'page=2')
+    assert (environ['SERVER_NAME'], environ['SERVER_PORT'], environ['wsgi.url_scheme']) == ('example.com', '8443', 'https')
+    assert environ['CONTENT_TYPE'] == 'application/json' and environ['HTTP_ACCEPT'] == 'text/html,*/*'
+    # The body is buffered: its length replaces chunked transfer encoding
+    assert environ['CONTENT_LENGTH'] == '8' and 'HTTP_TRANSFER_ENCODING' not in environ
+    assert environ['wsgi.input'].read() == b'{"a": 1}' and environ['REMOTE_ADDR'] == '10.0.0.1'
+
+
+def test_wsgi_responses_are_streamed_chunk_by_chunk(asgi_app):
+    app, headers, _ = asgi_app
+    app.flask_app.add_url_rule('/chunks', 'chunks', lambda: app.flask_app.response_class(iter([b'one', b'two'])))
+
+    response = asgi_request(app, 'GET', '/chunks')
+    assert (response.status, response.chunks) == (200, [b'one', b'two'])
+    assert asgi_request(app, 'GET', '/api/lessons', headers=headers).json()['total'] == 1
+
+
+def test_generation_awaits_the_llm_between_thread_phases(asgi_app, fake_llm):
+    app, headers, lesson_id = asgi_app
+
+    lesson = asgi_request(app, 'POST', '/api/lessons/generate', headers=headers,
+                          body={'topic': 'Travel', 'level': 'beginner'})
+    assert lesson.status == 201
+    assert lesson.json()['lesson']['content']['introduction'] == 'Generated'
+    quiz = asgi_request(app, 'POST', '/api/quizzes/generate', headers=headers,
+                        body={'topic': 'Articles', 'level': 'beginner', 'lesson_id': lesson_id})
+    assert quiz.status == 201 and quiz.json()['quiz']['lesson_id'] == lesson_id
+    assert len(fake_llm.calls) == 2
+    assert fake_llm.calls[0]['messages'][1]['content'].strip().startswith('Create an English lesson')
+    with app.flask_app.app_context():
+        assert Lesson.query.filter_by(topic='Travel').count() == 1
+
+
+def test_generation_failures_are_rendered_with_after_request_hooks(asgi_app, fake_llm, monkeypatch):
+    app, headers, lesson_id = asgi_app
+    cors = dict(headers, Origin='http://localhost:3000')
+
+    assert asgi_request(app, 'POST', '/api/lessons/generate', body={'topic': 'Travel', 'level': 'beginner'}).status == 401
+    invalid = asgi_request(app, 'POST', '/api/lessons/generate', headers=cors, body={'topic': 'Travel', 'level': 'expert'})
+    assert invalid.status == 400 and invalid.headers['access-control-allow-origin'] == 'http://localhost:3000'
+    assert fake_llm.calls == []
+
+    # Not JSON: the quiz phase raises after the LLM call
+    fake_llm.content = 'Sorry, I cannot help with that.'
+    failed = asgi_request(app, 'POST', '/api/quizzes/generate', headers=cors,
+                          body={'topic': 'Articles', 'level': 'beginner', 'lesson_id': lesson_id})
+    assert failed.status == 500 and failed.json()['error'] == 'Failed to generate quiz'
+    assert failed.headers['access-control-allow-origin'] == 'http://localhost:3000'
+
+    def broken_save(current_user, params, result):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(lesson_generation, 'save', broken_save)
+    failed = asgi_request(app, 'POST', '/api/lessons/generate', headers=headers, body={'topic': 'Travel', 'level': 'beginner'})
+    assert (failed.status, failed.json()['details']) == (500, 'disk full')
@@ -0,0 +1,114 @@
+import pytest
+
+from conftest import add_user, bearer, make_app, seed_dataset
+from query_budget import query_budget
+from src.models.user import User, db
+from src.models.statistics import UserStatistics
+from src.services.admission import get_admission
+
+DASHBOARD = ['/api/statistics/dashboard', '/api/statistics/achievements', '/api/statistics/leaderboard',
+             '/api/auth/profile', '/api/my-attempts']
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    """The seeded dataset with admission control on, as in production"""
+    app = make_app(tmp_path_factory.mktemp('batch'), TESTING=True, ADMISSION_ENABLED=True)
+    with app.app_context():
+        seed_dataset()
+    return app
+
+
+def user_headers(app, username):
+    with app.app_context():
+        return bearer(app, User.query.filter_by(username=username).one())
+
+
+@pytest.fixture(scope='module')
+def auth_headers(app):
+    return user_headers(app, 'user0')
+
+
+@pytest.fixture(scope='module')
+def engine(app):
+    with app.app_context():
+        return db.engine
+
+
+def test_batch_matches_individual_requests(client, auth_headers):
+    response = client.post('/api/batch', json={'requests': DASHBOARD}, headers=auth_headers)
+    assert response.status_code == 200
+    results = response.get_json()['responses']
+    assert [r['id'] for r in results] == list(range(len(DASHBOARD)))
+    for path, result in zip(DASHBOARD, results):
+        single = client.get(path, headers=auth_headers)
+        assert result['status'] == single.status_code == 200
+        if path != '/api/statistics/dashboard':  # Dashboard timings differ between calls
+            assert result['body'] == single.get_json(), path
+
+
+def test_batch_authenticates_once(client, auth_headers, engine):
+    paths = ['/api/auth/profile', '/api/lessons/topics', '/api/catalog/facets']
+    with query_budget(engine, 1 + 1 + 1, 'POST /api/batch'):
+        # One user lookup for the batch, then one query per sub-request
+        response = client.post('/api/batch', json={'requests': paths}, headers=auth_headers)
+    assert all(r['status'] == 200 for r in response.get_json()['responses'])
+
+
+def test_parallel_batch_and_per_item_errors(client, auth_headers):
+    response = client.post('/api/batch', headers=auth_headers, json={'parallel': True, 'requests': [
+        {'id': 'profile', 'path': '/api/auth/profile'},
+        {'id': 'lesson', 'path': '/api/lessons/1'},
+        {'id': 'missing', 'path': '/api/nowhere'},
+        {'id': 'write', 'method': 'DELETE', 'path': '/api/lessons/1'},
+        {'id': 'nested', 'path': '/api/batch'},
+    ]})
+    results = {r['id']: r for r in response.get_json()['responses']}
+    assert results['profile']['body']['user']['username'] == 'user0'
+    assert results['lesson']['status'] == 200 and results['lesson']['headers']['ETag']
+    assert results['missing']['status'] == 404
+    assert results['write']['status'] == 405
+    assert results['nested']['status'] == 400
+
+    # The ETag of a sub-response works as a validator in the next batch
+    etag = results['lesson']['headers']['ETag']
+    again = client.post('/api/batch', headers=auth_headers, json={'requests': [
+        {'path': '/api/lessons/1', 'headers': {'If-None-Match': etag}}]})
+    assert again.get_json()['responses'][0]['status'] == 304
+
+
+def test_batch_validation(app, client):
+    # Another user: each user's batches share one token bucket
+    auth_headers = user_headers(app, 'user2')
+    assert client.post('/api/batch', json={'requests': []}, headers=auth_headers).status_code == 400
+    assert client.post('/api/batch', json={'requests': ['/api/auth/profile'] * 21}, headers=auth_headers).status_code == 400
+    assert client.post('/api/batch', json={'requests': DASHBOARD}).status_code == 401
+
+
+def test_dashboard_batches_are_admitted_as_a_whole(app, client):
+    headers = user_headers(app, 'user1')
+    with app.app_context():
+        before = get_admission().stats()['classes']
+    # More statistics sub-requests than the statistics burst and per-user concurrency allow
+    for parallel in (False, False, False, True):
+        response = client.post('/api/batch', json={'requests': DASHBOARD, 'parallel': parallel}, headers=headers)
+        assert [r['status'] for r in response.get_json()['responses']] == [200] * len(DASHBOARD)
+    with app.app_context():
+        after = get_admission().stats()['classes']
+    assert after['batch']['admitted'] - before['batch']['admitted'] == 4
+    assert after['statistics']['admitted'] == before['statistics']['admitted']
+
+
+def test_batched_views_cannot_write(app, client):
+    with app.app_context():
+        headers = bearer(app, add_user('newcomer'))
+        db.session.commit()
+    response = client.post('/api/batch', json={'requests': ['/api/statistics/dashboard']}, headers=headers)
+    result = response.get_json()['responses'][0]
+    assert result['status'] == 200 and result['body']['user_statistics']['total_quizzes_taken'] == 0
+    with app.app_context():
+        # The dashboard's missing statistics row was not created by the batch
+        assert UserStatistics.query.join(User).filter(User.username == 'newcomer').count() == 0
+    assert client.get('/api/statistics/dashboard', headers=headers).status_code == 200
+    with app.app_context():
+        assert UserStatistics.query.join(User).filter(User.username == 'newcomer').count() == 1
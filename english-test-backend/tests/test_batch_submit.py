@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import User, db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.statistics import UserStatistics
+
+COUNTERS = ('total_quizzes_taken', 'total_quizzes_passed', 'experience_points', 'average_score', 'grammar_score', 'current_streak_days')
+
+
+@pytest.fixture
+def batch_app(tmp_path, headers_for):
+    # Fixed dates in the tests: accounts old enough, offline window wide enough
+    app = make_app(tmp_path, OFFLINE_MAX_DAYS=3650)
+    with app.app_context():
+        headers = [headers_for(app, add_user(name, created_at=datetime(2025, 1, 1))) for name in ('online', 'offline')]
+        lesson = Lesson(title='Tenses', topic='Grammar', level='beginner', content='{}')
+        db.session.add(lesson)
+        for title in ('Past', 'Present'):
+            quiz = Quiz(lesson=lesson, title=title, level='beginner', passing_score=15)
+            quiz.set_questions([{'id': 1, 'question': '?', 'options': ['a', 'b'], 'correct_answer': 'a'},
+                                {'id': 2, 'question': '?', 'options': ['a', 'b'], 'correct_answer': 'b'}])
+            db.session.add(quiz)
+        db.session.commit()
+    return app, headers
+
+
+def counters(app, username):
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        stats = UserStatistics.query.filter_by(user_id=user.id).first()
+        return {name: getattr(stats, name) for name in COUNTERS}
+
+
+def test_batch_matches_one_by_one_submission(batch_app):
+    app, (online, offline) = batch_app
+    client = app.test_client()
+    attempts = [
+        {'quiz_id': 1, 'answers': {'1': 'a', '2': 'b'}, 'timings': {'1': 4}},
+        {'quiz_id': 2, 'answers': {'1': 'b', '2': 'b'}, 'time_taken_minutes': 2.5},
+        {'quiz_id': 1, 'answers': {'1': 'a'}},
+    ]
+    for attempt in attempts:
+        body = {key: value for key, value in attempt.items() if key != 'quiz_id'}
+        assert client.post(f"/api/quizzes/{attempt['quiz_id']}/submit", json=body, headers=online).status_code == 200
+
+    response = client.post('/api/quizzes/submit-batch', json={'attempts': attempts}, headers=offline)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['accepted'] == 3 and body['rejected'] == 0
+    assert [(r['score'], r['correct_answers'], r['is_passed']) for r in body['results']] == [
+        (25, 2, True), (10, 1, False), (10, 1, False)]
+    assert counters(app, 'offline') == counters(app, 'online')
+    assert counters(app, 'online')['total_quizzes_passed'] == 1
+    assert body['statistics']['experience_points'] == 45
+
+
+def test_invalid_attempts_are_reported_individually(batch_app):
+    app, (_, offline) = batch_app
+    client = app.test_client()
+    response = client.post('/api/quizzes/submit-batch', headers=offline, json={'attempts': [
+        {'quiz_id': 999, 'answers': {'1': 'a'}},
+        {'quiz_id': 1, 'answers': {}},
+        {'quiz_id': 1, 'answers': {'1': 'a'}, 'completed_at': 'yesterday'},
+        'not an attempt',
+        {'quiz_id': 2, 'answers': {'2': 'b'}, 'completed_at': '2026-01-01T08:00:00Z'},
+    ]})
+    body = response.get_json()
+    assert [r.get('error') for r in body['results']] == [
+        'Quiz not found', 'Answers are required', 'Invalid completed_at', 'Quiz not found', None]
+    assert body['accepted'] == 1
+    with app.app_context():
+        assert QuizAttempt.query.one().completed_at.isoformat() == '2026-01-01T08:00:00'
+
+    assert client.post('/api/quizzes/submit-batch', json={'attempts': []}, headers=offline).status_code == 400
+
+
+def test_offline_days_extend_the_streak(batch_app):
+    app, (_, offline) = batch_app
+    client = app.test_client()
+    days = ['2026-03-01T09:00:00', '2026-03-02T21:00:00', '2026-03-02T22:00:00', '2026-03-03T07:30:00']
+    response = client.post('/api/quizzes/submit-batch', headers=offline, json={
+        'attempts': [{'quiz_id': 1, 'answers': {'1': 'a'}, 'completed_at': day} for day in reversed(days)]})
+    assert response.get_json()['statistics']['current_streak_days'] == 3
+    with app.app_context():
+        stats = UserStatistics.query.filter_by(user_id=2).first()
+        assert stats.longest_streak_days == 3
+        assert stats.last_activity_date.isoformat() == '2026-03-03'
+
+
+def test_completed_at_stays_within_the_offline_window(tmp_path, headers_for):
+    app = make_app(tmp_path, OFFLINE_MAX_DAYS=7)
+    now = datetime.utcnow()
+    with app.app_context():
+        quiz = Quiz(title='Past', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': '?', 'options': ['a', 'b'], 'correct_answer': 'a'}])
+        db.session.add(quiz)
+        veteran = headers_for(app, add_user('veteran', created_at=now - timedelta(days=365)))
+        newcomer = headers_for(app, add_user('newcomer', created_at=now - timedelta(days=2)))
+        db.session.commit()
+        quiz_id = quiz.id
+    client = app.test_client()
+
+    def submit(headers, *days_ago):
+        return client.post('/api/quizzes/submit-batch', headers=headers, json={'attempts': [
+            {'quiz_id': quiz_id, 'answers': {'1': 'a'}, 'completed_at': (now - timedelta(days=d)).isoformat()}
+            for d in days_ago
+        ]}).get_json()
+
+    body = submit(veteran, 6, 8, -1)
+    assert [r.get('error') for r in body['results']] == [None, 'completed_at is outside the offline window', None]
+    # Before the account existed
+    body = submit(newcomer, 1, 3)
+    assert [r.get('error') for r in body['results']] == [None, 'completed_at is outside the offline window']
+    with app.app_context():
+        # A future time is clamped to the submission
+        assert max(a.completed_at for a in QuizAttempt.query) <= datetime.utcnow()
+        assert QuizAttempt.query.count() == 3
@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+from src.services.catalog import catalog_facets, rebuild_catalog_facets
+
+
+@pytest.fixture
+def catalog_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        grammar = Lesson(title='Past Simple', topic='Grammar', level='beginner', content='{}')
+        travel = Lesson(title='Airport', topic='Travel', level='intermediate', content='{}')
+        db.session.add_all([grammar, travel, Lesson(title='Modals', topic='Grammar', level='advanced', content='{}')])
+        db.session.flush()
+        db.session.add_all([
+            Quiz(title='Past quiz', lesson_id=grammar.id, level='beginner', questions='[]'),
+            Quiz(title='Past blanks', lesson_id=grammar.id, level='beginner', quiz_type='fill_blank', questions='[]'),
+            Quiz(title='Loose quiz', level='advanced', questions='[]'),
+        ])
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def recounted(app):
+    """Facets as kept up to date by the write events, and as a full recount computes them"""
+    with app.app_context():
+        live = catalog_facets(db.session.connection())
+        with db.engine.begin() as conn:
+            rebuild_catalog_facets(conn)
+            rebuilt = catalog_facets(conn)
+    return live, rebuilt
+
+
+def test_facet_counts(catalog_app):
+    app, headers = catalog_app
+    client = app.test_client()
+
+    body = client.get('/api/catalog/facets', headers=headers).get_json()
+    assert body['lessons']['total'] == 3
+    assert body['lessons']['by_topic'] == {'Grammar': 2, 'Travel': 1}
+    assert body['quizzes']['by_topic'] == {'': 1, 'Grammar': 2}
+    assert body['quizzes']['by_quiz_type'] == {'fill_blank': 1, 'multiple_choice': 2}
+    assert {'topic': 'Grammar', 'level': 'beginner', 'quiz_type': 'fill_blank', 'count': 1} in body['quizzes']['facets']
+
+    topics = client.get('/api/lessons/topics', headers=headers).get_json()
+    assert topics['topics'] == ['Grammar', 'Travel']
+    assert topics['counts'] == {'Grammar': 2, 'Travel': 1}
+
+
+def test_writes_keep_facets_in_step(catalog_app):
+    app, headers = catalog_app
+    client = app.test_client()
+    with app.app_context():
+        grammar_id = Lesson.query.filter_by(title='Past Simple').first().id
+        travel_id = Lesson.query.filter_by(title='Airport').first().id
+        loose_id = Quiz.query.filter_by(title='Loose quiz').first().id
+
+    # Moving a lesson to another topic moves its quizzes too
+    assert client.put(f'/api/lessons/{grammar_id}', headers=headers, json={'topic': 'Tenses'}).status_code == 200
+    assert client.delete(f'/api/lessons/{travel_id}', headers=headers).status_code == 200
+    assert client.delete(f'/api/quizzes/{loose_id}', headers=headers).status_code == 200
+    with app.app_context():
+        quiz = Quiz.query.filter_by(title='Past blanks').first()
+        quiz.level = 'intermediate'
+        db.session.add(Quiz(title='Travel quiz', lesson_id=travel_id, level='beginner', questions='[]'))
+        db.session.commit()
+
+    body = client.get('/api/catalog/facets', headers=headers).get_json()
+    assert body['lessons']['by_topic'] == {'Grammar': 1, 'Tenses': 1}
+    assert body['quizzes']['by_topic'] == {'Tenses': 2, 'Travel': 1}
+    assert body['quizzes']['by_level'] == {'beginner': 2, 'intermediate': 1}
+
+    live, rebuilt = recounted(app)
+    assert live == rebuilt
@@ -0,0 +1,107 @@
+import gzip
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+from src.services.compression import (IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, available_encodings,
+                                      build_static_manifest)
+
+INDEX = b'<html><body>' + b'<p>English practice</p>' * 200 + b'</body></html>'
+
+
+def compressed_app(directory, headers_for, **config):
+    directory.mkdir(exist_ok=True)
+    # The response cache's own gzip variant stays out of the way
+    app = make_app(directory, RESPONSE_CACHE_GZIP_MIN_BYTES=10 ** 9, **config)
+    with app.app_context():
+        user = add_user('reader')
+        quiz = Quiz(title='Articles', level='beginner', description='Articles ' * 200)
+        quiz.set_questions([])
+        db.session.add_all([quiz, Lesson(title='Articles', topic='Grammar', level='beginner', content='{}')])
+        db.session.commit()
+        return app, headers_for(app, user)
+
+
+def test_large_json_is_gzipped_and_its_etag_weakened(tmp_path, headers_for):
+    app, headers = compressed_app(tmp_path, headers_for)
+    client = app.test_client()
+    plain = client.get('/api/quizzes/1', headers=headers)
+    assert plain.content_encoding is None and not plain.headers['ETag'].startswith('W/')
+
+    zipped = client.get('/api/quizzes/1', headers=dict(headers, **{'Accept-Encoding': 'br;q=1, gzip;q=0.5'}))
+    assert (zipped.content_encoding, zipped.headers['Vary']) == ('gzip' if 'br' not in available_encodings() else 'br',
+                                                                 'Accept-Encoding')
+    assert zipped.headers['ETag'] == 'W/' + plain.headers['ETag']
+    if zipped.content_encoding == 'gzip':
+        assert gzip.decompress(zipped.data) == plain.data
+    # The weak validator still revalidates
+    revalidated = client.get('/api/quizzes/1', headers=dict(headers, **{'Accept-Encoding': 'gzip',
+                                                                        'If-None-Match': zipped.headers['ETag']}))
+    assert revalidated.status_code == 304
+    refused = client.get('/api/quizzes/1', headers=dict(headers, **{'Accept-Encoding': 'gzip;q=0'}))
+    assert refused.content_encoding is None
+
+
+def test_brotli_is_preferred_when_installed(tmp_path, headers_for):
+    brotli = pytest.importorskip('brotli')
+    app, headers = compressed_app(tmp_path, headers_for)
+    response = app.test_client().get('/api/quizzes/1', headers=dict(headers, **{'Accept-Encoding': 'gzip, br'}))
+    assert response.content_encoding == 'br' and b'Articles' in brotli.decompress(response.data)
+
+
+def test_bodies_below_the_minimum_are_sent_as_is(tmp_path, headers_for):
+    app, headers = compressed_app(tmp_path / 'high', headers_for, COMPRESSION_MIN_BYTES=10 ** 6)
+    gzip_only = dict(headers, **{'Accept-Encoding': 'gzip'})
+    assert app.test_client().get('/api/quizzes/1', headers=gzip_only).content_encoding is None
+
+    app, headers = compressed_app(tmp_path / 'low', headers_for, COMPRESSION_MIN_BYTES=1)
+    gzip_only = dict(headers, **{'Accept-Encoding': 'gzip'})
+    assert app.test_client().get('/api/lessons', headers=gzip_only).content_encoding == 'gzip'
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_static_manifest_precompresses_and_classifies_assets(tmp_path):
+    static = tmp_path / 'static'
+    write(static / 'index.html', INDEX)
+    write(static / '_next/static/chunks/main-0123abcd.js', b'console.log("hello");' * 100)
+    # The build's own brotli variant is used as is; the tiny CSS and the image are not compressed
+    write(static / '_next/static/chunks/main-0123abcd.js.br', b'prebuilt brotli')
+    write(static / 'tiny.css', b'body{}')
+    write(static / 'logo.png', b'\x89PNG' + b'\x00' * 4000)
+
+    manifest = build_static_manifest(str(static), min_bytes=1024)
+    assert sorted(manifest) == ['_next/static/chunks/main-0123abcd.js', 'index.html', 'logo.png', 'tiny.css']
+    chunk, index = manifest['_next/static/chunks/main-0123abcd.js'], manifest['index.html']
+    assert chunk.cache_control == IMMUTABLE_CACHE_CONTROL and index.cache_control == REVALIDATE_CACHE_CONTROL
+    assert chunk.variants['br'][0] == b'prebuilt brotli' and 'gzip' in chunk.variants
+    assert gzip.decompress(index.variants['gzip'][0]) == INDEX
+    assert manifest['tiny.css'].variants == {} and manifest['logo.png'].variants == {}
+
+
+def test_static_assets_are_served_from_the_manifest(tmp_path):
+    app = make_app(tmp_path)
+    static = tmp_path / 'static'
+    write(static / 'index.html', INDEX)
+    write(static / 'app-89abcdef.js', b'console.log("hello");' * 100)
+    write(static / 'app-89abcdef.js.br', b'prebuilt brotli')
+    app.static_folder = str(static)
+    app.extensions['static_manifest'] = build_static_manifest(app.static_folder)
+    client = app.test_client()
+
+    br = client.get('/app-89abcdef.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert (br.content_encoding, br.data, br.headers['Cache-Control']) == ('br', b'prebuilt brotli', IMMUTABLE_CACHE_CONTROL)
+    zipped = client.get('/app-89abcdef.js', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.content_encoding == 'gzip' and zipped.headers['ETag'] != br.headers['ETag']
+    assert client.get('/app-89abcdef.js', headers={'Accept-Encoding': 'gzip',
+                                                   'If-None-Match': zipped.headers['ETag']}).status_code == 304
+    # Unknown paths fall back to the single-page app
+    page = client.get('/lessons/3')
+    assert (page.content_encoding, page.data, page.headers['Cache-Control']) == (None, INDEX, REVALIDATE_CACHE_CONTROL)
+    page.close()
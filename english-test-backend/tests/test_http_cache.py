@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.http import http_date
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+
+
+@pytest.fixture
+def catalog_app(tmp_path, headers_for):
+    app = make_app(tmp_path, CACHE_CONTROL_POLICIES={'answers': 'private, max-age=60'})
+    with app.app_context():
+        user = add_user('reader')
+        lesson = Lesson(title='Articles', topic='Grammar', level='beginner', content='{}')
+        quiz = Quiz(lesson=lesson, title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add_all([lesson, quiz])
+        db.session.commit()
+        headers, ids = headers_for(app, user), (lesson.id, quiz.id)
+    return app, headers, ids
+
+
+def test_if_none_match_answers_304(catalog_app):
+    app, headers, (lesson_id, quiz_id) = catalog_app
+    client = app.test_client()
+    for path in (f'/api/lessons/{lesson_id}', f'/api/quizzes/{quiz_id}'):
+        first = client.get(path, headers=headers)
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and not etag.startswith('W/')
+        again = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+        assert (again.status_code, again.data, again.headers['ETag']) == (304, b'', etag)
+        assert again.headers['Cache-Control'] == first.headers['Cache-Control']
+        assert client.get(path, headers=dict(headers, **{'If-None-Match': '"other"'})).status_code == 200
+
+
+def test_if_modified_since_answers_304_unless_if_none_match_differs(catalog_app):
+    app, headers, (lesson_id, _) = catalog_app
+    client = app.test_client()
+    path = f'/api/lessons/{lesson_id}'
+    last_modified = client.get(path, headers=headers).headers['Last-Modified']
+
+    assert client.get(path, headers=dict(headers, **{'If-Modified-Since': last_modified})).status_code == 304
+    earlier = http_date(datetime(2020, 1, 1))
+    assert client.get(path, headers=dict(headers, **{'If-Modified-Since': earlier})).status_code == 200
+    # If-None-Match takes precedence
+    both = dict(headers, **{'If-Modified-Since': last_modified, 'If-None-Match': '"other"'})
+    assert client.get(path, headers=both).status_code == 200
+
+
+def test_listing_etag_is_weak_and_changes_after_a_write(catalog_app):
+    app, headers, (lesson_id, _) = catalog_app
+    client = app.test_client()
+    listing = client.get('/api/lessons', headers=headers)
+    etag = listing.headers['ETag']
+    assert etag.startswith('W/')
+    assert client.get('/api/lessons', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+    # Another page of the same rows is another representation
+    assert client.get('/api/lessons?per_page=5', headers=headers).headers['ETag'] != etag
+
+    assert client.put(f'/api/lessons/{lesson_id}', json={'title': 'Articles again'}, headers=headers).status_code == 200
+    changed = client.get('/api/lessons', headers=dict(headers, **{'If-None-Match': etag}))
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_cache_control_policies(catalog_app):
+    app, headers, (lesson_id, quiz_id) = catalog_app
+    client = app.test_client()
+    policies = {path: client.get(path, headers=headers).headers['Cache-Control'] for path in (
+        f'/api/lessons/{lesson_id}', f'/api/quizzes/{quiz_id}', f'/api/quizzes/{quiz_id}/answers',
+        '/api/lessons', '/api/quizzes')}
+    assert policies == {
+        f'/api/lessons/{lesson_id}': 'public, no-cache',
+        f'/api/quizzes/{quiz_id}': 'public, no-cache',
+        # Overridden by CACHE_CONTROL_POLICIES
+        f'/api/quizzes/{quiz_id}/answers': 'private, max-age=60',
+        '/api/lessons': 'private, no-cache',
+        '/api/quizzes': 'private, no-cache',
+    }
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import pytest
+
+from conftest import add_user, asgi_call, asgi_request, make_app
+from src.asgi import create_asgi_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz, QuizAttempt
+from src.models.idempotency import IdempotencyKey
+from src.services.idempotency import IN_PROGRESS, OWNER, REPLAY, get_idempotency_store
+
+
+@pytest.fixture
+def idem_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('mobile')
+        quiz = Quiz(title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add(quiz)
+        db.session.commit()
+        headers, quiz_id = headers_for(app, user), quiz.id
+    return app, headers, quiz_id
+
+
+def test_retried_submit_replays_the_stored_response(idem_app):
+    app, headers, quiz_id = idem_app
+    client = app.test_client()
+    retry = dict(headers, **{'Idempotency-Key': 'attempt-1'})
+
+    first = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}}, headers=retry)
+    second = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}}, headers=retry)
+    assert first.status_code == second.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    with app.app_context():
+        assert QuizAttempt.query.count() == 1
+
+    # Same key, different body
+    other = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'a'}}, headers=retry)
+    assert other.status_code == 422
+    # No key: every request runs
+    client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'a'}}, headers=headers)
+    with app.app_context():
+        assert QuizAttempt.query.count() == 2
+
+
+def test_failed_requests_release_the_key(idem_app):
+    app, headers, _ = idem_app
+    client = app.test_client()
+    retry = dict(headers, **{'Idempotency-Key': 'missing-quiz'})
+
+    # The route answers 500 for an unknown quiz: the key is released and the retry runs again
+    assert client.post('/api/quizzes/999/submit', json={'answers': {}}, headers=retry).status_code == 500
+    retried = client.post('/api/quizzes/999/submit', json={'answers': {}}, headers=retry)
+    assert 'Idempotent-Replayed' not in retried.headers
+    with app.app_context():
+        store = get_idempotency_store()
+        outcome, row_id = store.claim(1, 'rate-limited', 'x')
+        assert outcome == OWNER
+        store.complete(row_id, app.make_response(('busy', 429)))
+        assert IdempotencyKey.query.filter(IdempotencyKey.key.in_(['missing-quiz', 'rate-limited'])).count() == 0
+
+
+def test_concurrent_retry_waits_for_the_original(idem_app):
+    app, _, _ = idem_app
+    with app.app_context():
+        store = get_idempotency_store()
+        outcome, row_id = store.claim(1, 'slow', 'x')
+        assert outcome == OWNER
+
+        results = []
+
+        def retry():
+            with app.app_context():
+                results.append(store.claim(1, 'slow', 'x'))
+
+        waiter = threading.Thread(target=retry)
+        waiter.start()
+        waiter.join(0.3)
+        assert waiter.is_alive() and results == []
+        store.complete(row_id, app.make_response(({'quiz': 1}, 201)))
+        waiter.join(5)
+        assert results[0][0] == REPLAY and results[0][1].response_status == 201
+
+        store.wait_seconds = 0
+        assert store.claim(1, 'stuck', 'x')[0] == OWNER
+        assert store.claim(1, 'stuck', 'x') == (IN_PROGRESS, None)
+
+
+def test_asgi_generation_honours_the_key(tmp_path, headers_for, fake_llm):
+    app = make_app(tmp_path, factory=create_asgi_app)
+    with app.flask_app.app_context():
+        user = add_user('mobile')
+        db.session.commit()
+        headers = dict(headers_for(app.flask_app, user), **{'Idempotency-Key': 'lesson-1'})
+    body = {'topic': 'Travel', 'level': 'beginner'}
+
+    async def retried_while_running():
+        return await asyncio.gather(*(asgi_call(app, 'POST', '/api/lessons/generate', headers=headers, body=body)
+                                      for _ in range(2)))
+    try:
+        first, second = asyncio.run(retried_while_running())
+        third = asgi_request(app, 'POST', '/api/lessons/generate', headers=headers, body=body)
+        assert first.status == second.status == third.status == 201
+        assert len(fake_llm.calls) == 1
+        assert first.json() == second.json() == third.json()
+        assert third.headers['idempotent-replayed'] == 'true'
+        mismatch = asgi_request(app, 'POST', '/api/lessons/generate', headers=headers, body=dict(body, level='advanced'))
+        assert mismatch.status == 422
+        with app.flask_app.app_context():
+            assert Lesson.query.count() == 1
+    finally:
+        app.executor.shutdown()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import add_user, asgi_call, make_app
+from src.asgi import create_asgi_app
+from src.models.user import db
+from src.models.quiz import Quiz
+from src.services.live import LEADERBOARD, LocalBroker, get_live_hub
+
+
+def parse_events(body):
+    """(event, data) pairs of an SSE body"""
+    events = []
+    for block in body.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def read_events(response):
+    """(event, data) pairs of a finished streamed response"""
+    return parse_events(b''.join(response.response))
+
+
+@pytest.fixture
+def live_app(tmp_path, headers_for):
+    app = make_app(tmp_path, LIVE_HEARTBEAT_SECONDS=0.05)
+    with app.app_context():
+        user = add_user('streamer')
+        quiz = Quiz(title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add(quiz)
+        db.session.commit()
+        headers, quiz_id = headers_for(app, user), quiz.id
+    return app, headers, quiz_id
+
+
+def test_broker_fans_out_and_drops_the_oldest_for_slow_readers():
+    broker = LocalBroker(max_queue=2)
+    board, own = broker.subscribe([LEADERBOARD]), broker.subscribe([LEADERBOARD, 'user:1'])
+    for n in range(3):
+        broker.publish(LEADERBOARD, {'n': n})
+    broker.publish('user:2', {'n': 'elsewhere'})
+    assert [board.get(0), board.get(0), board.get(0)] == [(LEADERBOARD, {'n': 1}), (LEADERBOARD, {'n': 2}), None]
+    assert own.dropped == 1
+    broker.unsubscribe(own)
+    assert broker.subscriber_count() == 1 and broker.subscriber_count('user:1') == 0
+
+
+def test_stream_pushes_snapshot_then_submission_deltas(live_app):
+    app, headers, quiz_id = live_app
+    client = app.test_client()
+
+    stream = client.get('/api/statistics/stream?max_seconds=0.3', headers=headers, buffered=False)
+    assert stream.mimetype == 'text/event-stream'
+    # Queued for the open stream while it is not being read
+    client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}}, headers=headers)
+
+    events = read_events(stream)
+    assert events[0] == (LEADERBOARD, {'leaderboard': []})
+    assert events[1] == ('statistics', {'statistics': None})
+    pushed = dict(events[2:])
+    assert pushed['statistics']['statistics']['experience_points'] == 10
+    assert pushed['statistics']['new_achievements'][0]['id'] == 'first_quiz'
+    assert [(e['rank'], e['username'], e['experience_points']) for e in pushed[LEADERBOARD]['leaderboard']] == \
+        [(1, 'streamer', 10)]
+    with app.app_context():
+        assert get_live_hub().broker.subscriber_count() == 0
+
+
+def test_stream_validation_and_batching(live_app):
+    app, headers, _ = live_app
+    client = app.test_client()
+    assert client.get('/api/statistics/stream?channels=chat', headers=headers).status_code == 400
+    assert client.get('/api/statistics/stream?channels=', headers=headers).status_code == 400
+
+    batched = client.post('/api/batch', json={'requests': ['/api/statistics/stream?max_seconds=0']}, headers=headers)
+    assert batched.get_json()['responses'][0]['status'] == 400
+
+
+def test_wsgi_streams_are_capped_below_the_thread_pool(tmp_path, headers_for):
+    app = make_app(tmp_path, LIVE_MAX_BLOCKING_STREAMS=1)
+    with app.app_context():
+        user = add_user('streamer')
+        db.session.commit()
+        headers = headers_for(app, user)
+    client = app.test_client()
+
+    first = client.get('/api/statistics/stream?max_seconds=5', headers=headers, buffered=False)
+    assert first.status_code == 200
+    second = client.get('/api/statistics/stream?max_seconds=5', headers=headers)
+    assert (second.status_code, second.headers['Retry-After']) == (503, '5')
+    first.close()
+    assert client.get('/api/statistics/stream?max_seconds=0', headers=headers).status_code == 200
+
+
+def test_asgi_streams_hold_no_thread(tmp_path, headers_for):
+    # Three open streams, two threads: the submit still runs and its update reaches every stream
+    app = make_app(tmp_path, factory=create_asgi_app, ASGI_THREADS=2, LIVE_HEARTBEAT_SECONDS=0.05)
+    with app.flask_app.app_context():
+        user = add_user('streamer')
+        quiz = Quiz(title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add(quiz)
+        db.session.commit()
+        headers, quiz_id = headers_for(app.flask_app, user), quiz.id
+
+    async def scenario():
+        streams = [asyncio.ensure_future(asgi_call(app, 'GET', '/api/statistics/stream', headers=headers,
+                                                   query_string=b'channels=statistics&max_seconds=0.5'))
+                   for _ in range(3)]
+        await asyncio.sleep(0.1)
+        submitted = await asgi_call(app, 'POST', f'/api/quizzes/{quiz_id}/submit', headers=headers,
+                                    body={'answers': {'1': 'an'}})
+        return submitted, await asyncio.gather(*streams)
+    try:
+        submitted, streams = asyncio.run(scenario())
+    finally:
+        app.executor.shutdown()
+
+    assert submitted.status == 200
+    for stream in streams:
+        assert (stream.status, stream.headers['content-type']) == (200, 'text/event-stream; charset=utf-8')
+        events = parse_events(stream.body)
+        assert events[0] == ('statistics', {'statistics': None})
+        assert events[1][1]['statistics']['experience_points'] == 10
+        assert stream.body.endswith(b'retry: 1000\n\n')
+    with app.flask_app.app_context():
+        assert get_live_hub().broker.subscriber_count() == 0
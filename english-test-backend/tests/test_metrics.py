@@ -0,0 +1,85 @@
+import re
+
+import pytest
+
+from conftest import add_user, make_app
+from query_budget import QueryRecorder
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.services.metrics import PROMETHEUS_CONTENT_TYPE, Counter, Histogram
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{.*\})? (\S+)$')
+REMOTE = {'REMOTE_ADDR': '10.0.0.7'}
+
+
+def scrape(client, **kwargs):
+    """{(name, labels): value} of every sample in a /metrics response"""
+    response = client.get('/metrics', **kwargs)
+    assert response.status_code == 200 and response.content_type == PROMETHEUS_CONTENT_TYPE
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if not line.startswith('#'):
+            name, labels, value = SAMPLE.match(line).groups()
+            samples[name, labels or ''] = float(value)
+    return samples
+
+
+def test_exposition_format():
+    requests = Counter('demo_requests_total', 'Requests', ('path',))
+    requests.inc(('/a"b\\c\n',), 2)
+    assert list(requests.collect()) == [
+        '# HELP demo_requests_total Requests',
+        '# TYPE demo_requests_total counter',
+        'demo_requests_total{path="/a\\"b\\\\c\\n"} 2',
+    ]
+    latency = Histogram('demo_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, ('home',))
+    # Buckets are cumulative and inclusive of their upper bound
+    assert list(latency.collect())[2:] == [
+        'demo_seconds_bucket{route="home",le="0.1"} 2',
+        'demo_seconds_bucket{route="home",le="1.0"} 3',
+        'demo_seconds_bucket{route="home",le="+Inf"} 4',
+        'demo_seconds_sum{route="home"} 3.65',
+        'demo_seconds_count{route="home"} 4',
+    ]
+
+
+@pytest.fixture
+def metrics_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('scraped')
+        lesson = Lesson(title='Articles', topic='Grammar', level='beginner', content='{}')
+        db.session.add(lesson)
+        db.session.commit()
+        return app, headers_for(app, user), lesson.id
+
+
+def test_token_is_compared_and_required_off_loopback(metrics_app):
+    app, _, _ = metrics_app
+    client = app.test_client()
+    # No token configured: local scrapers only
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 403
+
+    app.config['METRICS_TOKEN'] = 's3cret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cre'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}, environ_base=REMOTE).status_code == 200
+
+
+def test_sql_statements_are_counted_per_request(metrics_app):
+    app, headers, lesson_id = metrics_app
+    client = app.test_client()
+    labels = '{blueprint="lesson",endpoint="lesson.get_lesson"}'
+    before = scrape(client)
+
+    with app.app_context(), QueryRecorder(db.engine) as recorder:
+        assert client.get(f'/api/lessons/{lesson_id}', headers=headers).status_code == 200
+    after = scrape(client)
+    assert recorder.count > 0
+    assert after['db_statements_per_request_count', labels] - before.get(('db_statements_per_request_count', labels), 0) == 1
+    assert after['db_statements_per_request_sum', labels] - before.get(('db_statements_per_request_sum', labels), 0) == recorder.count
+    requests = '{blueprint="lesson",endpoint="lesson.get_lesson",method="GET",status="200"}'
+    assert after['http_requests_total', requests] - before.get(('http_requests_total', requests), 0) == 1
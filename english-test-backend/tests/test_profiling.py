@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.services.profiling import PROFILE_ID_HEADER, rotate
+
+ADMIN = {'X-Profile': 'profile-me'}
+
+
+@pytest.fixture
+def profiled_app(tmp_path, headers_for):
+    def build(**config):
+        app = make_app(tmp_path, PROFILING_ENABLED=True, PROFILING_TOKEN='profile-me',
+                       PROFILING_DIR=str(tmp_path / 'profiles'), **config)
+        with app.app_context():
+            user = add_user('profiled')
+            db.session.commit()
+            return app, headers_for(app, user)
+    return build
+
+
+def test_x_profile_header_triggers_a_profile(profiled_app):
+    app, headers = profiled_app()
+    client = app.test_client()
+    assert PROFILE_ID_HEADER not in client.get('/api/lessons', headers=headers).headers
+    assert PROFILE_ID_HEADER not in client.get('/api/lessons', headers=dict(headers, **{'X-Profile': 'guess'})).headers
+
+    profile_id = client.get('/api/lessons', headers=dict(headers, **ADMIN)).headers[PROFILE_ID_HEADER]
+    summary = client.get(f'/api/system/profiles/{profile_id}', headers=dict(headers, **ADMIN)).get_json()
+    assert (summary['trigger'], summary['mode'], summary['endpoint']) == ('header', 'cprofile', 'lesson.get_lessons')
+    assert summary['sql']['count'] == len(summary['sql']['statements']) > 0
+    assert summary['top_functions']
+    download = client.get(f'/api/system/profiles/{profile_id}/download', headers=dict(headers, **ADMIN))
+    assert download.status_code == 200 and download.headers['Content-Disposition'].endswith(f'{profile_id}.prof')
+    download.close()
+
+
+def test_sampled_requests_are_profiled_with_stack_samples(profiled_app):
+    app, headers = profiled_app(PROFILING_SAMPLE_RATE=1.0, PROFILING_MODE='sample')
+    client = app.test_client()
+    profile_id = client.get('/api/lessons', headers=headers).headers[PROFILE_ID_HEADER]
+    profiles = client.get('/api/system/profiles', headers=dict(headers, **ADMIN)).get_json()['profiles']
+    assert [(p['id'], p['trigger'], p['mode']) for p in profiles] == [(profile_id, 'sampled', 'sample')]
+    # Summaries in the listing leave out statements and functions
+    assert 'statements' not in profiles[0]['sql'] and 'top_functions' not in profiles[0]
+    download = client.get(f'/api/system/profiles/{profile_id}/download', headers=dict(headers, **ADMIN))
+    assert download.headers['Content-Disposition'].endswith(f'{profile_id}.folded')
+    download.close()
+
+
+def test_newest_profiles_are_kept(profiled_app, tmp_path):
+    app, headers = profiled_app(PROFILING_MAX_FILES=2)
+    client = app.test_client()
+    ids = [client.get('/api/lessons', headers=dict(headers, **ADMIN)).headers[PROFILE_ID_HEADER] for _ in range(3)]
+    listed = [p['id'] for p in client.get('/api/system/profiles', headers=dict(headers, **ADMIN)).get_json()['profiles']]
+    assert listed == ids[:0:-1]
+
+    directory = tmp_path / 'profiles'
+    # 0 keeps everything
+    rotate(str(directory), 0)
+    assert len(list(directory.glob('*.json'))) == 2
+    rotate(str(directory), 1)
+    assert [p.stem for p in directory.glob('*.json')] == [ids[2]]
+
+
+def test_profile_endpoints_are_for_admins(profiled_app, tmp_path):
+    app, headers = profiled_app()
+    client = app.test_client()
+    profile_id = client.get('/api/lessons', headers=dict(headers, **ADMIN)).headers[PROFILE_ID_HEADER]
+    for path in ('/api/system/profiles', f'/api/system/profiles/{profile_id}', f'/api/system/profiles/{profile_id}/download'):
+        assert client.get(path, headers=headers).status_code == 403
+    assert client.get('/api/system/profiles/not-a-profile', headers=dict(headers, **ADMIN)).status_code == 404
+    assert client.get('/api/system/profiles/20260101T000000000000-deadbeef',
+                      headers=dict(headers, **ADMIN)).status_code == 404
+    # Reading profiles does not profile
+    assert PROFILE_ID_HEADER not in client.get('/api/system/profiles', headers=dict(headers, **ADMIN)).headers
+
+    app.config['PROFILING_ENABLED'] = False
+    assert client.get('/api/system/profiles', headers=dict(headers, **ADMIN)).status_code == 404
+    with open(tmp_path / 'profiles' / f'{profile_id}.json') as f:
+        assert json.load(f)['id'] == profile_id
@@ -0,0 +1,74 @@
+import pytest
+
+from conftest import add_user, make_app
+from query_budget import QueryRecorder
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+
+
+@pytest.fixture
+def catalog_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        lesson = Lesson(title='Articles', topic='Grammar', level='beginner', content='{"introduction": "A or an"}')
+        quiz = Quiz(lesson=lesson, title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add_all([lesson, quiz])
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def listing(app, headers, path):
+    """(items, SQL statements) of a listing request"""
+    with app.app_context(), QueryRecorder(db.engine) as recorder:
+        response = app.test_client().get(path, headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    return body.get('lessons', body.get('quizzes')), [statement for statement, _ in recorder.statements]
+
+
+def test_fields_select_the_response_keys(catalog_app):
+    app, headers = catalog_app
+    lessons, _ = listing(app, headers, '/api/lessons?fields=level,title,level,quiz_count')
+    # id is always there
+    assert [set(lesson) for lesson in lessons] == [{'id', 'level', 'title', 'quiz_count'}]
+    assert lessons[0]['quiz_count'] == 1
+
+    quizzes, _ = listing(app, headers, '/api/quizzes?view=summary')
+    assert set(quizzes[0]) == set(Quiz.SUMMARY_FIELDS) and 'questions' not in quizzes[0]
+    lessons, _ = listing(app, headers, '/api/lessons')
+    assert set(lessons[0]) == set(Lesson.FIELDS)
+
+
+def test_unknown_fields_and_views_answer_400(catalog_app):
+    app, headers = catalog_app
+    client = app.test_client()
+    response = client.get('/api/lessons?fields=title,bogus,secret', headers=headers)
+    assert (response.status_code, response.get_json()) == (400, {'error': 'Unknown fields: bogus, secret'})
+    response = client.get('/api/quizzes?view=compact', headers=headers)
+    assert (response.status_code, response.get_json()) == (400, {'error': 'view must be one of: full, summary'})
+
+
+def lesson_select(statements):
+    return next(s for s in statements if s.lstrip().startswith('SELECT') and 'FROM lesson' in s and 'count(' not in s)
+
+
+def test_unrequested_blobs_are_not_loaded(catalog_app):
+    app, headers = catalog_app
+    _, full = listing(app, headers, '/api/lessons')
+    assert 'lesson.content' in lesson_select(full)
+
+    for path in ('/api/lessons?view=summary', '/api/lessons?fields=title'):
+        _, statements = listing(app, headers, path)
+        assert 'lesson.content' not in lesson_select(statements)
+    _, statements = listing(app, headers, '/api/lessons?fields=title')
+    # Neither the unrequested columns nor the quiz count query
+    assert 'lesson.description' not in lesson_select(statements)
+    assert not any('FROM quiz' in s for s in statements)
+
+    _, statements = listing(app, headers, '/api/quizzes?view=summary')
+    quiz_select = next(s for s in statements if 'FROM quiz' in s and 'count(' not in s)
+    assert 'quiz.questions' not in quiz_select
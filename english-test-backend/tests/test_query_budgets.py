@@ -0,0 +1,74 @@
+"""Maximum SQL statements per endpoint on the seeded dataset.
+
+Budgets include the token lookup. They must not grow with the amount of data:
+an N+1 on the seeded dataset costs dozens of statements and fails here with the
+list of statements that ran.
+"""
+import pytest
+
+from src.models.user import db
+from src.services.response_cache import get_response_cache
+from query_budget import query_budget
+
+# Attempt listings and statistics include one read of the archive or its rollups
+BUDGETS = [
+    ('/api/auth/profile', 1),
+    ('/api/lessons', 4),
+    ('/api/lessons?view=summary', 4),
+    ('/api/lessons/1', 4),
+    ('/api/lessons/topics', 2),
+    ('/api/catalog/facets', 2),
+    ('/api/lessons/search?q=grammar', 4),
+    ('/api/lessons/1/related', 5),
+    ('/api/vocabulary?prefix=word', 4),
+    ('/api/vocabulary/word1', 4),
+    ('/api/quizzes', 4),
+    ('/api/quizzes?view=summary', 4),
+    ('/api/quizzes/1', 4),
+    ('/api/quizzes/1/answers', 4),
+    ('/api/quizzes/1/attempts', 3),
+    ('/api/my-attempts', 5),
+    ('/api/my-attempts?per_page=50', 5),
+    ('/api/statistics/dashboard', 7),
+    ('/api/statistics/progress?period=all', 3),
+    ('/api/statistics/leaderboard', 3),
+    ('/api/statistics/achievements', 3),
+    ('/api/statistics/export', 7),
+]
+
+
+@pytest.mark.parametrize('path,budget', BUDGETS)
+def test_get_query_budget(app, client, auth_headers, engine, path, budget):
+    with app.app_context():
+        # Measure the uncached path
+        get_response_cache().clear()
+    with query_budget(engine, budget, f'GET {path}'):
+        response = client.get(path, headers=auth_headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def test_submit_quiz_query_budget(client, auth_headers, engine):
+    # Includes reading the user's awards and inserting new ones
+    with query_budget(engine, 16, 'POST /api/quizzes/2/submit'):
+        response = client.post('/api/quizzes/2/submit', json={'answers': {'1': 'a'}}, headers=auth_headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def test_submit_batch_query_budget(client, auth_headers, engine):
+    # Independent of the number of attempts and quizzes in the batch
+    attempts = [{'quiz_id': quiz_id, 'answers': {'1': 'a'}} for quiz_id in range(1, 11) for _ in range(3)]
+    with query_budget(engine, 8, 'POST /api/quizzes/submit-batch'):
+        response = client.post('/api/quizzes/submit-batch', json={'attempts': attempts}, headers=auth_headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.get_json()['accepted'] == 30
+
+
+def test_budget_failure_lists_statements(app, engine):
+    with app.app_context():
+        with pytest.raises(AssertionError) as excinfo:
+            with query_budget(engine, 1, 'two selects'):
+                db.session.execute(db.text('SELECT 1'))
+                db.session.execute(db.text('SELECT 2'))
+    message = str(excinfo.value)
+    assert 'two selects ran 2 SQL statements, budget is 1' in message
+    assert '1. SELECT 1' in message and '2. SELECT 2' in message
@@ -0,0 +1,186 @@
+import time
+
+import pytest
+
+from conftest import add_user, asgi_request, make_app
+from src.asgi import create_asgi_app
+from src.models.user import db
+from src.models.quiz import Quiz
+from src.models.statistics import UserStatistics
+from src.services import replica
+from src.services.replica import (REPLICA_BIND, get_replica_router, read_heartbeat, start_heartbeat, stop_heartbeat,
+                                  sync_sqlite_replica)
+
+
+def make_worker(tmp_path, **config):
+    """An app on the shared primary and replica files, as one more worker process would be (no heartbeat timer)"""
+    settings = dict(TESTING=True, REPLICA_CHECK_SECONDS=0, REPLICA_MAX_LAG_SECONDS=0.5,
+                    SQLALCHEMY_BINDS={REPLICA_BIND: f'sqlite:///{tmp_path / "replica.db"}'})
+    return make_app(tmp_path, **dict(settings, **config))
+
+
+@pytest.fixture
+def replica_app(tmp_path, headers_for):
+    app = make_worker(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        quiz = Quiz(title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add_all([quiz, UserStatistics(user_id=user.id)])
+        db.session.commit()
+        headers, quiz_id = headers_for(app, user), quiz.id
+    return app, headers, quiz_id
+
+
+def sync(app):
+    with app.app_context():
+        return sync_sqlite_replica(db.engine, db.engines[REPLICA_BIND])
+
+
+def add_quiz(app, title):
+    """Write to the primary only, as another user's request would"""
+    with app.app_context():
+        quiz = Quiz(title=title, level='beginner')
+        quiz.set_questions([])
+        db.session.add(quiz)
+        db.session.commit()
+
+
+def quiz_titles(client, headers):
+    return sorted(q['title'] for q in client.get('/api/quizzes', headers=headers).get_json()['quizzes'])
+
+
+def test_reads_use_a_fresh_replica_and_fall_back_when_it_lags(replica_app):
+    app, headers, _ = replica_app
+    client = app.test_client()
+    # An empty replica has no heartbeat: the primary answers
+    assert quiz_titles(client, headers) == ['Articles']
+
+    sync(app)
+    add_quiz(app, 'Plurals')
+    # Within the staleness bound the replica answers, without the newer quiz
+    assert quiz_titles(client, headers) == ['Articles']
+    assert client.get('/api/statistics/leaderboard', headers=headers).status_code == 200
+
+    time.sleep(0.6)
+    assert quiz_titles(client, headers) == ['Articles', 'Plurals']
+    stats = client.get('/api/system/replica', headers=headers).get_json()
+    assert (stats['replica_reads'], stats['stale_reads']) == (2, 2)
+
+
+def test_users_read_their_own_writes(replica_app):
+    app, headers, quiz_id = replica_app
+    client = app.test_client()
+    sync(app)
+
+    submitted = client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}}, headers=headers)
+    assert submitted.status_code == 200
+    # Pinned to the primary until the replica has the submission
+    dashboard = client.get('/api/statistics/dashboard', headers=headers).get_json()
+    assert dashboard['user_statistics']['total_quizzes_taken'] == 1
+    with app.app_context():
+        assert get_replica_router().pinned_reads == 1
+
+    sync(app)
+    dashboard = client.get('/api/statistics/dashboard', headers=headers).get_json()
+    assert dashboard['user_statistics']['total_quizzes_taken'] == 1
+    with app.app_context():
+        router = get_replica_router()
+        assert (router.replica_reads, router.pinned_reads, router.stats()['pinned_users']) == (1, 1, 0)
+
+
+def test_registration_pins_the_new_user(replica_app):
+    app, _, _ = replica_app
+    client = app.test_client()
+    sync(app)
+    registered = client.post('/api/auth/register', json={'username': 'newcomer', 'email': 'new@example.com',
+                                                         'password': 'password123'})
+    headers = {'Authorization': f"Bearer {registered.get_json()['token']}"}
+    assert client.get('/api/statistics/achievements', headers=headers).status_code == 200
+    with app.app_context():
+        assert get_replica_router().pinned_reads == 1
+
+
+def test_pins_hold_across_workers(replica_app, tmp_path):
+    app, headers, quiz_id = replica_app
+    other = make_worker(tmp_path)
+    sync(app)
+
+    assert app.test_client().post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}},
+                                  headers=headers).status_code == 200
+    dashboard = other.test_client().get('/api/statistics/dashboard', headers=headers).get_json()
+    assert dashboard['user_statistics']['total_quizzes_taken'] == 1
+    with other.app_context():
+        router = get_replica_router()
+        assert (router.pinned_reads, router.stats()['pinned_users']) == (1, 1)
+
+
+def test_reads_never_write_the_heartbeat(replica_app, tmp_path):
+    app, headers, _ = replica_app
+    beat = sync(app)
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get('/api/quizzes', headers=headers).status_code == 200
+    with app.app_context():
+        assert read_heartbeat(db.engine) == beat
+
+    # The timer writes it instead: one per process, whichever app starts it first
+    with app.app_context():
+        router = get_replica_router()
+    try:
+        thread = start_heartbeat(app, router, 0.05)
+        assert start_heartbeat(make_worker(tmp_path), router, 0.05) is thread
+        time.sleep(0.2)
+        with app.app_context():
+            assert read_heartbeat(db.engine) > beat
+    finally:
+        stop_heartbeat()
+    assert not thread.is_alive()
+
+
+def test_pins_are_cached_for_the_check_interval(replica_app, tmp_path, monkeypatch):
+    _, headers, quiz_id = replica_app
+    worker = make_worker(tmp_path, REPLICA_CHECK_SECONDS=60)
+    client = worker.test_client()
+    sync(worker)
+    reads = []
+    read_user_write = replica.read_user_write
+    monkeypatch.setattr(replica, 'read_user_write', lambda *args: reads.append(args) or read_user_write(*args))
+
+    for _ in range(3):
+        assert client.get('/api/quizzes', headers=headers).status_code == 200
+    assert len(reads) == 1
+    # The worker's own write pins the user at once, without reading the stamp back
+    assert client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}},
+                       headers=headers).status_code == 200
+    dashboard = client.get('/api/statistics/dashboard', headers=headers).get_json()
+    assert dashboard['user_statistics']['total_quizzes_taken'] == 1
+    with worker.app_context():
+        router = get_replica_router()
+        assert (len(reads), router.replica_reads, router.pinned_reads) == (1, 3, 1)
+
+
+def test_asgi_generation_pins_its_user(tmp_path, headers_for, fake_llm):
+    app = make_worker(tmp_path, factory=create_asgi_app)
+    with app.flask_app.app_context():
+        headers = headers_for(app.flask_app, add_user('writer'))
+        db.session.commit()
+    sync(app.flask_app)
+    try:
+        assert asgi_request(app, 'POST', '/api/lessons/generate', headers=headers,
+                            body={'topic': 'Travel', 'level': 'beginner'}).status == 201
+    finally:
+        app.executor.shutdown()
+    with app.flask_app.app_context():
+        assert get_replica_router().stats()['pinned_users'] == 1
+
+
+def test_batches_do_not_pin(replica_app):
+    app, headers, _ = replica_app
+    client = app.test_client()
+    sync(app)
+    response = client.post('/api/batch', json={'requests': ['/api/statistics/dashboard']}, headers=headers)
+    assert response.get_json()['responses'][0]['status'] == 200
+    with app.app_context():
+        router = get_replica_router()
+        assert (router.stats()['pinned_users'], router.replica_reads) == (0, 1)
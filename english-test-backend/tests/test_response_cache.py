@@ -0,0 +1,99 @@
+import gzip
+
+import pytest
+
+from conftest import add_user, asgi_request, make_app
+from src.asgi import create_asgi_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+from src.services.response_cache import ResponseCache, get_response_cache
+
+
+def test_lru_is_capped_by_bytes():
+    cache = ResponseCache(max_bytes=100, gzip_min_bytes=1000)
+    for key in 'abc':
+        cache.put(('quiz', key), b'x' * 40)
+    # Three 40-byte bodies exceed 100 bytes: the least recently used one goes
+    assert (cache.get(('quiz', 'a')), cache.stats()['evictions'], cache.current_bytes) == (None, 1, 80)
+
+    cache.get(('quiz', 'b'))
+    cache.put(('quiz', 'd'), b'x' * 40)
+    assert cache.get(('quiz', 'c')) is None and cache.get(('quiz', 'b')) is not None
+    # Larger than the whole cache: served, never stored
+    assert cache.put(('quiz', 'e'), b'x' * 101).body == b'x' * 101
+    assert cache.get(('quiz', 'e')) is None
+    assert cache.stats()['entries'] == 2 and cache.current_bytes == 80
+
+
+def test_invalidate_drops_every_variant_of_one_object():
+    cache = ResponseCache(gzip_min_bytes=100)
+    cache.put(('quiz', 1, 'v1', False), b'{}' * 100)
+    cache.put(('quiz', 1, 'v1', True), b'{}' * 100)
+    cache.put(('quiz', 2, 'v1', False), b'{}')
+    cache.invalidate('quiz', 1)
+    assert [key[:2] for key in cache._entries] == [('quiz', 2)]
+    assert cache.current_bytes == 2
+
+
+@pytest.fixture
+def cached_app(tmp_path, headers_for):
+    app = make_app(tmp_path, factory=create_asgi_app, RESPONSE_CACHE_GZIP_MIN_BYTES=1)
+    with app.flask_app.app_context():
+        user = add_user('reader')
+        lesson = Lesson(title='Articles', topic='Grammar', level='beginner', content='{"introduction": "A or an"}')
+        quiz = Quiz(lesson=lesson, title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add_all([lesson, quiz])
+        db.session.commit()
+        headers, ids = headers_for(app.flask_app, user), (lesson.id, quiz.id)
+    yield app, headers, ids
+    app.executor.shutdown()
+
+
+def cached_objects(app):
+    with app.flask_app.app_context():
+        return {key[:2] for key in get_response_cache()._entries}
+
+
+def test_gzip_variant_follows_accept_encoding(cached_app):
+    app, headers, (_, quiz_id) = cached_app
+    client = app.flask_app.test_client()
+    plain = client.get(f'/api/quizzes/{quiz_id}', headers=headers)
+    assert plain.content_encoding is None and plain.headers['Vary'] == 'Accept-Encoding'
+
+    zipped = client.get(f'/api/quizzes/{quiz_id}', headers=dict(headers, **{'Accept-Encoding': 'br, gzip'}))
+    assert zipped.content_encoding == 'gzip'
+    assert gzip.decompress(zipped.data) == plain.data
+    refused = client.get(f'/api/quizzes/{quiz_id}', headers=dict(headers, **{'Accept-Encoding': 'gzip;q=0'}))
+    assert refused.content_encoding is None and refused.data == plain.data
+    with app.flask_app.app_context():
+        assert get_response_cache().stats()['hits'] == 2
+
+
+def test_writes_invalidate_the_cached_object(cached_app, fake_llm):
+    app, headers, (lesson_id, quiz_id) = cached_app
+    client = app.flask_app.test_client()
+
+    def read_both():
+        for path in (f'/api/lessons/{lesson_id}', f'/api/quizzes/{quiz_id}'):
+            assert client.get(path, headers=headers).status_code == 200
+        assert cached_objects(app) == {('lesson', lesson_id), ('quiz', quiz_id)}
+
+    read_both()
+    client.put(f'/api/quizzes/{quiz_id}', json={'title': 'Articles again'}, headers=headers)
+    client.put(f'/api/lessons/{lesson_id}', json={'title': 'Articles again'}, headers=headers)
+    assert cached_objects(app) == set()
+
+    read_both()
+    client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': 'an'}}, headers=headers)
+    assert cached_objects(app) == {('lesson', lesson_id)}
+    # A quiz generated for the lesson changes its quiz list
+    assert asgi_request(app, 'POST', '/api/quizzes/generate', headers=headers,
+                        body={'topic': 'Articles', 'level': 'beginner', 'lesson_id': lesson_id}).status == 201
+    assert cached_objects(app) == set()
+
+    read_both()
+    client.delete(f'/api/quizzes/{quiz_id}', headers=headers)
+    client.delete(f'/api/lessons/{lesson_id}', headers=headers)
+    assert cached_objects(app) == set()
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.services.search import build_match, rebuild_search_index
+
+
+@pytest.fixture
+def search_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        for title, topic, level, theory in (
+            ('Present Perfect', 'Grammar', 'beginner', 'Use have or has with the past participle.'),
+            ('Airport English', 'Vocabulary', 'intermediate', 'Boarding passes, gates and customs.'),
+            ('Past Simple', 'Grammar', 'advanced', 'Finished actions at a definite time.'),
+        ):
+            lesson = Lesson(title=title, description=f'Learn {title}', topic=topic, level=level)
+            lesson.set_content({'content': {'theory': theory}, 'vocabulary': [{'word': 'itinerary'}]})
+            db.session.add(lesson)
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def search(client, headers, query):
+    response = client.get(f'/api/lessons/search?{query}', headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_build_match_quotes_terms():
+    assert build_match('present perf') == '{title description topic body} : ("present" "perf"*)'
+    assert build_match('x"y', level='advanced') == '{title description topic body} : ("x" "y"*) AND level : "advanced"'
+    assert build_match('  ?! ') is None
+
+
+def test_search_ranks_and_snippets_content(search_app):
+    app, headers = search_app
+    client = app.test_client()
+
+    body = search(client, headers, 'q=participle')
+    assert body['engine'] == 'fts5'
+    assert [r['title'] for r in body['results']] == ['Present Perfect']
+    assert '<mark>participle</mark>' in body['results'][0]['snippet']
+
+    # Prefix on the last term, title matches outrank body matches
+    body = search(client, headers, 'q=past')
+    assert [r['title'] for r in body['results']] == ['Past Simple', 'Present Perfect']
+    assert body['results'][0]['title_highlight'] == '<mark>Past</mark> Simple'
+
+    body = search(client, headers, 'q=itinerary&topic=grammar&level=advanced')
+    assert [r['title'] for r in body['results']] == ['Past Simple']
+    assert client.get('/api/lessons/search', headers=headers).status_code == 400
+
+
+def test_index_follows_lesson_writes(search_app):
+    app, headers = search_app
+    client = app.test_client()
+    with app.app_context():
+        lesson_id = Lesson.query.filter_by(title='Airport English').first().id
+
+    response = client.put(f'/api/lessons/{lesson_id}', headers=headers,
+                          json={'content': {'content': {'theory': 'Check-in desks and luggage.'}}})
+    assert response.status_code == 200
+    assert search(client, headers, 'q=boarding')['total'] == 0
+    assert search(client, headers, 'q=luggage')['results'][0]['id'] == lesson_id
+
+    assert client.delete(f'/api/lessons/{lesson_id}', headers=headers).status_code == 200
+    assert search(client, headers, 'q=luggage')['total'] == 0
+
+    with app.app_context():
+        # Rebuilding from the lesson table gives the same index
+        with db.engine.begin() as conn:
+            assert rebuild_search_index(conn) == 2
+    assert search(client, headers, 'q=luggage')['total'] == 0
+    assert search(client, headers, 'q=itinerary')['total'] == 2
@@ -0,0 +1,112 @@
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.quiz import Quiz
+from src.models.statistics import UserStatistics
+from src.services.sections import SectionTimer, parse_include
+
+COUNTERS = {'total_quizzes_taken', 'experience_points', 'current_level', 'topic_scores'}
+
+
+def test_parse_include():
+    allowed = ('a', 'b', 'c')
+    assert parse_include(None, allowed) == ['a', 'b', 'c']
+    assert parse_include('', allowed) == []
+    assert parse_include(' c, a ,', allowed) == ['c', 'a']
+    with pytest.raises(ValueError, match='Unknown sections: d, e. Allowed: a, b, c'):
+        parse_include('a,d,e', allowed)
+
+
+def test_statistics_serialize_without_a_timer():
+    stats = UserStatistics(user_id=1, total_quizzes_taken=0, total_quizzes_passed=0, total_study_time_minutes=0,
+                           experience_points=0, grammar_score=0, vocabulary_score=0, reading_score=0,
+                           listening_score=0)
+    data = stats.to_dict(include=['level_progress'])
+    assert 'level_progress' in data and 'topic_performance' not in data
+
+
+def timings(response):
+    """Section names of a Server-Timing header, checking each has a duration"""
+    names = []
+    for entry in response.headers['Server-Timing'].split(', '):
+        name, duration = entry.split(';dur=')
+        assert float(duration) >= 0
+        names.append(name)
+    return names
+
+
+@pytest.fixture
+def dashboard_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('learner')
+        quiz = Quiz(title='Articles', level='beginner')
+        quiz.set_questions([{'id': 1, 'question': 'A or an: ___ apple', 'options': ['a', 'an'], 'correct_answer': 'an'}])
+        db.session.add(quiz)
+        db.session.commit()
+        headers, quiz_id = headers_for(app, user), quiz.id
+    return app, headers, quiz_id
+
+
+def test_dashboard_computes_only_the_included_sections(dashboard_app):
+    app, headers, _ = dashboard_app
+    client = app.test_client()
+
+    full = client.get('/api/statistics/dashboard', headers=headers)
+    assert set(full.get_json()) == {'user_statistics', 'recent_attempts', 'weekly_progress', 'recommendations'}
+    assert {'level_progress', 'average_score', 'topic_performance'} <= set(full.get_json()['user_statistics'])
+    assert timings(full) == ['stats', 'level_progress', 'grade_attempts', 'average_score', 'topic_performance',
+                             'recent_attempts', 'weekly_progress', 'recommendations']
+
+    partial = client.get('/api/statistics/dashboard?include=average_score,weekly_progress', headers=headers)
+    body = partial.get_json()
+    assert set(body) == {'user_statistics', 'weekly_progress'}
+    assert COUNTERS | {'average_score'} <= set(body['user_statistics'])
+    assert not {'level_progress', 'topic_performance'} & set(body['user_statistics'])
+    assert timings(partial) == ['stats', 'grade_attempts', 'average_score', 'weekly_progress']
+
+    # Counters only
+    empty = client.get('/api/statistics/dashboard?include=', headers=headers)
+    assert set(empty.get_json()) == {'user_statistics'} and timings(empty) == ['stats']
+
+
+def test_unknown_sections_answer_400(dashboard_app):
+    app, headers, quiz_id = dashboard_app
+    client = app.test_client()
+    response = client.get('/api/statistics/dashboard?include=average_score,leaderboard', headers=headers)
+    assert response.status_code == 400 and response.get_json()['error'].startswith('Unknown sections: leaderboard.')
+    submitted = client.post(f'/api/quizzes/{quiz_id}/submit?include=weekly_progress', json={'answers': {'1': 'an'}},
+                            headers=headers)
+    assert submitted.status_code == 400
+
+
+def test_submit_reports_the_requested_statistics(dashboard_app):
+    app, headers, quiz_id = dashboard_app
+    response = app.test_client().post(f'/api/quizzes/{quiz_id}/submit?include=level_progress',
+                                      json={'answers': {'1': 'an'}}, headers=headers)
+    assert response.status_code == 200
+    assert 'level_progress' in response.get_json()['statistics']
+    assert 'average_score' not in response.get_json()['statistics']
+    assert timings(response) == ['level_progress']
+
+
+def test_grading_decodes_each_quiz_once(dashboard_app, monkeypatch):
+    app, headers, quiz_id = dashboard_app
+    client = app.test_client()
+    for answer in ('an', 'a', 'an'):
+        client.post(f'/api/quizzes/{quiz_id}/submit', json={'answers': {'1': answer}}, headers=headers)
+    decoded = []
+    get_questions = Quiz.get_questions
+    monkeypatch.setattr(Quiz, 'get_questions', lambda self: decoded.append(self.id) or get_questions(self))
+    body = client.get('/api/statistics/dashboard?include=average_score', headers=headers).get_json()
+    assert body['user_statistics']['average_score'] == round(200 / 3, 2)
+    assert decoded == [quiz_id]
+
+
+def test_section_timer_accumulates_repeated_sections():
+    timer = SectionTimer()
+    for _ in range(2):
+        with timer.section('grade'):
+            pass
+    assert list(timer.timings) == ['grade'] and timer.header_value().startswith('grade;dur=')
@@ -0,0 +1,95 @@
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.quiz import Quiz
+from src.models.similarity import SimilarityBand, SimilaritySignature
+from src.services.similarity import (estimate, find_duplicate_questions, rebuild_similarity_index,
+                                     signature)
+
+PERFECT = ('The present perfect links the past to the present. Use have or has with the past participle '
+           'to talk about experiences, recent events and situations that continue until now.')
+
+
+def make_lesson(title, theory):
+    lesson = Lesson(title=title, description='Grammar lesson', topic='Grammar', level='beginner')
+    lesson.set_content({'content': {'theory': theory}})
+    return lesson
+
+
+@pytest.fixture
+def similarity_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        db.session.add(make_lesson('Present Perfect', PERFECT))
+        db.session.add(make_lesson('Present Perfect Revision', PERFECT + ' Practise with the exercises below.'))
+        db.session.add(make_lesson('Airport English', 'Boarding passes, security checks, gates, customs and '
+                                                      'baggage claim vocabulary for your next trip abroad.'))
+        quiz = Quiz(title='Perfect quiz', level='beginner')
+        quiz.set_questions([
+            {'question': 'Which sentence uses the present perfect correctly?',
+             'options': ['I have seen it', 'I seen it', 'I have saw it', 'I see it yesterday']},
+            {'question': 'Choose the word that means a place where planes land',
+             'options': ['airport', 'harbour', 'station', 'garage']},
+        ])
+        db.session.add(quiz)
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def lesson_id(title):
+    return Lesson.query.filter_by(title=title).first().id
+
+
+def test_signature_estimates_jaccard():
+    a = signature(PERFECT)
+    assert estimate(a, signature(PERFECT)) == 1.0
+    assert estimate(a, signature(PERFECT + ' Practise with the exercises below.')) > 0.7
+    assert estimate(a, signature('Boarding passes and customs at the airport')) < 0.2
+    assert signature('?!') is None
+
+
+def test_related_lessons_route(similarity_app):
+    app, headers = similarity_app
+    client = app.test_client()
+    with app.app_context():
+        perfect, revision = lesson_id('Present Perfect'), lesson_id('Present Perfect Revision')
+
+    body = client.get(f'/api/lessons/{perfect}/related', headers=headers).get_json()
+    assert [r['id'] for r in body['related']] == [revision]
+    assert body['related'][0]['similarity'] > 0.7
+    assert client.get('/api/lessons/999/related', headers=headers).status_code == 404
+
+    # Editing the revision away from the topic drops it from the index
+    response = client.put(f'/api/lessons/{revision}', headers=headers,
+                          json={'content': {'content': {'theory': 'Ordering food and drinks in a busy cafe.'}}})
+    assert response.status_code == 200
+    assert client.get(f'/api/lessons/{perfect}/related', headers=headers).get_json()['related'] == []
+
+    assert client.delete(f'/api/lessons/{revision}', headers=headers).status_code == 200
+    with app.app_context():
+        assert SimilarityBand.query.filter_by(kind='lesson', object_id=revision).count() == 0
+
+
+def test_duplicate_questions_flagged(similarity_app):
+    app, _ = similarity_app
+    with app.app_context():
+        quiz_id = Quiz.query.first().id
+        flags = find_duplicate_questions(db.session, [
+            {'question': 'Which sentence uses the present perfect correctly?',
+             'options': ['I have seen it', 'I seen it', 'I have saw it', 'I see it yesterday']},
+            {'question': 'What is the past tense of go?', 'options': ['went', 'gone', 'goed', 'going']},
+            {'question': 'What is the past tense of go?', 'options': ['went', 'gone', 'goed', 'going']},
+        ])
+        assert [(f['question_index'], f['quiz_id'], f['question_index_in_quiz']) for f in flags] == [
+            (0, quiz_id, 0), (2, None, 1)]
+        # A quiz is not its own duplicate
+        assert find_duplicate_questions(db.session, Quiz.query.first().get_questions(), exclude_quiz_id=quiz_id) == []
+
+        with db.engine.begin() as conn:
+            rebuild_similarity_index(conn)
+        assert SimilaritySignature.query.filter_by(kind='question').count() == 2
+        assert SimilaritySignature.query.filter_by(kind='lesson').count() == 3
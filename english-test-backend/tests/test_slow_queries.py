@@ -0,0 +1,34 @@
+import pytest
+
+from src.services.slow_queries import SlowQueryLog, fingerprint, normalize
+
+
+@pytest.fixture
+def slow_log(app):
+    previous = app.extensions['slow_queries']
+    app.extensions['slow_queries'] = log = SlowQueryLog(threshold_ms=0)
+    yield log
+    app.extensions['slow_queries'] = previous
+
+
+def test_normalize_collapses_literals():
+    a = normalize("SELECT * FROM lesson WHERE topic LIKE '%gram%' AND id IN (1, 2, 3) LIMIT 10")
+    b = normalize("SELECT *  FROM lesson\nWHERE topic LIKE 'x' AND id IN (?, ?) LIMIT 20")
+    assert a == b == 'SELECT * FROM lesson WHERE topic LIKE ? AND id IN (...) LIMIT ?'
+    assert fingerprint(a) == fingerprint(b)
+
+
+def test_topic_scan_is_captured_with_plan(client, auth_headers, slow_log):
+    for topic in ('gram', 'read'):
+        assert client.get(f'/api/lessons?topic={topic}', headers=auth_headers).status_code == 200
+
+    report = slow_log.report(sort='count', limit=100)
+    scans = [q for q in report['queries']
+             if 'LIKE lower(?) LIMIT' in q['statement'] and q['statement'].startswith('SELECT lesson.id')]
+    assert len(scans) == 1
+    scan = scans[0]
+    # Both topics aggregate under one fingerprint, each sample keeps its own parameters
+    assert scan['count'] == 2
+    assert scan['routes'] == {'GET lesson.get_lessons': 2}
+    assert sorted(s['parameters'][0] for s in scan['samples']) == ["'%gram%'", "'%read%'"]
+    assert any('SCAN lesson' in step for step in scan['plan'])
@@ -0,0 +1,83 @@
+import pytest
+
+from conftest import add_user, make_app
+from src.models.user import db
+from src.models.lesson import Lesson
+from src.models.vocabulary import VocabularyEntry
+from src.services.vocabulary import VocabularyIndex, extract_vocabulary
+
+
+def make_lesson(title, words):
+    lesson = Lesson(title=title, topic='Vocabulary', level='beginner')
+    lesson.set_content({'vocabulary': [{'word': w, 'definition': f'{w} ({title})', 'example': f'A {w}.'} for w in words]})
+    return lesson
+
+
+@pytest.fixture
+def vocab_app(tmp_path, headers_for):
+    app = make_app(tmp_path)
+    with app.app_context():
+        user = add_user('reader')
+        db.session.add(make_lesson('Travel', ['Airport', 'airline', 'Ticket']))
+        db.session.add(make_lesson('Flying', ['Airport', 'Aisle seat']))
+        db.session.commit()
+        headers = headers_for(app, user)
+    return app, headers
+
+
+def test_extract_vocabulary_skips_malformed_and_duplicates():
+    rows = extract_vocabulary('{"vocabulary": [{"word": " Big  Deal "}, {"word": "big deal"}, {"definition": "x"}, "plain", 3]}')
+    assert [(r['word'], r['normalized'], r['position']) for r in rows] == [('Big Deal', 'big deal', 0), ('plain', 'plain', 1)]
+    assert extract_vocabulary('not json') == []
+
+
+def test_prefix_autocomplete_links_lessons(vocab_app):
+    app, headers = vocab_app
+    client = app.test_client()
+
+    body = client.get('/api/vocabulary?prefix=AI', headers=headers).get_json()
+    assert [w['word'] for w in body['words']] == ['airline', 'Airport', 'Aisle seat']
+    airport = body['words'][1]
+    assert airport['lesson_count'] == 2
+    assert [l['title'] for l in airport['lessons']] == ['Travel', 'Flying']
+    assert airport['definition'] == 'Airport (Travel)'
+
+    assert client.get('/api/vocabulary?prefix=air&limit=1', headers=headers).get_json()['total'] == 2
+    assert client.get('/api/vocabulary', headers=headers).status_code == 400
+    assert client.get('/api/vocabulary/aisle%20seat', headers=headers).get_json()['lessons'][0]['title'] == 'Flying'
+    assert client.get('/api/vocabulary/boat', headers=headers).status_code == 404
+
+
+def test_lesson_writes_refresh_the_index(vocab_app):
+    app, headers = vocab_app
+    client = app.test_client()
+    with app.app_context():
+        travel_id = Lesson.query.filter_by(title='Travel').first().id
+    assert client.get('/api/vocabulary?prefix=ticket', headers=headers).get_json()['total'] == 1
+
+    response = client.put(f'/api/lessons/{travel_id}', headers=headers,
+                          json={'content': {'vocabulary': [{'word': 'Passport'}]}})
+    assert response.status_code == 200
+    assert client.get('/api/vocabulary?prefix=ticket', headers=headers).get_json()['total'] == 0
+    assert client.get('/api/vocabulary?prefix=pass', headers=headers).get_json()['words'][0]['word'] == 'Passport'
+
+    assert client.delete(f'/api/lessons/{travel_id}', headers=headers).status_code == 200
+    assert client.get('/api/vocabulary?prefix=pass', headers=headers).get_json()['total'] == 0
+    with app.app_context():
+        assert VocabularyEntry.query.filter_by(lesson_id=travel_id).count() == 0
+
+
+def test_index_picks_up_other_workers_writes(vocab_app):
+    app, _ = vocab_app
+    with app.app_context():
+        # A second index stands in for another worker's process
+        other = VocabularyIndex(refresh_seconds=0)
+        other.ensure_loaded(db.session)
+        assert other.complete('ship')[1] == 0
+        db.session.add(make_lesson('Cruise', ['Ship']))
+        db.session.commit()
+        other.ensure_loaded(db.session)
+        assert other.complete('ship')[1] == 1
+        loads = other.loads
+        other.ensure_loaded(db.session)
+        assert other.loads == loads